@@ -1,12 +1,14 @@
 from django.contrib import admin
+from smartmove.admin import FacetListFilter, FullTextSearchMixin, KeysetPaginationMixin, QueryBudgetMixin
 from .models import Client, ClientDocument
 
 @admin.register(Client)
-class ClientAdmin(admin.ModelAdmin):
+class ClientAdmin(FullTextSearchMixin, KeysetPaginationMixin, QueryBudgetMixin, admin.ModelAdmin):
     list_display = ['client_id', 'first_name', 'last_name', 'company_name', 'client_type', 'email', 'phone', 'city', 'is_active', 'date_created']
-    list_filter = ['client_type', 'is_active', 'city', 'state', 'date_created']
+    list_filter = ['client_type', 'is_active', ('city', FacetListFilter), ('state', FacetListFilter), 'date_created']
     search_fields = ['client_id', 'first_name', 'last_name', 'company_name', 'email', 'phone']
     readonly_fields = ['date_created', 'date_updated']
+    raw_id_fields = ['user']
     fieldsets = (
         ('Basic Information', {
             'fields': ('client_id', 'client_type', 'user')
@@ -23,8 +25,10 @@ class ClientAdmin(admin.ModelAdmin):
     )
 
 @admin.register(ClientDocument)
-class ClientDocumentAdmin(admin.ModelAdmin):
+class ClientDocumentAdmin(FullTextSearchMixin, KeysetPaginationMixin, QueryBudgetMixin, admin.ModelAdmin):
     list_display = ['client', 'document_type', 'document_name', 'uploaded_at']
+    list_select_related = ['client']
     list_filter = ['document_type', 'uploaded_at']
     search_fields = ['client__first_name', 'client__last_name', 'document_name']
     readonly_fields = ['uploaded_at']
+    raw_id_fields = ['client']
@@ -0,0 +1,4 @@
+from smartmove.cache import ObjectCache, register
+from .models import Client
+
+register(ObjectCache(Client, 'client_id'))
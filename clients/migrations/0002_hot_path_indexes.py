@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:19
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking out writes on the large tables.
+    atomic = False
+
+    dependencies = [
+        ('clients', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='client',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-date_created'], name='client_active_created_idx'),
+        ),
+    ]
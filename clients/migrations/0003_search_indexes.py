@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:28
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('clients', '0002_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='client',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('client_id', 'first_name', 'last_name', 'company_name', 'email', 'phone', config='simple'), name='client_search_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='clientdocument',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('document_name', config='simple'), name='clientdocument_search_idx'),
+        ),
+    ]
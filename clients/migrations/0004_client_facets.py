@@ -0,0 +1,15 @@
+from django.db import migrations
+
+from smartmove.facets import CreateFacet
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0003_search_indexes'),
+    ]
+
+    operations = [
+        CreateFacet('client', 'city'),
+        CreateFacet('client', 'state'),
+    ]
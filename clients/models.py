@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
+from smartmove.search import search_index
 
 class Client(models.Model):
     INDIVIDUAL = 'individual'
@@ -30,6 +31,10 @@ class Client(models.Model):
     
     class Meta:
         ordering = ['-date_created']
+        indexes = [
+            models.Index(fields=['-date_created'], condition=models.Q(is_active=True), name='client_active_created_idx'),
+            search_index('client_search_idx', 'client_id', 'first_name', 'last_name', 'company_name', 'email', 'phone'),
+        ]
         
     def __str__(self):
         if self.client_type == self.CORPORATE and self.company_name:
@@ -59,5 +64,10 @@ class ClientDocument(models.Model):
     document_file = models.FileField(upload_to='client_documents/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            search_index('clientdocument_search_idx', 'document_name'),
+        ]
+    
     def __str__(self):
         return f"{self.client.full_name} - {self.document_name}"
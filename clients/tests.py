@@ -1,3 +1,20 @@
 from django.test import TestCase
 
-# Create your tests here.
+from smartmove.testing import AdminQueryBudgetMixin, make_client, make_client_document
+from .models import Client, ClientDocument
+
+
+class AdminQueryBudgetTests(AdminQueryBudgetMixin, TestCase):
+    def test_client_changelist(self):
+        self.assertChangelistWithinBudget(Client, 7, make_client)
+
+    def test_client_document_changelist(self):
+        self.assertChangelistWithinBudget(ClientDocument, 5, make_client_document)
+
+    def test_client_change_form(self):
+        client = make_client(user=self.admin_user)
+        self.assertChangeFormWithinBudget(client, 4, lambda: make_client_document(client=client))
+
+    def test_client_document_change_form(self):
+        document = make_client_document()
+        self.assertChangeFormWithinBudget(document, 5, make_client)
@@ -0,0 +1,35 @@
+"""
+Gunicorn settings, taken from the environment.
+
+Each worker process serves ``GUNICORN_THREADS`` requests at a time and
+smartmove.settings sizes its database connection pool after the same
+variable, so Postgres needs ``WEB_CONCURRENCY`` x ``GUNICORN_THREADS``
+connections, plus those of cron jobs and consoles.
+
+The workers save their request metrics in ``METRICS_DIR``, emptied when the
+server starts, so that any of them can serve those of all to Prometheus.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+wsgi_app = 'smartmove.wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * multiprocessing.cpu_count() + 1))
+# More than one thread makes gunicorn use its gthread workers.
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# Inherited by the workers, forked after this is read.
+metrics_dir = os.environ.setdefault(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), f'smartmove-metrics-{os.getpid()}'),
+)
+
+
+def on_starting(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def on_exit(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -1,10 +1,19 @@
-from django.contrib import admin
+from collections import Counter
+
+from django.contrib import admin, messages
+from smartmove.admin import (
+    ExportMixin, FacetListFilter, FullTextSearchMixin, KeysetPaginationMixin, QueryBudgetMixin,
+    RenditionsMixin,
+)
+from .loading import plan_assignments
+from .manifest import sync_manifest
+from .transitions import transition_transfers
 from .models import Vehicle, Driver, MovingCrew, MovingAssignment, InventoryTransfer, MovingExpense
 
 @admin.register(Vehicle)
-class VehicleAdmin(admin.ModelAdmin):
+class VehicleAdmin(KeysetPaginationMixin, QueryBudgetMixin, admin.ModelAdmin):
     list_display = ['vehicle_id', 'vehicle_type', 'make', 'model', 'year', 'license_plate', 'status', 'max_weight_kg']
-    list_filter = ['vehicle_type', 'status', 'make', 'year']
+    list_filter = ['vehicle_type', 'status', ('make', FacetListFilter), ('year', FacetListFilter)]
     search_fields = ['vehicle_id', 'license_plate', 'make', 'model']
     readonly_fields = ['date_created']
     
@@ -27,11 +36,13 @@ class VehicleAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Driver)
-class DriverAdmin(admin.ModelAdmin):
+class DriverAdmin(KeysetPaginationMixin, QueryBudgetMixin, admin.ModelAdmin):
     list_display = ['driver_id', 'user', 'phone', 'license_number', 'status', 'total_moves', 'average_rating']
+    list_select_related = ['user']
     list_filter = ['status', 'is_active', 'hire_date']
     search_fields = ['driver_id', 'user__first_name', 'user__last_name', 'license_number', 'phone']
     readonly_fields = ['date_created']
+    raw_id_fields = ['user']
     
     fieldsets = (
         ('Basic Information', {
@@ -52,27 +63,50 @@ class DriverAdmin(admin.ModelAdmin):
     )
 
 @admin.register(MovingCrew)
-class MovingCrewAdmin(admin.ModelAdmin):
+class MovingCrewAdmin(KeysetPaginationMixin, QueryBudgetMixin, admin.ModelAdmin):
     list_display = ['crew_id', 'crew_leader', 'max_capacity_kg', 'is_active']
+    list_select_related = ['crew_leader__user']
     list_filter = ['is_active', 'date_created']
     search_fields = ['crew_id', 'crew_leader__user__first_name', 'crew_leader__user__last_name']
     filter_horizontal = ['members', 'vehicles']
+    choice_select_related = {'crew_leader': ['user'], 'members': ['user']}
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('crew_leader__user')
 
-class InventoryTransferInline(admin.TabularInline):
+class InventoryTransferInline(QueryBudgetMixin, admin.TabularInline):
     model = InventoryTransfer
     extra = 0
+    exclude = ['inventory_item']
+    choice_select_related = {'handled_by': ['user']}
+    cached_choice_fields = ['handled_by']
 
-class MovingExpenseInline(admin.TabularInline):
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('assignment__relocation_request')
+
+class MovingExpenseInline(RenditionsMixin, QueryBudgetMixin, admin.TabularInline):
     model = MovingExpense
     extra = 0
+    readonly_fields = ['thumbnail']
+    choice_select_related = {'submitted_by': ['user']}
+    cached_choice_fields = ['submitted_by', 'approved_by']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('assignment__relocation_request', 'assignment__crew')
 
 @admin.register(MovingAssignment)
-class MovingAssignmentAdmin(admin.ModelAdmin):
+class MovingAssignmentAdmin(
+    FullTextSearchMixin, KeysetPaginationMixin, RenditionsMixin, QueryBudgetMixin, admin.ModelAdmin,
+):
     list_display = ['relocation_request', 'crew', 'status', 'scheduled_start_date', 'actual_start_date']
+    list_select_related = ['relocation_request__client', 'crew__crew_leader__user']
     list_filter = ['status', 'scheduled_start_date', 'requires_special_equipment']
     search_fields = ['relocation_request__request_id', 'crew__crew_id']
     readonly_fields = ['date_created', 'date_updated']
+    raw_id_fields = ['relocation_request']
+    choice_select_related = {'crew': ['crew_leader__user']}
     inlines = [InventoryTransferInline, MovingExpenseInline]
+    actions = ['sync_manifests', 'plan_loads']
     
     fieldsets = (
         ('Assignment Information', {
@@ -92,16 +126,77 @@ class MovingAssignmentAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            sync_manifest(obj)
+
+    @admin.action(description='Sync transfer manifests with the inventory', permissions=['change'])
+    def sync_manifests(self, request, queryset):
+        totals = [0, 0, 0]
+        for assignment in queryset.only('pk'):
+            totals = [total + count for total, count in zip(totals, sync_manifest(assignment))]
+        self.message_user(request, 'Transfers added: %d, updated: %d, removed: %d.' % tuple(totals), messages.SUCCESS)
+
+    @admin.action(description='Plan vehicle loads', permissions=['view'])
+    def plan_loads(self, request, queryset):
+        for assignment in queryset.select_related('relocation_request'):
+            plan = plan_assignments(queryset.filter(pk=assignment.pk))
+            message = '%s: %d vehicle(s) needed.' % (assignment.relocation_request.request_id, plan.vehicles_needed)
+            if plan.overflow:
+                message += ' The crew is %d vehicle(s) short.' % len(plan.overflow)
+            if plan.unplaced:
+                message += ' %d item(s) fit no vehicle.' % len(plan.unplaced)
+            self.message_user(request, message, messages.SUCCESS if plan.fits else messages.WARNING)
+
 @admin.register(InventoryTransfer)
-class InventoryTransferAdmin(admin.ModelAdmin):
+class InventoryTransferAdmin(
+    ExportMixin, FullTextSearchMixin, KeysetPaginationMixin, QueryBudgetMixin, admin.ModelAdmin,
+):
     list_display = ['assignment', 'item_name', 'room_from', 'room_to', 'status', 'is_fragile', 'damage_reported']
+    list_select_related = ['assignment__relocation_request', 'assignment__crew']
     list_filter = ['status', 'is_fragile', 'requires_disassembly', 'damage_reported']
     search_fields = ['assignment__relocation_request__request_id', 'item_name', 'room_from', 'room_to']
-    readonly_fields = ['date_created']
+    readonly_fields = ['length_cm', 'width_cm', 'height_cm', 'date_created']
+    raw_id_fields = ['assignment', 'inventory_item']
+    choice_select_related = {'handled_by': ['user']}
+    actions = [*ExportMixin.actions, 'mark_packed', 'mark_loaded', 'mark_in_transit', 'mark_delivered']
+
+    @admin.action(description='Mark selected transfers as packed', permissions=['change'])
+    def mark_packed(self, request, queryset):
+        self.transition(request, queryset, 'packed')
+
+    @admin.action(description='Mark selected transfers as loaded', permissions=['change'])
+    def mark_loaded(self, request, queryset):
+        self.transition(request, queryset, 'loaded')
+
+    @admin.action(description='Mark selected transfers as in transit', permissions=['change'])
+    def mark_in_transit(self, request, queryset):
+        self.transition(request, queryset, 'in_transit')
+
+    @admin.action(description='Mark selected transfers as delivered', permissions=['change'])
+    def mark_delivered(self, request, queryset):
+        self.transition(request, queryset, 'delivered')
+
+    def transition(self, request, queryset, status):
+        handled_by = Driver.objects.filter(user=request.user).first()
+        moved, rejections = transition_transfers(queryset.values_list('pk', flat=True), status, handled_by)
+        label = dict(InventoryTransfer.STATUS_CHOICES)[status].lower()
+        self.message_user(request, 'Transfers marked %s: %d.' % (label, len(moved)), messages.SUCCESS)
+        if rejections:
+            reasons = Counter(rejections.values())
+            self.message_user(request, 'Transfers left as they were: %s' % ' '.join(
+                '%s (%d)' % (reason, count) for reason, count in reasons.most_common()
+            ), messages.WARNING)
 
 @admin.register(MovingExpense)
-class MovingExpenseAdmin(admin.ModelAdmin):
+class MovingExpenseAdmin(
+    ExportMixin, FullTextSearchMixin, KeysetPaginationMixin, RenditionsMixin, QueryBudgetMixin, admin.ModelAdmin,
+):
     list_display = ['assignment', 'expense_type', 'amount', 'date_incurred', 'submitted_by', 'is_approved']
+    list_select_related = ['assignment__relocation_request', 'assignment__crew', 'submitted_by__user']
     list_filter = ['expense_type', 'is_approved', 'date_incurred']
     search_fields = ['assignment__relocation_request__request_id', 'description']
-    readonly_fields = ['date_created']
+    readonly_fields = ['thumbnail', 'date_created']
+    raw_id_fields = ['assignment']
+    choice_select_related = {'submitted_by': ['user']}
@@ -0,0 +1,43 @@
+"""
+Parsing of ``InventoryTransfer.dimensions``.
+
+The field is free text meant to read "L x W x H in cm". ``parse_dimensions()``
+also accepts the usual variations (``×``, ``*`` or "by" between the numbers,
+decimal commas, a unit after each number or only after the last one) and
+converts to centimetres.
+
+Migration 0013 has the same parser in SQL, ``inventory_transfer_dimensions()``,
+for the trigger that sets the numeric columns on every write: changes here
+go there too.
+"""
+import re
+from decimal import ROUND_HALF_UP, Decimal
+
+CENTIMETRES = {'': 1, 'cm': 1, 'mm': Decimal('0.1'), 'm': 100, 'in': Decimal('2.54'), '"': Decimal('2.54')}
+
+# Largest side the numeric columns hold, in cm.
+MAX_SIDE = Decimal('99999.9')
+
+_SIDE = r'(\d+(?:[.,]\d+)?)\s*(mm|cm|m|in(?:ch(?:es)?)?|")?'
+_DIMENSIONS = re.compile(
+    rf'\s*{_SIDE}\s*(?:x|×|\*|by)\s*{_SIDE}\s*(?:x|×|\*|by)\s*{_SIDE}\s*$', re.IGNORECASE,
+)
+
+
+def parse_dimensions(text):
+    """
+    Return the ``(length, width, height)`` described by ``text`` as Decimals
+    in centimetres rounded half up to 1 mm, as PostgreSQL does, or None if it isn't three positive sizes.
+    Sizes without a unit take the unit of the last size, or cm.
+    """
+    match = _DIMENSIONS.match(text or '')
+    if not match:
+        return None
+    numbers, units = match.groups()[::2], [(unit or '').lower()[:2] for unit in match.groups()[1::2]]
+    sides = tuple(
+        (Decimal(number.replace(',', '.')) * CENTIMETRES[unit or units[-1]]).quantize(Decimal('0.1'), ROUND_HALF_UP)
+        for number, unit in zip(numbers, units)
+    )
+    if not all(0 < side <= MAX_SIDE for side in sides):
+        return None
+    return sides
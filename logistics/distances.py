@@ -0,0 +1,97 @@
+"""
+Estimated distances of assignments.
+
+Origins and destinations are geocoded offline from their ZIP codes with
+``smartmove.geocoding`` and the coordinates cached on ``Property`` and on the
+request's destination. ``backfill_distances()`` then computes the distances
+of any number of assignments in one pass: one query for the coordinates, one
+vectorized haversine, one ``UPDATE``. Triggers clear the coordinates when the
+ZIP code changes and the distances when the coordinates do, see migration
+logistics 0014, so the next backfill recomputes them.
+"""
+import numpy as np
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+
+from properties.models import Property
+from relocations.models import RelocationRequest
+from smartmove.bulkload import update_rows
+from smartmove.cache import rows_changed
+from smartmove.geocoding import haversine_km, locate
+
+from .models import MovingAssignment
+
+# Roads are longer than the great circle; typical ratio for road trips.
+DETOUR_FACTOR = 1.2
+
+
+def geocode_properties(queryset):
+    """Cache the coordinates of the properties of ``queryset`` that have none; return how many were found."""
+    rows = list(queryset.filter(latitude__isnull=True).values_list('pk', 'zip_code', 'country'))
+    if not rows:
+        return 0
+    pks, zip_codes, countries = zip(*rows)
+    return _save(Property, queryset.db, pks, zip_codes, countries, 'latitude', 'longitude')
+
+
+def geocode_destinations(queryset):
+    """
+    Cache the destination coordinates of the requests of ``queryset`` that
+    have no destination property, from ``destination_zip``; return how many
+    were found. Requests with a destination property use its coordinates.
+    """
+    rows = list(queryset.filter(
+        destination_property__isnull=True, destination_latitude__isnull=True,
+    ).values_list('pk', 'destination_zip', 'destination_country'))
+    if not rows:
+        return 0
+    pks, zip_codes, countries = zip(*rows)
+    return _save(
+        RelocationRequest, queryset.db, pks, zip_codes, countries, 'destination_latitude', 'destination_longitude',
+    )
+
+
+def _save(model, using, pks, zip_codes, countries, latitude, longitude):
+    latitudes, longitudes = locate(zip_codes, countries)
+    found = ~np.isnan(latitudes)
+    pks = np.array(pks)[found]
+    with connections[using].cursor() as cursor:
+        updated = update_rows(cursor, model, pks, **{latitude: latitudes[found], longitude: longitudes[found]})
+    rows_changed(model, pks.tolist())
+    return updated
+
+
+def backfill_distances(queryset=None, overwrite=False, detour_factor=DETOUR_FACTOR, using=DEFAULT_DB_ALIAS):
+    """
+    Set ``estimated_distance_km`` on the assignments of ``queryset``, by
+    default all of them, that have none, or on all of them with
+    ``overwrite``. Origins and destinations are geocoded first. Return the
+    number of assignments updated; those with an address that can't be
+    located are left as they are.
+    """
+    if queryset is None:
+        queryset = MovingAssignment.objects.using(using)
+    if not overwrite:
+        queryset = queryset.filter(estimated_distance_km__isnull=True)
+    requests = RelocationRequest.objects.using(queryset.db).filter(pk__in=queryset.values('relocation_request'))
+    geocode_properties(Property.objects.using(queryset.db).filter(
+        Q(pk__in=requests.values('origin_property')) | Q(pk__in=requests.values('destination_property')),
+    ))
+    geocode_destinations(requests)
+
+    request = 'relocation_request__'
+    rows = list(queryset.values_list(
+        'pk', f'{request}origin_property__latitude', f'{request}origin_property__longitude',
+        Coalesce(f'{request}destination_property__latitude', f'{request}destination_latitude'),
+        Coalesce(f'{request}destination_property__longitude', f'{request}destination_longitude'),
+    ))
+    if not rows:
+        return 0
+    pks, *coordinates = zip(*rows)
+    distances = haversine_km(*[np.array(column, dtype=float) for column in coordinates]) * detour_factor
+    found = ~np.isnan(distances)
+    with connections[queryset.db].cursor() as cursor:
+        return update_rows(
+            cursor, MovingAssignment, np.array(pks)[found], estimated_distance_km=np.round(distances[found], 2),
+        )
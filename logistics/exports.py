@@ -0,0 +1,33 @@
+from smartmove.exports import Export, register
+from .models import InventoryTransfer, MovingExpense
+
+register(Export(InventoryTransfer, [
+    ('request_id', 'assignment__relocation_request__request_id'),
+    ('crew_id', 'assignment__crew__crew_id'),
+    ('item_name', 'item_name'),
+    ('room_from', 'room_from'),
+    ('room_to', 'room_to'),
+    ('status', 'status'),
+    ('estimated_weight_kg', 'estimated_weight_kg'),
+    ('dimensions', 'dimensions'),
+    ('is_fragile', 'is_fragile'),
+    ('damage_reported', 'damage_reported'),
+    ('handled_by', 'handled_by__driver_id'),
+    ('packed_datetime', 'packed_datetime'),
+    ('loaded_datetime', 'loaded_datetime'),
+    ('delivered_datetime', 'delivered_datetime'),
+    ('date_created', 'date_created'),
+], name='inventory_transfers'))
+
+register(Export(MovingExpense, [
+    ('request_id', 'assignment__relocation_request__request_id'),
+    ('crew_id', 'assignment__crew__crew_id'),
+    ('expense_type', 'expense_type'),
+    ('amount', 'amount'),
+    ('description', 'description'),
+    ('date_incurred', 'date_incurred'),
+    ('submitted_by', 'submitted_by__driver_id'),
+    ('is_approved', 'is_approved'),
+    ('approved_by', 'approved_by__username'),
+    ('date_created', 'date_created'),
+], name='moving_expenses'))
@@ -0,0 +1,156 @@
+"""
+Vehicle load planning.
+
+``plan_load()`` assigns transfer items to vehicles with a first-fit
+decreasing heuristic on both capacities: items are taken by decreasing
+size, the larger of their share of the largest vehicle's weight and volume
+limits, and each goes into the first vehicle, largest first, with both
+weight and volume left for it. What doesn't fit the vehicles at hand goes
+into extra vehicles like the largest one, which tells how many vehicles the
+move needs. Fragile items are padded, as nothing can be stacked on them,
+and loaded last.
+
+``plan_assignments()`` plans the open transfers of assignments into their
+crews' vehicles, from two queries.
+"""
+from itertools import islice
+
+import numpy as np
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from smartmove.bulkload import update_rows
+
+from .dimensions import parse_dimensions
+from .models import InventoryTransfer, Vehicle
+
+# Transfers that still need room in a vehicle, as indexed by transfer_open_assignment_idx.
+OPEN_STATUSES = ['pending', 'packed', 'loaded', 'in_transit']
+
+# Assumed for items whose weight or dimensions aren't known.
+DEFAULT_WEIGHT_KG = 25
+DEFAULT_VOLUME_CUBIC_METERS = 0.1
+
+# Share of a vehicle's volume that boxes and furniture can actually fill.
+USABLE_VOLUME = 0.85
+# Volume taken by a fragile item, nothing being stacked on it.
+FRAGILE_PADDING = 1.5
+
+
+class LoadPlan:
+    """
+    The result of ``plan_load()``. ``loads`` maps the vehicles used to their
+    items in loading order, ``overflow`` lists the loads of the extra
+    vehicles needed, each like the largest vehicle, and ``unplaced`` are the
+    items too large for any vehicle.
+    """
+    def __init__(self, loads, overflow, unplaced, estimated):
+        self.loads = loads
+        self.overflow = overflow
+        self.unplaced = unplaced
+        # Items planned with the default weight or volume.
+        self.estimated = estimated
+
+    @property
+    def vehicles_needed(self):
+        return len(self.loads) + len(self.overflow)
+
+    @property
+    def fits(self):
+        return not self.overflow and not self.unplaced
+
+
+def plan_load(items, vehicles):
+    """
+    Plan the load of ``items``, ``(id, weight_kg, length_cm, width_cm,
+    height_cm, is_fragile)`` rows, into ``vehicles``, ``(id, max_weight_kg,
+    max_volume_cubic_meters)`` rows, and return a ``LoadPlan``.
+    """
+    items, vehicles = list(items), list(vehicles)
+    if not items:
+        return LoadPlan({}, [], [], 0)
+    ids, weights, lengths, widths, heights, fragile = zip(*items)
+    ids, fragile = np.array(ids), np.array(fragile, dtype=bool)
+    weights = np.array(weights, dtype=float)
+    volumes = np.array(lengths, dtype=float) * np.array(widths, dtype=float) * np.array(heights, dtype=float) / 1e6
+    estimated = int((np.isnan(weights) | np.isnan(volumes)).sum())
+    weights = np.where(np.isnan(weights), DEFAULT_WEIGHT_KG, weights)
+    volumes = np.where(np.isnan(volumes), DEFAULT_VOLUME_CUBIC_METERS, volumes)
+    volumes = np.where(fragile, volumes * FRAGILE_PADDING, volumes)
+    if not vehicles:
+        return LoadPlan({}, [], ids.tolist(), estimated)
+
+    vehicle_ids, max_weights, max_volumes = zip(*vehicles)
+    max_weights = np.array(max_weights, dtype=float)
+    max_volumes = np.array(max_volumes, dtype=float) * USABLE_VOLUME
+    largest = np.lexsort((-max_weights, -max_volumes))
+    vehicle_ids = np.array(vehicle_ids)[largest]
+    # Room left in each vehicle, followed by as many extra ones as there are items.
+    weight_left = np.concatenate([max_weights[largest], np.full(len(ids), max_weights[largest[0]])])
+    volume_left = np.concatenate([max_volumes[largest], np.full(len(ids), max_volumes[largest[0]])])
+
+    sizes = np.maximum(weights / weight_left[0], volumes / volume_left[0])
+    placed = np.full(len(ids), -1)
+    opened = len(vehicle_ids)
+    for i in np.argsort(-sizes, kind='stable'):
+        # Vehicles are opened in order, so the first unopened one is the last worth trying.
+        candidates = (weight_left[:opened + 1] >= weights[i]) & (volume_left[:opened + 1] >= volumes[i])
+        vehicle = candidates.argmax()
+        if not candidates[vehicle]:
+            continue
+        placed[i] = vehicle
+        weight_left[vehicle] -= weights[i]
+        volume_left[vehicle] -= volumes[i]
+        opened = max(opened, vehicle + 1)
+
+    # Load the heaviest first and the fragile items last.
+    loads = [ids[order].tolist() for order in _loads(placed, weights, fragile, opened)]
+    return LoadPlan(
+        {vehicle: load for vehicle, load in zip(vehicle_ids.tolist(), loads) if load},
+        loads[len(vehicle_ids):],
+        ids[placed == -1].tolist(),
+        estimated,
+    )
+
+
+def _loads(placed, weights, fragile, count):
+    order = np.lexsort((-weights, fragile, placed))
+    bounds = np.searchsorted(placed[order], np.arange(count + 1))
+    return [order[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def plan_assignments(assignments):
+    """
+    Plan the load of the open transfers of ``assignments``, a queryset, into
+    the active vehicles of their crews that are not out of service.
+    """
+    items = InventoryTransfer.objects.using(assignments.db).filter(
+        assignment__in=assignments, status__in=OPEN_STATUSES,
+    ).values_list('pk', 'estimated_weight_kg', 'length_cm', 'width_cm', 'height_cm', 'is_fragile')
+    vehicles = Vehicle.objects.using(assignments.db).filter(
+        assigned_crews__assignments__in=assignments, is_active=True, status__in=['available', 'in_use'],
+    ).distinct().values_list('pk', 'max_weight_kg', 'max_volume_cubic_meters')
+    return plan_load(items, vehicles)
+
+
+def backfill_dimensions(queryset=None, batch_size=50000, using=DEFAULT_DB_ALIAS):
+    """
+    Parse the dimensions of the transfers of ``queryset``, by default those
+    not parsed yet, into their numeric columns; return how many were parsed.
+    The trigger of migration 0013 parses those written since, so this is for
+    the rows from before it.
+    """
+    if queryset is None:
+        queryset = InventoryTransfer.objects.using(using).filter(length_cm__isnull=True).exclude(dimensions='')
+    rows = queryset.order_by().values_list('pk', 'dimensions').iterator(chunk_size=batch_size)
+    parsed = 0
+    while batch := list(islice(rows, batch_size)):
+        sides = [(pk, parse_dimensions(dimensions)) for pk, dimensions in batch]
+        sides = [(pk, *dimensions) for pk, dimensions in sides if dimensions]
+        if not sides:
+            continue
+        pks, lengths, widths, heights = zip(*sides)
+        with connections[queryset.db].cursor() as cursor:
+            parsed += update_rows(
+                cursor, InventoryTransfer, pks, length_cm=lengths, width_cm=widths, height_cm=heights,
+            )
+    return parsed
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from logistics.loading import backfill_dimensions
+
+
+class Command(BaseCommand):
+    help = (
+        'Parse the free-text dimensions of inventory transfers into their numeric columns, for the rows written '
+        'before the trigger that now does it on every write.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = backfill_dimensions(batch_size=options['batch_size'], using=options['database'])
+        self.stdout.write(f'Parsed the dimensions of {count} transfers in {time.perf_counter() - started:.2f}s.')
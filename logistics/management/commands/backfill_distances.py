@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from logistics.distances import DETOUR_FACTOR, backfill_distances
+
+
+class Command(BaseCommand):
+    help = (
+        'Geocode origins and destinations offline from their ZIP codes and set the estimated distance of '
+        'every assignment without one, in a single pass.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--overwrite', action='store_true', help='Recompute distances that are already set.')
+        parser.add_argument('--detour-factor', type=float, default=DETOUR_FACTOR)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = backfill_distances(
+            overwrite=options['overwrite'], detour_factor=options['detour_factor'], using=options['database'],
+        )
+        self.stdout.write(f'Set the estimated distance of {count} assignments in {time.perf_counter() - started:.2f}s.')
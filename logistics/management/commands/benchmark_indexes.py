@@ -0,0 +1,102 @@
+import re
+import statistics
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from clients.models import Client
+from properties.models import Property
+from relocations.models import RelocationRequest
+from logistics import synthetic
+from logistics.models import InventoryTransfer, MovingAssignment, MovingCrew, MovingExpense
+
+INDEXED_MODELS = [Client, Property, RelocationRequest, MovingAssignment, InventoryTransfer, MovingExpense]
+OPEN_REQUEST_STATUSES = ['pending', 'approved', 'in_progress', 'on_hold']
+EXECUTION_TIME = re.compile(r'Execution Time: ([\d.]+) ms')
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a synthetic dataset, then compare EXPLAIN ANALYZE plans and timings of the hot dispatch '
+        'queries without and with the indexes declared in Meta.indexes. Everything is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(synthetic.SCALES), default='1m')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query; the median is reported.')
+        parser.add_argument('--plans', action='store_true', help='Print the full query plans.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        connection = connections[using]
+        with transaction.atomic(using=using):
+            self.stdout.write(f"Generating the '{options['scale']}' dataset...")
+            created = synthetic.generate(synthetic.SCALES[options['scale']], using=using)
+            for model, count in created.items():
+                self.stdout.write(f'  {model._meta.label}: {count} rows')
+            queries = self.hot_queries(using)
+
+            with connection.schema_editor() as editor:
+                for model in INDEXED_MODELS:
+                    for index in model._meta.indexes:
+                        editor.remove_index(model, index)
+            self.analyze(connection)
+            before = {name: self.measure(qs, options['repeat']) for name, qs in queries}
+
+            with connection.schema_editor() as editor:
+                for model in INDEXED_MODELS:
+                    for index in model._meta.indexes:
+                        editor.add_index(model, index)
+            self.analyze(connection)
+            after = {name: self.measure(qs, options['repeat']) for name, qs in queries}
+
+            transaction.set_rollback(True, using=using)
+
+        self.stdout.write('')
+        self.stdout.write(f"{'query':<40} {'before ms':>12} {'after ms':>12} {'speedup':>9}")
+        for name, _ in queries:
+            (before_ms, before_plan), (after_ms, after_plan) = before[name], after[name]
+            speedup = before_ms / after_ms if after_ms else float('inf')
+            self.stdout.write(f'{name:<40} {before_ms:>12.3f} {after_ms:>12.3f} {speedup:>8.1f}x')
+            if options['plans']:
+                self.stdout.write(f'\n-- {name}: before\n{before_plan}\n\n-- {name}: after\n{after_plan}\n')
+
+    def hot_queries(self, using):
+        crew = MovingCrew.objects.using(using).filter(crew_id__startswith='SYN').order_by('id').first()
+        assignment = MovingAssignment.objects.using(using).filter(crew=crew).order_by('id').first()
+        week_start = timezone.now()
+        return [
+            ('open requests by priority', RelocationRequest.objects.using(using).filter(
+                status='pending', priority='urgent').order_by('preferred_date')[:100]),
+            ('open requests, newest first', RelocationRequest.objects.using(using).filter(
+                status__in=OPEN_REQUEST_STATUSES).order_by('-date_created')[:100]),
+            ('requests changelist page', RelocationRequest.objects.using(using).order_by('-date_created')[:100]),
+            ('crew schedule for a week', MovingAssignment.objects.using(using).filter(
+                crew=crew, scheduled_start_date__range=(week_start, week_start + timedelta(days=7)))),
+            ('open crew assignments', MovingAssignment.objects.using(using).filter(
+                crew=crew, status__in=['scheduled', 'in_progress']).order_by('scheduled_start_date')),
+            ('pending transfers of an assignment', InventoryTransfer.objects.using(using).filter(
+                assignment=assignment, status='pending')),
+            ('transfers changelist page', InventoryTransfer.objects.using(using).order_by('-date_created')[:100]),
+            ('unapproved expenses', MovingExpense.objects.using(using).filter(
+                is_approved=False).order_by('-date_incurred')[:100]),
+            ('active clients, newest first', Client.objects.using(using).filter(
+                is_active=True).order_by('-date_created')[:100]),
+            ('active properties, newest first', Property.objects.using(using).filter(
+                is_active=True).order_by('-date_created')[:100]),
+        ]
+
+    def analyze(self, connection):
+        with connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                cursor.execute('ANALYZE %s' % connection.ops.quote_name(model._meta.db_table))
+
+    def measure(self, queryset, repeat):
+        timings, plan = [], ''
+        for _ in range(repeat):
+            plan = queryset.explain(analyze=True, buffers=True)
+            timings.append(float(EXECUTION_TIME.search(plan).group(1)))
+        return statistics.median(timings), plan
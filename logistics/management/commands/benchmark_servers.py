@@ -0,0 +1,137 @@
+import json
+from pathlib import Path
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from relocations.models import RelocationRequest
+from smartmove.loadtest import load, logged_in, serve
+
+from ...models import MovingCrew
+
+# Share of the requests of each kind, roughly that of production: mostly polling, some back office.
+WEIGHTS = {
+    'api status': 30,
+    'api timeline': 15,
+    'api transfers': 15,
+    'admin changelist': 15,
+    'admin search': 10,
+    'admin change form': 15,
+}
+
+WSGI = 'smartmove.wsgi:application'
+ASGI = 'smartmove.asgi:application'
+
+
+def modes(threads):
+    """Return ``{mode: (app, gunicorn options, environment)}``, each process having ``threads`` connections."""
+    return {
+        'sync': (WSGI, ['--worker-class', 'sync'], {'GUNICORN_THREADS': '1'}),
+        'gthread': (
+            WSGI, ['--worker-class', 'gthread', '--threads', str(threads)], {'GUNICORN_THREADS': str(threads)},
+        ),
+        'asgi': (ASGI, ['--worker-class', 'uvicorn_worker.UvicornWorker'], {'DB_POOL_SIZE': str(threads)}),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay a mix of admin and tracking API traffic against gunicorn with sync, gthread and ASGI '
+        'workers, for each number of workers and of concurrent clients, and report the throughput and the '
+        'p50, p95 and p99 latencies of each kind of request. The servers use the database of the current '
+        'settings, which --generate fills with a synthetic dataset first. The mix is sampled from the '
+        'database, or read from a file written by --record, so that runs compare the same requests. A '
+        'superuser and its session are created for the run and deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=list(modes(1)), default=list(modes(1)))
+        parser.add_argument('--workers', type=int, nargs='+', default=[2])
+        parser.add_argument(
+            '--threads', type=int, default=8, help='Threads of gthread workers, and connections of ASGI ones.',
+        )
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50])
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per run.')
+        parser.add_argument('--generate', metavar='SCALE', help='Generate a synthetic dataset of this scale first.')
+        parser.add_argument('--sample', type=int, default=200, help='Relocation requests the mix is sampled from.')
+        parser.add_argument('--mix', help='Replay the mix recorded in this file.')
+        parser.add_argument('--record', help='Write the mix to this file.')
+        parser.add_argument('--output', help='Also write the results to this file, as JSON.')
+
+    def handle(self, *args, **options):
+        if options['generate'] and not MovingCrew.objects.filter(crew_id__startswith='LOAD').exists():
+            call_command('generate_data', scale=options['generate'], prefix='LOAD', stdout=self.stdout)
+        if options['mix']:
+            mix = json.loads(Path(options['mix']).read_text())
+        else:
+            mix = self.sample(options['sample'])
+        if options['record']:
+            Path(options['record']).write_text(json.dumps(mix, indent=2) + '\n')
+
+        results = []
+        user = User.objects.create_superuser('benchmark-servers', email='')
+        try:
+            with logged_in(user) as headers:
+                self.stdout.write(
+                    f"{'mode':<8} {'workers':>7} {'clients':>7} {'endpoint':<18} {'req/s':>8} "
+                    f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+                )
+                for mode in options['modes']:
+                    app, gunicorn_options, env = modes(options['threads'])[mode]
+                    for workers in options['workers']:
+                        with serve(app, '--workers', str(workers), *gunicorn_options, env=env) as port:
+                            # Warm up the workers and their connections.
+                            load(port, mix['paths'], workers * 4, 1, headers, mix['weights'])
+                            for concurrency in options['concurrency']:
+                                run = load(
+                                    port, mix['paths'], concurrency, options['duration'], headers, mix['weights'],
+                                )
+                                for kind, result in run.items():
+                                    results.append({
+                                        'mode': mode, 'workers': workers, 'concurrency': concurrency,
+                                        'endpoint': kind, **result,
+                                    })
+                                    self.stdout.write(
+                                        f"{mode:<8} {workers:>7} {concurrency:>7} {kind:<18} "
+                                        f"{result['rate']:>8.1f} {self.ms(result['p50'])} "
+                                        f"{self.ms(result['p95'])} {self.ms(result['p99'])} {result['errors']:>7}"
+                                    )
+        finally:
+            user.delete()
+        if options['output']:
+            Path(options['output']).write_text(json.dumps({
+                'threads': options['threads'], 'duration': options['duration'], 'results': results,
+            }, indent=2) + '\n')
+
+    def sample(self, size):
+        """Return the mix of ``WEIGHTS``, its paths those of ``size`` relocation requests picked at random."""
+        requests = list(RelocationRequest.objects.select_related('client').order_by('?')[:size])
+        if not requests:
+            raise CommandError('There are no relocation requests; pass --generate.')
+        changelists = [
+            reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+            for model in admin.site._registry
+        ]
+        requests_changelist = reverse('admin:relocations_relocationrequest_changelist')
+        clients_changelist = reverse('admin:clients_client_changelist')
+        paths = {
+            'api status': [reverse('api-request-status', args=[r.request_id]) for r in requests],
+            'api timeline': [reverse('api-request-timeline', args=[r.request_id]) for r in requests],
+            'api transfers': [reverse('api-transfer-status', args=[r.request_id]) for r in requests],
+            'admin changelist': changelists,
+            'admin search': [
+                *(f"{requests_changelist}?{urlencode({'q': r.request_id})}" for r in requests),
+                *(f"{clients_changelist}?{urlencode({'q': r.client.last_name})}" for r in requests),
+            ],
+            'admin change form': [
+                reverse('admin:relocations_relocationrequest_change', args=[r.pk]) for r in requests
+            ],
+        }
+        return {'weights': WEIGHTS, 'paths': paths}
+
+    def ms(self, value):
+        return f'{value:>9.1f}' if value is not None else f"{'-':>9}"
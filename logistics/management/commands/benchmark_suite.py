@@ -0,0 +1,187 @@
+import json
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from smartmove.admin import ExportMixin
+
+from ...manifest import sync_manifest
+from ...models import MovingAssignment
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the admin changelists, change forms with their inlines, searches and exports, and manifest '
+        'syncing against the current database, and write the wall time and queries of each as JSON. Given '
+        'the JSON of an earlier run, such as one on the parent commit, report the differences and fail on '
+        'regressions. A superuser is created for the run and deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per case, after a warm-up.')
+        parser.add_argument(
+            '--export-rows', type=int, default=500,
+            help='Rows selected for the export actions, fewer than DATA_UPLOAD_MAX_NUMBER_FIELDS.',
+        )
+        parser.add_argument('--only', help='Run the cases whose name contains this.')
+        parser.add_argument('--output', help='Write the results to this file rather than to stdout.')
+        parser.add_argument('--compare', help='Results of an earlier run to compare with.')
+        parser.add_argument(
+            '--threshold', type=float, default=20,
+            help='Percentage by which the median time may grow before a case counts as a regression.',
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.create_superuser('benchmark-suite', email='')
+        client = Client()
+        client.force_login(user)
+        try:
+            results = {}
+            for name, run in self.cases(client, options['export_rows']):
+                if options['only'] and options['only'] not in name:
+                    continue
+                results[name] = self.measure(run, options['repeat'])
+                self.stderr.write(f"{name}: {results[name]['median_ms']:.1f} ms, {results[name]['queries']} queries")
+        finally:
+            client.logout()
+            user.delete()
+        report = {
+            'commit': self.commit(),
+            'date': timezone.now().isoformat(),
+            'database': connections[DEFAULT_DB_ALIAS].settings_dict['NAME'],
+            'rows': {
+                model._meta.label: model._default_manager.count() for model in admin.site._registry
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            Path(options['output']).write_text(output + '\n')
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            baseline = json.loads(Path(options['compare']).read_text())
+            regressions = self.compare(baseline, report, options['threshold'])
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions: {', '.join(regressions)}.")
+
+    def cases(self, client, export_rows):
+        """Yield ``(name, run)``, ``run`` making one request, or call, and returning the response."""
+        for model, model_admin in sorted(admin.site._registry.items(), key=lambda item: item[0]._meta.label):
+            opts = model._meta
+            changelist = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+            yield f'{opts.label} changelist', get(client, changelist)
+            pks = list(model._default_manager.order_by('pk').values_list('pk', flat=True)[:export_rows])
+            if pks:
+                change = reverse(f'admin:{opts.app_label}_{opts.model_name}_change', args=[pks[0]])
+                yield f'{opts.label} change form', get(client, change)
+            term = self.search_term(model, model_admin)
+            if term:
+                yield f'{opts.label} search', get(client, changelist, {'q': term})
+            if pks and isinstance(model_admin, ExportMixin):
+                for action in ExportMixin.actions:
+                    yield f'{opts.label} {action}', post(client, changelist, {
+                        'action': action, 'index': 0, ACTION_CHECKBOX_NAME: pks,
+                    })
+        assignment = MovingAssignment.objects.filter(
+            relocation_request__origin_property__inventory__isnull=False,
+        ).order_by('pk').first()
+        if assignment is not None:
+            yield 'sync_manifest', lambda: rolled_back(sync_manifest, assignment)
+
+    def search_term(self, model, model_admin):
+        """Return a word of the first row, from the first search field on the model itself."""
+        fields = [name.lstrip('^=@') for name in model_admin.search_fields if '__' not in name]
+        if not fields:
+            return None
+        value = model._default_manager.order_by('pk').values_list(fields[0], flat=True).first()
+        return str(value).split()[0] if value and str(value).split() else None
+
+    def measure(self, run, repeat):
+        connection = connections[DEFAULT_DB_ALIAS]
+        # Warm up caches, connections and imports.
+        self.check_response(run())
+        timings, db_timings, queries = [], [], 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                self.check_response(run())
+                timings.append((time.perf_counter() - start) * 1000)
+            db_timings.append(sum(float(query['time']) for query in context.captured_queries) * 1000)
+            queries = len(context.captured_queries)
+        return {
+            'median_ms': round(statistics.median(timings), 3),
+            'min_ms': round(min(timings), 3),
+            'db_ms': round(statistics.median(db_timings), 3),
+            'queries': queries,
+        }
+
+    def check_response(self, response):
+        if getattr(response, 'status_code', 200) >= 400:
+            raise CommandError(f'{response.request["PATH_INFO"]} answered {response.status_code}.')
+
+    def compare(self, baseline, report, threshold):
+        """Write the changes from ``baseline`` and return the names of the cases that regressed."""
+        self.stderr.write(f"\nCompared with {baseline.get('commit') or 'the baseline'}:")
+        self.stderr.write(
+            f"{'case':<50} {'before ms':>10} {'after ms':>10} {'change':>8} {'queries':>9}"
+        )
+        regressions = []
+        for name, after in report['results'].items():
+            before = baseline['results'].get(name)
+            if before is None:
+                self.stderr.write(f'{name:<50} {"new":>10}')
+                continue
+            change = (after['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0
+            regressed = change > threshold or after['queries'] > before['queries']
+            if regressed:
+                regressions.append(name)
+            self.stderr.write(
+                f"{name:<50} {before['median_ms']:>10.1f} {after['median_ms']:>10.1f} {change:>+7.0f}% "
+                f"{before['queries']:>4}>{after['queries']:<4}{' REGRESSION' if regressed else ''}"
+            )
+        return regressions
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+def get(client, path, data=None):
+    return lambda: consume(client.get(path, data))
+
+
+def post(client, path, data):
+    return lambda: consume(client.post(path, data))
+
+
+def consume(response):
+    """Read streamed responses to the end, as their rows are only queried then."""
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def rolled_back(function, *args):
+    with transaction.atomic():
+        result = function(*args)
+        transaction.set_rollback(True)
+    return result
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from logistics import synthetic
+from logistics.models import MovingCrew
+
+COUNTS = sorted(synthetic.SCALES['small'])
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a synthetic dataset for benchmarks, in one transaction: clients, properties and their inventory, '
+        'relocation requests with their quotes and timelines, vehicles, drivers and crews, assignments, transfers '
+        'and expenses, with skewed distributions. Natural IDs start with the prefix, so that datasets can be told apart from real data '
+        'and from one another.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(synthetic.SCALES), default='small')
+        for name in COUNTS:
+            parser.add_argument(f'--{name}', type=int, help=f'Number of {name}, instead of that of the scale.')
+        parser.add_argument('--prefix', default='SYN')
+        parser.add_argument('--seed', type=float, default=0.42, help='Between -1 and 1.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        counts = {
+            name: options[name] if options[name] is not None else count
+            for name, count in synthetic.SCALES[options['scale']].items()
+        }
+        if MovingCrew.objects.using(using).filter(crew_id__startswith=options['prefix']).exists():
+            raise CommandError(f"There already is a dataset with prefix {options['prefix']!r}; choose another.")
+        start = time.perf_counter()
+        with transaction.atomic(using=using):
+            created = synthetic.generate(counts, prefix=options['prefix'], seed=options['seed'], using=using)
+        for model, count in created.items():
+            self.stdout.write(f'{model._meta.label}: {count} rows')
+        self.stdout.write(f'Generated {sum(created.values())} rows in {time.perf_counter() - start:.1f} s.')
@@ -0,0 +1,79 @@
+"""
+Transfer manifests.
+
+An assignment's manifest has one ``InventoryTransfer`` per ``PropertyInventory``
+item of the origin property, linked through ``inventory_item``.
+``sync_manifest()`` builds it and keeps it in line with the inventory in a
+single statement, however many items there are.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from properties.models import PropertyInventory
+from relocations.models import RelocationRequest
+from smartmove.bulkload import insert_select_sql
+
+from .models import InventoryTransfer, MovingAssignment
+
+# Transfer fields copied from the inventory item's columns.
+ITEM_COLUMNS = {
+    'item_name': 'item_name',
+    'description': 'description',
+    'room_from': 'room',
+    'is_fragile': 'is_fragile',
+    'requires_disassembly': 'requires_special_handling',
+}
+
+
+def item_values(table):
+    """Return the ``ITEM_COLUMNS`` expressions for inventory rows selected as ``table``."""
+    return {field: f'{table}.{column}' for field, column in ITEM_COLUMNS.items()}
+
+
+def sync_manifest(assignment, using=DEFAULT_DB_ALIAS):
+    """
+    Bring the manifest of ``assignment`` in line with its origin property's
+    inventory and return ``(added, updated, removed)``: transfers are added
+    for new items, pending transfers are updated when their item changed and
+    deleted when it left the property. Transfers past pending are left as the
+    crew recorded them, and running it again changes nothing.
+    """
+    connection = connections[using]
+    transfers = InventoryTransfer._meta.db_table
+    insert, defaults = insert_select_sql(connection, InventoryTransfer, {
+        'assignment_id': str(int(assignment.pk)),
+        'inventory_item_id': 'i.id',
+        **item_values('i'),
+    }, f'items i WHERE NOT EXISTS (SELECT FROM {transfers} t WHERE t.assignment_id = %s AND t.inventory_item_id = i.id)')
+    values = ', '.join(item_values('i').values())
+    fields = ', '.join(ITEM_COLUMNS)
+    with transaction.atomic(using), connection.cursor() as cursor:
+        # Syncs of an assignment take turns, so that the second adds what the first didn't rather
+        # than fail on the same items: transfers are partitioned, and the key table rejecting a
+        # second transfer of an item isn't one they can be added to ON CONFLICT DO NOTHING.
+        cursor.execute(
+            f'SELECT FROM {MovingAssignment._meta.db_table} WHERE id = %s FOR NO KEY UPDATE', [assignment.pk],
+        )
+        cursor.execute(f"""
+            WITH items AS (
+                SELECT i.* FROM {PropertyInventory._meta.db_table} i
+                JOIN {RelocationRequest._meta.db_table} r ON r.origin_property_id = i.property_id
+                JOIN {MovingAssignment._meta.db_table} a ON a.relocation_request_id = r.id
+                WHERE a.id = %s
+            ), removed AS (
+                DELETE FROM {transfers} t
+                WHERE t.assignment_id = %s AND t.status = 'pending' AND t.inventory_item_id IS NOT NULL
+                AND NOT EXISTS (SELECT FROM items i WHERE i.id = t.inventory_item_id)
+                RETURNING 1
+            ), updated AS (
+                UPDATE {transfers} t SET ({fields}) = ROW({values})
+                FROM items i
+                WHERE t.assignment_id = %s AND t.inventory_item_id = i.id AND t.status = 'pending'
+                AND ({', '.join(f't.{field}' for field in ITEM_COLUMNS)}) IS DISTINCT FROM ({values})
+                RETURNING 1
+            ), added AS (
+                {insert}
+                RETURNING 1
+            )
+            SELECT (SELECT count(*) FROM added), (SELECT count(*) FROM updated), (SELECT count(*) FROM removed)
+        """, [assignment.pk, assignment.pk, assignment.pk, *defaults, assignment.pk])
+        return cursor.fetchone()
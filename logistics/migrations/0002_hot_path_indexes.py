@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:19
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking out writes on the large tables.
+    atomic = False
+
+    dependencies = [
+        ('logistics', '0001_initial'),
+        ('relocations', '0002_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='inventorytransfer',
+            index=models.Index(fields=['assignment', 'status'], name='transfer_assignment_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='inventorytransfer',
+            index=models.Index(fields=['-date_created'], name='transfer_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='inventorytransfer',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'packed', 'loaded', 'in_transit'])), fields=['assignment'], name='transfer_open_assignment_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='movingassignment',
+            index=models.Index(fields=['-scheduled_start_date'], name='assignment_start_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='movingassignment',
+            index=models.Index(fields=['crew', 'scheduled_start_date'], name='assignment_crew_start_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='movingassignment',
+            index=models.Index(condition=models.Q(('status__in', ['scheduled', 'in_progress'])), fields=['crew', 'scheduled_start_date'], name='assignment_open_crew_start_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='movingexpense',
+            index=models.Index(fields=['is_approved', '-date_incurred'], name='expense_approved_incurred_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='movingexpense',
+            index=models.Index(condition=models.Q(('is_approved', False)), fields=['-date_incurred'], name='expense_unapproved_idx'),
+        ),
+    ]
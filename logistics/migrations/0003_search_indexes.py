@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:28
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('logistics', '0002_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='inventorytransfer',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('item_name', 'room_from', 'room_to', config='simple'), name='transfer_search_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='movingexpense',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('description', config='simple'), name='expense_search_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:58
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import smartmove.ranges
+from django.core.management import CommandError
+from django.db import migrations, models
+
+# The conflicts listed when the existing assignments break the constraints.
+MAX_LISTED = 20
+
+
+def check_schedules(apps, schema_editor):
+    """
+    Fail with the assignments that break the constraints below, which have
+    to be rescheduled or cancelled first: which to change is not for a
+    migration to decide.
+    """
+    table = apps.get_model('logistics', 'MovingAssignment')._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id FROM {table} WHERE scheduled_end_date <= scheduled_start_date ORDER BY id'
+        )
+        inverted = [f'#{pk}' for pk, in cursor.fetchall()]
+        cursor.execute(
+            f'SELECT a.crew_id, a.id, b.id FROM {table} a JOIN {table} b ON b.crew_id = a.crew_id AND b.id > a.id '
+            f"WHERE a.status IN ('scheduled', 'in_progress') AND b.status IN ('scheduled', 'in_progress') "
+            f'AND a.scheduled_end_date > a.scheduled_start_date AND b.scheduled_end_date > b.scheduled_start_date '
+            f'AND tstzrange(a.scheduled_start_date, a.scheduled_end_date) && '
+            f'tstzrange(b.scheduled_start_date, b.scheduled_end_date) '
+            f'ORDER BY a.crew_id, a.id, b.id'
+        )
+        overlapping = [f'#{a} and #{b} (crew #{crew})' for crew, a, b in cursor.fetchall()]
+    problems = []
+    for description, conflicts in [
+        ('assignments ending before they start', inverted),
+        ('overlapping open assignments of a crew', overlapping),
+    ]:
+        if conflicts:
+            listed = ', '.join(conflicts[:MAX_LISTED]) + (', ...' if len(conflicts) > MAX_LISTED else '')
+            problems.append(f'{len(conflicts)} {description}: {listed}')
+    if problems:
+        raise CommandError(
+            'Reschedule or cancel these before migrating, the new constraints reject them.\n' + '\n'.join(problems)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0003_search_indexes'),
+        ('relocations', '0004_timeline_ordering_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_schedules, migrations.RunPython.noop, elidable=True),
+        # Both constraints check the existing rows under the ACCESS EXCLUSIVE
+        # lock they are added with. The exclusion constraint can't be added
+        # NOT VALID, so validating the check separately wouldn't shorten it.
+        migrations.AddConstraint(
+            model_name='movingassignment',
+            constraint=models.CheckConstraint(condition=models.Q(('scheduled_end_date__gt', models.F('scheduled_start_date'))), name='assignment_end_after_start', violation_error_message='The scheduled end must be after the scheduled start.'),
+        ),
+        migrations.AddConstraint(
+            model_name='movingassignment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status__in', ['scheduled', 'in_progress'])), expressions=[(smartmove.ranges.Int8Range('crew', 'crew', django.contrib.postgres.fields.ranges.RangeBoundary(inclusive_upper=True)), '&&'), (smartmove.ranges.TsTzRange('scheduled_start_date', 'scheduled_end_date', django.contrib.postgres.fields.ranges.RangeBoundary()), '&&')], name='assignment_no_crew_overlap', violation_error_message='This crew is already booked for an overlapping assignment.'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0004_assignment_scheduling_constraints'),
+        ('properties', '0003_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorytransfer',
+            name='inventory_item',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Inventory item the transfer was generated from', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transfers', to='properties.propertyinventory'),
+        ),
+        migrations.AddConstraint(
+            model_name='inventorytransfer',
+            constraint=models.UniqueConstraint(fields=('inventory_item', 'assignment'), name='transfer_item_assignment_uniq'),
+        ),
+    ]
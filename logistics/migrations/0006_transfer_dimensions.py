@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0005_inventory_transfer_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorytransfer',
+            name='height_cm',
+            field=models.DecimalField(blank=True, decimal_places=1, editable=False, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='inventorytransfer',
+            name='length_cm',
+            field=models.DecimalField(blank=True, decimal_places=1, editable=False, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='inventorytransfer',
+            name='width_cm',
+            field=models.DecimalField(blank=True, decimal_places=1, editable=False, max_digits=6, null=True),
+        ),
+    ]
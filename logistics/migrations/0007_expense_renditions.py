@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0006_transfer_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movingexpense',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
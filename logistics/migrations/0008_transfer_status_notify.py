@@ -0,0 +1,44 @@
+from django.db import migrations
+
+# Publishes status changes on the channel smartmove.events listens to. The
+# trigger runs once per statement, so that a bulk update joins the
+# assignments once rather than once per row.
+NOTIFY_FUNCTION = """
+CREATE FUNCTION inventory_transfer_notify() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('relocation_events', json_build_object(
+        'type', 'transfer',
+        'request', a.relocation_request_id,
+        'id', n.id,
+        'status', n.status,
+        'previous_status', o.status
+    )::text)
+    FROM new_transfers n
+    JOIN old_transfers o ON o.id = n.id
+    JOIN logistics_movingassignment a ON a.id = n.assignment_id
+    WHERE n.status IS DISTINCT FROM o.status;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER inventory_transfer_notify
+    AFTER UPDATE ON logistics_inventorytransfer
+    REFERENCING OLD TABLE AS old_transfers NEW TABLE AS new_transfers
+    FOR EACH STATEMENT EXECUTE FUNCTION inventory_transfer_notify();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0007_expense_renditions'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            NOTIFY_FUNCTION,
+            reverse_sql="""
+            DROP TRIGGER inventory_transfer_notify ON logistics_inventorytransfer;
+            DROP FUNCTION inventory_transfer_notify();
+            """,
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+from smartmove.facets import CreateFacet
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0008_transfer_status_notify'),
+    ]
+
+    operations = [
+        CreateFacet('vehicle', 'make'),
+        CreateFacet('vehicle', 'year'),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+from smartmove.partitions import PartitionByRange
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0009_vehicle_facets'),
+    ]
+
+    operations = [
+        # A partitioned table's unique constraints must include the partition column.
+        migrations.RemoveConstraint(
+            model_name='inventorytransfer',
+            name='transfer_item_assignment_uniq',
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransfer',
+            index=models.Index(fields=['inventory_item', 'assignment'], name='transfer_item_assignment_idx'),
+        ),
+        PartitionByRange('inventorytransfer', 'date_created'),
+        PartitionByRange('movingexpense', 'date_incurred'),
+    ]
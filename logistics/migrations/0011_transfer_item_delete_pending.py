@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:44
+
+import logistics.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0010_partition_transfers_expenses'),
+        ('properties', '0006_property_facets'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorytransfer',
+            name='inventory_item',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Inventory item the transfer was generated from', null=True, on_delete=logistics.models.delete_if_pending, related_name='transfers', to='properties.propertyinventory'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+from django.db import migrations
+
+# An inventory item appears at most once in an assignment's manifest. The
+# transfers are partitioned by date_created, which a unique constraint on
+# them would have to include, so the pairs are kept in a table of their
+# own, whose primary key rejects a second transfer of an item, whatever
+# writes it. Statement triggers keep it in line, once per statement;
+# archive_partitions removes the pairs of the partitions it detaches.
+KEYS = """
+CREATE TABLE logistics_inventorytransfer_item_key (
+    assignment_id bigint NOT NULL,
+    inventory_item_id bigint NOT NULL,
+    CONSTRAINT transfer_item_assignment_uniq PRIMARY KEY (inventory_item_id, assignment_id)
+);
+CREATE FUNCTION inventory_transfer_item_keys() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO logistics_inventorytransfer_item_key (inventory_item_id, assignment_id)
+        SELECT inventory_item_id, assignment_id FROM new_rows WHERE inventory_item_id IS NOT NULL ORDER BY 1, 2;
+    ELSIF TG_OP = 'DELETE' THEN
+        DELETE FROM logistics_inventorytransfer_item_key k USING old_rows o
+        WHERE k.inventory_item_id = o.inventory_item_id AND k.assignment_id = o.assignment_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- The pairs of the transfers whose item or assignment changed, freed before taken.
+        DELETE FROM logistics_inventorytransfer_item_key k USING old_rows o JOIN new_rows n ON n.id = o.id
+        WHERE k.inventory_item_id = o.inventory_item_id AND k.assignment_id = o.assignment_id
+        AND (n.inventory_item_id, n.assignment_id) IS DISTINCT FROM (o.inventory_item_id, o.assignment_id);
+        INSERT INTO logistics_inventorytransfer_item_key (inventory_item_id, assignment_id)
+        SELECT n.inventory_item_id, n.assignment_id FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE n.inventory_item_id IS NOT NULL
+        AND (n.inventory_item_id, n.assignment_id) IS DISTINCT FROM (o.inventory_item_id, o.assignment_id)
+        ORDER BY 1, 2;
+    ELSE
+        TRUNCATE logistics_inventorytransfer_item_key;
+    END IF;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER inventory_transfer_item_keys_insert
+    AFTER INSERT ON logistics_inventorytransfer REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION inventory_transfer_item_keys();
+CREATE TRIGGER inventory_transfer_item_keys_update
+    AFTER UPDATE ON logistics_inventorytransfer REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION inventory_transfer_item_keys();
+CREATE TRIGGER inventory_transfer_item_keys_delete
+    AFTER DELETE ON logistics_inventorytransfer REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION inventory_transfer_item_keys();
+CREATE TRIGGER inventory_transfer_item_keys_truncate
+    AFTER TRUNCATE ON logistics_inventorytransfer
+    FOR EACH STATEMENT EXECUTE FUNCTION inventory_transfer_item_keys();
+INSERT INTO logistics_inventorytransfer_item_key (inventory_item_id, assignment_id)
+SELECT inventory_item_id, assignment_id FROM logistics_inventorytransfer WHERE inventory_item_id IS NOT NULL;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0011_transfer_item_delete_pending'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            KEYS,
+            reverse_sql="""
+            DROP TRIGGER inventory_transfer_item_keys_insert ON logistics_inventorytransfer;
+            DROP TRIGGER inventory_transfer_item_keys_update ON logistics_inventorytransfer;
+            DROP TRIGGER inventory_transfer_item_keys_delete ON logistics_inventorytransfer;
+            DROP TRIGGER inventory_transfer_item_keys_truncate ON logistics_inventorytransfer;
+            DROP FUNCTION inventory_transfer_item_keys();
+            DROP TABLE logistics_inventorytransfer_item_key;
+            """,
+        ),
+    ]
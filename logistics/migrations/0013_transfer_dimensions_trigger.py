@@ -0,0 +1,67 @@
+from django.db import migrations
+
+# logistics.dimensions.parse_dimensions() in SQL, for a trigger to set the
+# numeric sides of every transfer written, whatever the code path: update(),
+# bulk_create(), sync_manifest() or the importer's INSERT ... SELECT.
+DIMENSIONS = r"""
+CREATE FUNCTION inventory_transfer_dimensions(dimensions text) RETURNS numeric[]
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    parts text[] := regexp_match(
+        dimensions,
+        '^\s*(\d+(?:[.,]\d+)?)\s*(mm|cm|m|in(?:ch(?:es)?)?|")?\s*(?:x|×|\*|by)'
+        '\s*(\d+(?:[.,]\d+)?)\s*(mm|cm|m|in(?:ch(?:es)?)?|")?\s*(?:x|×|\*|by)'
+        '\s*(\d+(?:[.,]\d+)?)\s*(mm|cm|m|in(?:ch(?:es)?)?|")?\s*$',
+        'i'
+    );
+    unit text;
+    sides numeric[];
+BEGIN
+    IF parts IS NULL THEN
+        RETURN NULL;
+    END IF;
+    FOR i IN 1..3 LOOP
+        -- Sizes without a unit take the unit of the last size, or cm.
+        unit := lower(left(coalesce(parts[2 * i], parts[6], ''), 2));
+        sides[i] := round(replace(parts[2 * i - 1], ',', '.')::numeric * CASE unit
+            WHEN 'mm' THEN 0.1 WHEN 'm' THEN 100 WHEN 'in' THEN 2.54 WHEN '"' THEN 2.54 ELSE 1
+        END, 1);
+        IF NOT sides[i] BETWEEN 0.1 AND 99999.9 THEN
+            RETURN NULL;
+        END IF;
+    END LOOP;
+    RETURN sides;
+END
+$$;
+CREATE FUNCTION inventory_transfer_set_dimensions() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    sides numeric[] := inventory_transfer_dimensions(NEW.dimensions);
+BEGIN
+    NEW.length_cm := sides[1];
+    NEW.width_cm := sides[2];
+    NEW.height_cm := sides[3];
+    RETURN NEW;
+END
+$$;
+CREATE TRIGGER inventory_transfer_dimensions
+    BEFORE INSERT OR UPDATE OF dimensions, length_cm, width_cm, height_cm ON logistics_inventorytransfer
+    FOR EACH ROW EXECUTE FUNCTION inventory_transfer_set_dimensions();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0012_transfer_item_keys'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            DIMENSIONS,
+            reverse_sql="""
+            DROP TRIGGER inventory_transfer_dimensions ON logistics_inventorytransfer;
+            DROP FUNCTION inventory_transfer_set_dimensions();
+            DROP FUNCTION inventory_transfer_dimensions(text);
+            """,
+        ),
+    ]
@@ -0,0 +1,82 @@
+from django.db import migrations
+
+# The coordinates cached from a ZIP code are cleared when it changes without
+# them, and the estimated distances of the assignments when the coordinates
+# of their origin or destination change, whatever the code path: save(),
+# update() or plain SQL. backfill_distances() then geocodes them again and
+# recomputes the distances. The admin geocodes on save, in the same UPDATE,
+# which keeps its coordinates.
+COORDINATES = """
+CREATE FUNCTION property_clear_coordinates() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.latitude := NULL;
+    NEW.longitude := NULL;
+    RETURN NEW;
+END
+$$;
+CREATE TRIGGER property_clear_coordinates BEFORE UPDATE ON properties_property FOR EACH ROW
+    WHEN ((NEW.zip_code, NEW.country) IS DISTINCT FROM (OLD.zip_code, OLD.country)
+    AND (NEW.latitude, NEW.longitude) IS NOT DISTINCT FROM (OLD.latitude, OLD.longitude))
+    EXECUTE FUNCTION property_clear_coordinates();
+CREATE FUNCTION property_clear_distances() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE logistics_movingassignment a SET estimated_distance_km = NULL
+    FROM relocations_relocationrequest r
+    WHERE a.relocation_request_id = r.id AND NEW.id IN (r.origin_property_id, r.destination_property_id)
+    AND a.estimated_distance_km IS NOT NULL;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER property_clear_distances AFTER UPDATE ON properties_property FOR EACH ROW
+    WHEN ((NEW.latitude, NEW.longitude) IS DISTINCT FROM (OLD.latitude, OLD.longitude))
+    EXECUTE FUNCTION property_clear_distances();
+
+CREATE FUNCTION relocation_request_clear_coordinates() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.destination_latitude := NULL;
+    NEW.destination_longitude := NULL;
+    RETURN NEW;
+END
+$$;
+CREATE TRIGGER relocation_request_clear_coordinates BEFORE UPDATE ON relocations_relocationrequest FOR EACH ROW
+    WHEN ((NEW.destination_zip, NEW.destination_country) IS DISTINCT FROM (OLD.destination_zip, OLD.destination_country)
+    AND (NEW.destination_latitude, NEW.destination_longitude)
+    IS NOT DISTINCT FROM (OLD.destination_latitude, OLD.destination_longitude))
+    EXECUTE FUNCTION relocation_request_clear_coordinates();
+CREATE FUNCTION relocation_request_clear_distances() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE logistics_movingassignment SET estimated_distance_km = NULL
+    WHERE relocation_request_id = NEW.id AND estimated_distance_km IS NOT NULL;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER relocation_request_clear_distances AFTER UPDATE ON relocations_relocationrequest FOR EACH ROW
+    WHEN ((NEW.origin_property_id, NEW.destination_property_id, NEW.destination_latitude, NEW.destination_longitude)
+    IS DISTINCT FROM (OLD.origin_property_id, OLD.destination_property_id, OLD.destination_latitude, OLD.destination_longitude))
+    EXECUTE FUNCTION relocation_request_clear_distances();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0013_transfer_dimensions_trigger'),
+        ('properties', '0006_property_facets'),
+        ('relocations', '0014_relocationrequest_current_milestone_facet'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            COORDINATES,
+            reverse_sql="""
+            DROP TRIGGER property_clear_coordinates ON properties_property;
+            DROP TRIGGER property_clear_distances ON properties_property;
+            DROP FUNCTION property_clear_coordinates();
+            DROP FUNCTION property_clear_distances();
+            DROP TRIGGER relocation_request_clear_coordinates ON relocations_relocationrequest;
+            DROP TRIGGER relocation_request_clear_distances ON relocations_relocationrequest;
+            DROP FUNCTION relocation_request_clear_coordinates();
+            DROP FUNCTION relocation_request_clear_distances();
+            """,
+        ),
+    ]
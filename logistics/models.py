@@ -1,7 +1,14 @@
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, RegexValidator
 from django.contrib.auth.models import User
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import RangeBoundary, RangeOperators
+from properties.models import PropertyInventory
 from relocations.models import RelocationRequest
+from smartmove.ranges import Int8Range, TsTzRange
+from smartmove.search import search_index
+from .dimensions import parse_dimensions
 
 class Vehicle(models.Model):
     VEHICLE_TYPES = [
@@ -140,6 +147,42 @@ class MovingAssignment(models.Model):
     
     class Meta:
         ordering = ['-scheduled_start_date']
+        indexes = [
+            models.Index(fields=['-scheduled_start_date'], name='assignment_start_idx'),
+            models.Index(fields=['crew', 'scheduled_start_date'], name='assignment_crew_start_idx'),
+            models.Index(
+                fields=['crew', 'scheduled_start_date'],
+                condition=models.Q(status__in=['scheduled', 'in_progress']),
+                name='assignment_open_crew_start_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(scheduled_end_date__gt=models.F('scheduled_start_date')),
+                name='assignment_end_after_start',
+                violation_error_message='The scheduled end must be after the scheduled start.',
+            ),
+            # A crew can't have two open assignments whose [start, end) periods overlap.
+            ExclusionConstraint(
+                name='assignment_no_crew_overlap',
+                expressions=[
+                    (Int8Range('crew', 'crew', RangeBoundary(inclusive_upper=True)), RangeOperators.OVERLAPS),
+                    (TsTzRange('scheduled_start_date', 'scheduled_end_date', RangeBoundary()), RangeOperators.OVERLAPS),
+                ],
+                condition=models.Q(status__in=['scheduled', 'in_progress']),
+                violation_error_message='This crew is already booked for an overlapping assignment.',
+            ),
+        ]
+
+def delete_if_pending(collector, field, sub_objs, using):
+    """
+    ``on_delete`` of a transfer's inventory item: pending transfers of the
+    item go with it, as there is nothing left to move; the others keep the
+    crew's record, unlinked.
+    """
+    models.CASCADE(collector, field, sub_objs.filter(status='pending'), using)
+    models.SET_NULL(collector, field, sub_objs.exclude(status='pending'), using)
+
 
 class InventoryTransfer(models.Model):
     STATUS_CHOICES = [
@@ -153,6 +196,8 @@ class InventoryTransfer(models.Model):
     ]
     
     assignment = models.ForeignKey(MovingAssignment, on_delete=models.CASCADE, related_name='inventory_transfers')
+    # Indexed by transfer_item_assignment_idx.
+    inventory_item = models.ForeignKey(PropertyInventory, on_delete=delete_if_pending, null=True, blank=True, related_name='transfers', db_index=False, help_text="Inventory item the transfer was generated from")
     item_name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     room_from = models.CharField(max_length=100)
@@ -161,6 +206,10 @@ class InventoryTransfer(models.Model):
     # Physical properties
     estimated_weight_kg = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     dimensions = models.CharField(max_length=100, blank=True, help_text="L x W x H in cm")
+    # Parsed from dimensions by a trigger on every write, and by save() for the instance, see logistics.dimensions.
+    length_cm = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True, editable=False)
+    width_cm = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True, editable=False)
+    height_cm = models.DecimalField(max_digits=6, decimal_places=1, null=True, blank=True, editable=False)
     is_fragile = models.BooleanField(default=False)
     requires_disassembly = models.BooleanField(default=False)
     
@@ -176,13 +225,43 @@ class InventoryTransfer(models.Model):
     damage_description = models.TextField(blank=True)
     
     handled_by = models.ForeignKey(Driver, on_delete=models.SET_NULL, null=True, blank=True)
+    # The table is partitioned by month of date_created, see smartmove.partitions.
     date_created = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.item_name} - {self.assignment.relocation_request.request_id}"
+
+    def save(self, *args, **kwargs):
+        self.length_cm, self.width_cm, self.height_cm = parse_dimensions(self.dimensions) or (None, None, None)
+        super().save(*args, **kwargs)
+
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude)
+        # Enforced by transfer_item_assignment_uniq, on a table of its own, which forms don't know of.
+        if self.inventory_item_id is None or {'inventory_item', 'assignment'} & set(exclude or ()):
+            return
+        duplicates = InventoryTransfer._default_manager.filter(
+            inventory_item=self.inventory_item_id, assignment=self.assignment_id,
+        ).exclude(pk=self.pk)
+        if duplicates.exists():
+            raise ValidationError('This inventory item is already in the manifest of this assignment.')
     
     class Meta:
         ordering = ['-date_created']
+        indexes = [
+            models.Index(fields=['assignment', 'status'], name='transfer_assignment_status_idx'),
+            models.Index(fields=['-date_created'], name='transfer_created_idx'),
+            models.Index(
+                fields=['assignment'],
+                condition=models.Q(status__in=['pending', 'packed', 'loaded', 'in_transit']),
+                name='transfer_open_assignment_idx',
+            ),
+            search_index('transfer_search_idx', 'item_name', 'room_from', 'room_to'),
+            # An inventory item appears at most once in an assignment's manifest, which the primary key
+            # of logistics_inventorytransfer_item_key enforces, see migration 0012: a unique constraint
+            # here would have to include date_created, the partition column.
+            models.Index(fields=['inventory_item', 'assignment'], name='transfer_item_assignment_idx'),
+        ]
 
 class MovingExpense(models.Model):
     EXPENSE_TYPES = [
@@ -201,6 +280,9 @@ class MovingExpense(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     description = models.CharField(max_length=200)
     receipt_image = models.ImageField(upload_to='expense_receipts/', null=True, blank=True)
+    # Names of the downsized copies of the receipt, see smartmove.renditions.
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # The table is partitioned by month of date_incurred, see smartmove.partitions.
     date_incurred = models.DateField()
     submitted_by = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='submitted_expenses')
     is_approved = models.BooleanField(default=False)
@@ -212,3 +294,8 @@ class MovingExpense(models.Model):
     
     class Meta:
         ordering = ['-date_incurred']
+        indexes = [
+            models.Index(fields=['is_approved', '-date_incurred'], name='expense_approved_incurred_idx'),
+            models.Index(fields=['-date_incurred'], condition=models.Q(is_approved=False), name='expense_unapproved_idx'),
+            search_index('expense_search_idx', 'description'),
+        ]
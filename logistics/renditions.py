@@ -0,0 +1,5 @@
+from smartmove.renditions import Renditions, register
+from .models import MovingExpense
+
+# Receipts only need to stay legible.
+register(Renditions(MovingExpense, 'receipt_image', {'thumbnail': 320}, recompress=2000))
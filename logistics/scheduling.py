@@ -0,0 +1,86 @@
+"""
+Crew availability.
+
+Open assignments are indexed by the GiST index behind the
+``assignment_no_crew_overlap`` exclusion constraint. The queries here filter
+on the same ``TSTZRANGE(scheduled_start_date, scheduled_end_date, '[)')``
+expression and open statuses so Postgres answers them from that index.
+"""
+from django.contrib.postgres.expressions import ArraySubquery
+from django.contrib.postgres.fields import RangeBoundary
+from django.contrib.postgres.lookups import Overlap
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.db.models import Exists, OuterRef, Prefetch
+
+from smartmove.ranges import Int8Range, TsTzRange
+
+from .models import MovingAssignment, MovingCrew, Vehicle
+
+OPEN_STATUSES = ['scheduled', 'in_progress']
+
+
+def period():
+    """The ``[start, end)`` range of an assignment."""
+    return TsTzRange('scheduled_start_date', 'scheduled_end_date', RangeBoundary())
+
+
+def crew_key(crew):
+    return Int8Range(crew, crew, RangeBoundary(inclusive_upper=True))
+
+
+def bookings(start, end, using=None):
+    """Return the open assignments overlapping ``[start, end)``."""
+    return MovingAssignment.objects.using(using).filter(
+        Overlap(period(), DateTimeTZRange(start, end)), status__in=OPEN_STATUSES,
+    )
+
+
+def available_vehicles(start, end, using=None):
+    """
+    Return the vehicles in service that no busy crew can be using during
+    ``[start, end)``. A vehicle shared by several crews counts as taken as
+    soon as one of them is booked.
+    """
+    busy = bookings(start, end, using).filter(crew__vehicles=OuterRef('pk'))
+    return Vehicle.objects.using(using).filter(is_active=True, status='available').exclude(Exists(busy))
+
+
+def available_crews(start, end, using=None):
+    """
+    Return the active crews with no open assignment overlapping ``[start,
+    end)``. Each crew's free vehicles are prefetched into
+    ``available_vehicles``, so this runs two queries however many crews
+    there are.
+    """
+    busy = bookings(start, end, using).filter(crew=OuterRef('pk'))
+    return MovingCrew.objects.using(using).filter(is_active=True).exclude(Exists(busy)).prefetch_related(
+        Prefetch('vehicles', queryset=available_vehicles(start, end, using), to_attr='available_vehicles'),
+    )
+
+
+def crew_schedule(start, end, using=None):
+    """
+    Return the active crews annotated with ``booked``, the periods of their
+    open assignments overlapping ``[start, end)`` in order, in one query.
+    Pass a crew and the same window to ``free_periods()`` for its gaps.
+    """
+    booked = bookings(start, end, using).filter(
+        # Matching the crew through its range, as the constraint indexes it,
+        # lets each crew's lookup use both columns of the GiST index.
+        Overlap(crew_key('crew'), crew_key(OuterRef('pk'))),
+    ).order_by('scheduled_start_date').values(period=period())
+    return MovingCrew.objects.using(using).filter(is_active=True).annotate(booked=ArraySubquery(booked))
+
+
+def free_periods(booked, start, end):
+    """Return the ``(start, end)`` gaps of ``[start, end)`` not covered by the ordered ``booked`` ranges."""
+    gaps = []
+    for booking in booked:
+        if booking.lower > start:
+            gaps.append((start, min(booking.lower, end)))
+        start = max(start, booking.upper)
+        if start >= end:
+            return gaps
+    if start < end:
+        gaps.append((start, end))
+    return gaps
@@ -0,0 +1,319 @@
+"""
+Synthetic dataset generation for benchmarks.
+
+Rows are produced server-side with ``INSERT ... SELECT`` over
+``generate_series`` so that millions of rows load in seconds without a round
+trip through Python. Every generated natural ID starts with ``prefix`` so the
+rows can be told apart from real data, and ``setseed`` makes the random
+distributions repeatable between runs.
+"""
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from clients.models import Client
+from properties.models import Property, PropertyInventory
+from relocations.models import MILESTONE_TYPES, RelocationQuote, RelocationRequest, RelocationTimeline
+from smartmove import bulkload
+from .models import Driver, InventoryTransfer, MovingAssignment, MovingCrew, MovingExpense, Vehicle
+
+SCALES = {
+    'small': {
+        'clients': 1000, 'properties': 2000, 'inventory': 20000, 'requests': 5000, 'vehicles': 20, 'crews': 50,
+        'assignments': 3000, 'transfers': 50000, 'expenses': 5000,
+    },
+    '1m': {
+        'clients': 100000, 'properties': 200000, 'inventory': 1000000, 'requests': 1000000, 'vehicles': 200,
+        'crews': 500, 'assignments': 600000, 'transfers': 1000000, 'expenses': 1000000,
+    },
+    'production': {
+        'clients': 200000, 'properties': 500000, 'inventory': 5000000, 'requests': 1000000, 'vehicles': 1000,
+        'crews': 2000, 'assignments': 800000, 'transfers': 20000000, 'expenses': 2000000,
+    },
+}
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez']
+CITIES = [
+    ('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'), ('Phoenix', 'AZ'),
+    ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'), ('Dallas', 'TX'), ('Austin', 'TX'),
+    ('Seattle', 'WA'), ('Denver', 'CO'), ('Boston', 'MA'), ('Portland', 'OR'), ('Atlanta', 'GA'),
+]
+MAKES = ['Ford', 'Mercedes-Benz', 'Isuzu', 'Freightliner', 'Ram', 'Chevrolet', 'Hino', 'Volvo', 'Iveco', 'Nissan']
+ROOMS = ['Living Room', 'Kitchen', 'Bedroom', 'Master Bedroom', 'Bathroom', 'Office', 'Garage', 'Dining Room']
+# Milestones reached by a request of each status, as (minimum, maximum).
+MILESTONES_REACHED = {
+    'pending': (0, 1), 'approved': (1, 3), 'on_hold': (2, 5), 'in_progress': (5, 12), 'cancelled': (0, 2),
+    'completed': (len(MILESTONE_TYPES), len(MILESTONE_TYPES)),
+}
+ITEMS = ['Sofa', 'Dining Table', 'Bed Frame', 'Mattress', 'Wardrobe', 'Bookshelf', 'Desk', 'Chair', 'Television',
+         'Box of Books', 'Box of Dishes', 'Lamp', 'Mirror', 'Refrigerator', 'Washing Machine', 'Piano']
+
+
+def _array(values):
+    return 'ARRAY[%s]' % ', '.join("'%s'" % value.replace("'", "''") for value in values)
+
+
+def _pick(values, skew=1):
+    """SQL expression choosing one of ``values``; ``skew`` > 1 favours the first ones."""
+    return '(%s)[1 + floor(power(random(), %s) * %d)::int]' % (_array(values), skew, len(values))
+
+
+def _weighted(weights, variable):
+    """
+    SQL ``CASE`` expression choosing a key of ``weights`` with the given
+    probabilities, driven by the uniform random column ``variable``.
+    """
+    total = sum(weights.values())
+    cases, cumulative = [], 0
+    for value, weight in list(weights.items())[:-1]:
+        cumulative += weight
+        cases.append("WHEN %s < %.6f THEN '%s'" % (variable, cumulative / total, value))
+    return "CASE %s ELSE '%s' END" % (' '.join(cases), list(weights)[-1])
+
+
+def _max_id(cursor, model):
+    cursor.execute('SELECT coalesce(max(id), 0) FROM %s' % model._meta.db_table)
+    return cursor.fetchone()[0]
+
+
+def _new_ids(cursor, model, after):
+    cursor.execute('SELECT min(id), max(id) FROM %s WHERE id > %%s' % model._meta.db_table, [after])
+    lo, hi = cursor.fetchone()
+    return (lo, hi - lo + 1) if lo is not None else (0, 1)
+
+
+def insert_select(cursor, model, expressions, source, params=()):
+    """
+    ``smartmove.bulkload.insert_select()`` that also returns ``(lo, span)``,
+    the range of new primary keys: rows inserted by one statement get
+    consecutive keys, so later steps pick a parent with ``lo + mod(i, span)``
+    through the primary key index.
+    """
+    before = _max_id(cursor, model)
+    count = bulkload.insert_select(cursor, model, expressions, source, params)
+    # Keep the planner's statistics current for the following steps.
+    cursor.execute('ANALYZE %s' % model._meta.db_table)
+    return count, _new_ids(cursor, model, before)
+
+
+def generate(counts, prefix='SYN', seed=0.42, using=DEFAULT_DB_ALIAS):
+    """
+    Generate a consistent dataset of the sizes given in ``counts`` (see
+    ``SCALES``) and return the number of rows inserted per model.
+    """
+    created = {}
+    cities = _pick([city for city, _ in CITIES], skew=2)
+    states = _pick(sorted({state for _, state in CITIES}), skew=2)
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT setseed(%s)', [seed])
+
+        created[Client], clients = insert_select(cursor, Client, {
+            'client_id': "'%sC' || i" % prefix,
+            'client_type': "CASE WHEN mod(i, 7) = 0 THEN 'corporate' ELSE 'individual' END",
+            'first_name': _pick(FIRST_NAMES),
+            'last_name': _pick(LAST_NAMES),
+            'company_name': "CASE WHEN mod(i, 7) = 0 THEN 'Company ' || mod(i, 5000) END",
+            'email': "'client' || i || '@example.com'",
+            'address': "i || ' Main Street'",
+            'city': cities,
+            'state': states,
+            'zip_code': "lpad(mod(i, 99999)::text, 5, '0')",
+            'date_created': "now() - random() * interval '1095 days'",
+            'is_active': 'random() < 0.9',
+        }, 'generate_series(1, %s) AS i', [counts['clients']])
+
+        created[Property], properties = insert_select(cursor, Property, {
+            'property_id': "'%sP' || i" % prefix,
+            'owner_id': 'c.id',
+            'property_type': _pick([key for key, _ in Property.PROPERTY_TYPES], skew=2),
+            'address': "i || ' Elm Street'",
+            'city': cities,
+            'state': states,
+            'zip_code': "lpad(mod(i, 99999)::text, 5, '0')",
+            'bedrooms': 'floor(random() * 6)::int',
+            'square_feet': '400 + floor(random() * 4000)::int',
+            'date_created': "now() - random() * interval '1095 days'",
+            'is_active': 'random() < 0.95',
+        }, 'generate_series(1, %%s) AS i JOIN %s c ON c.id = %%s + mod(i, %%s)' % Client._meta.db_table,
+            [counts['properties'], *clients])
+
+        # A few properties hold most of the items, as with houses and studios.
+        created[PropertyInventory], _ = insert_select(cursor, PropertyInventory, {
+            'property_id': 'p.id',
+            'room': _pick(ROOMS),
+            'item_name': _pick(ITEMS),
+            'description': "''",
+            'condition': _weighted({'good': 50, 'excellent': 20, 'fair': 20, 'poor': 8, 'damaged': 2}, 'r1'),
+            'estimated_value': 'round((10 + power(random(), 3) * 5000)::numeric, 2)',
+            'is_fragile': 'random() < 0.15',
+            'requires_special_handling': 'random() < 0.05',
+            'date_created': "p.date_created + random() * interval '30 days'",
+        }, '(SELECT i, random() AS r1, %%s + floor(power(random(), 2) * %%s)::int AS property_id '
+           'FROM generate_series(1, %%s) AS i) g JOIN %s p ON p.id = g.property_id' % Property._meta.db_table,
+            [*properties, counts['inventory']])
+
+        created[RelocationRequest], _ = insert_select(cursor, RelocationRequest, {
+            'request_id': "'%sR' || i" % prefix,
+            'client_id': 'p.owner_id',
+            'origin_property_id': 'p.id',
+            'destination_city': cities,
+            'destination_zip': "lpad(mod(i * 7, 99999)::text, 5, '0')",
+            'relocation_type': _weighted({'local': 60, 'long_distance': 25, 'international': 5, 'corporate': 10}, 'r1'),
+            'status': _weighted({
+                'completed': 70, 'cancelled': 8, 'pending': 10, 'approved': 5, 'in_progress': 4, 'on_hold': 3,
+            }, 'r2'),
+            'priority': _pick(['medium', 'low', 'high', 'urgent'], skew=2),
+            'preferred_date': "current_date + (floor(random() * 1460) - 1095)::int",
+            'requires_packing': 'random() < 0.5',
+            'requires_storage': 'random() < 0.1',
+            'date_created': "now() - random() * interval '1095 days'",
+        }, '(SELECT i, random() AS r1, random() AS r2 FROM generate_series(1, %%s) AS i) g '
+           'JOIN %s p ON p.id = %%s + mod(i, %%s)' % Property._meta.db_table,
+            [counts['requests'], *properties])
+
+        # The last quote of a request is the open or accepted one, after a
+        # rejected one for a quarter of them; most pending requests have none yet.
+        created[RelocationQuote], _ = insert_select(cursor, RelocationQuote, {
+            'relocation_request_id': 'q.id',
+            'quote_number': "'%sQ' || q.id || '-' || q.k" % prefix,
+            'status': "CASE WHEN q.k < q.n THEN 'rejected' WHEN q.status = 'pending' THEN 'sent' "
+                      "WHEN q.status = 'cancelled' THEN (ARRAY['rejected', 'expired'])[1 + floor(q.r1 * 2)::int] "
+                      "ELSE 'accepted' END",
+            'base_cost': 'q.base',
+            'transportation_cost': 'q.transport',
+            'packing_cost': 'CASE WHEN q.requires_packing THEN round((100 + random() * 900)::numeric, 2) ELSE 0 END',
+            'storage_cost': 'CASE WHEN q.requires_storage THEN round((50 + random() * 950)::numeric, 2) ELSE 0 END',
+            'insurance_cost': 'CASE WHEN random() < 0.4 THEN round((50 + random() * 450)::numeric, 2) ELSE 0 END',
+            'additional_services_cost': '0',
+            'tax_amount': 'round((q.base + q.transport) * 0.08, 2)',
+            'valid_until': "(q.created + interval '30 days')::date",
+            'terms_and_conditions': "'Synthetic terms.'",
+            'date_created': 'q.created',
+            'date_sent': "q.created + interval '1 hour'",
+            'date_responded': "CASE WHEN q.k < q.n OR q.status <> 'pending' THEN q.created + interval '3 days' END",
+        }, "(SELECT r.id, r.status, r.requires_packing, r.requires_storage, k, n, random() AS r1, "
+           "r.date_created + (k - 1) * interval '5 days' AS created, "
+           "round((300 + random() * 2700)::numeric, 2) AS base, "
+           "round((50 + power(random(), 2) * 4000)::numeric, 2) AS transport "
+           "FROM (SELECT *, CASE status WHEN 'pending' THEN (random() < 0.4)::int WHEN 'cancelled' THEN 1 "
+           "ELSE 1 + (random() < 0.25)::int END AS n FROM %s WHERE request_id LIKE %%s) r, "
+           "generate_series(1, r.n) AS k) q" % RelocationRequest._meta.db_table, [prefix + 'R%'])
+
+        # The milestones reached, in order, and the next one scheduled for the
+        # requests under way. Inserted through the milestone triggers, which set
+        # the requests' current milestones, but not the one notifying
+        # listeners of each entry.
+        reached = ' '.join(
+            "WHEN '%s' THEN %d + floor(random() * %d)::int" % (status, low, high - low + 1)
+            for status, (low, high) in MILESTONES_REACHED.items()
+        )
+        cursor.execute('ALTER TABLE %s DISABLE TRIGGER relocation_timeline_notify' % RelocationTimeline._meta.db_table)
+        created[RelocationTimeline], _ = insert_select(cursor, RelocationTimeline, {
+            'relocation_request_id': 't.id',
+            'milestone_type': '(%s)[t.k]' % _array([key for key, _ in MILESTONE_TYPES]),
+            'description': '(%s)[t.k]' % _array([label for _, label in MILESTONE_TYPES]),
+            'scheduled_datetime': 't.scheduled',
+            'actual_datetime': "CASE WHEN t.k <= t.m THEN t.scheduled + random() * interval '6 hours' END",
+            'is_completed': 't.k <= t.m',
+            'notes': "''",
+            'date_created': "t.date_created + (t.k - 1) * interval '4 days'",
+        }, "(SELECT r.id, r.date_created, k, m, r.date_created + k * interval '4 days' AS scheduled "
+           "FROM (SELECT *, CASE status %s ELSE 0 END AS m FROM %s WHERE request_id LIKE %%s) r, "
+           "generate_series(1, least(r.m + (r.status IN ('approved', 'on_hold', 'in_progress'))::int, %d)) AS k) t"
+           % (reached, RelocationRequest._meta.db_table, len(MILESTONE_TYPES)), [prefix + 'R%'])
+        cursor.execute('ALTER TABLE %s ENABLE TRIGGER relocation_timeline_notify' % RelocationTimeline._meta.db_table)
+
+        created[Vehicle], _ = insert_select(cursor, Vehicle, {
+            'vehicle_id': "'%sV' || i" % prefix,
+            'vehicle_type': _pick([key for key, _ in Vehicle.VEHICLE_TYPES], skew=2),
+            'make': _pick(MAKES, skew=2),
+            'model': "'Model ' || mod(i, 12)",
+            'year': '2024 - floor(power(random(), 2) * 25)::int',
+            'license_plate': "'%s-' || i" % prefix,
+            'max_weight_kg': '1000 + floor(random() * 20000)::int',
+            'max_volume_cubic_meters': 'round((5 + random() * 80)::numeric, 2)',
+            'status': _weighted({'available': 60, 'in_use': 30, 'maintenance': 8, 'out_of_service': 2}, 'r1'),
+            'mileage': 'floor(random() * 400000)::int',
+            'insurance_expiry': 'current_date + floor(random() * 365)::int',
+            'registration_expiry': 'current_date + floor(random() * 365)::int',
+            'date_created': "now() - random() * interval '3650 days'",
+        }, '(SELECT i, random() AS r1 FROM generate_series(1, %s) AS i) g', [counts['vehicles']])
+
+        cursor.execute(
+            "INSERT INTO %s (password, is_superuser, username, first_name, last_name, email, is_staff, is_active, "
+            "date_joined) SELECT '!', false, '%s-driver-' || i, %s, %s, '', false, true, now() "
+            "FROM generate_series(1, %%s) AS i" % (User._meta.db_table, prefix.lower(), _pick(FIRST_NAMES),
+                                                   _pick(LAST_NAMES)),
+            [counts['crews']],
+        )
+        created[User] = cursor.rowcount
+        created[Driver], _ = insert_select(cursor, Driver, {
+            'user_id': 'u.id',
+            'driver_id': "'%sD' || u.id" % prefix,
+            'phone': "'+15555550100'",
+            'emergency_contact_name': "'Emergency Contact'",
+            'emergency_contact_phone': "'+15555550101'",
+            'license_number': "'%sL' || u.id" % prefix,
+            'license_expiry': "current_date + 365",
+            'hire_date': "current_date - floor(random() * 3650)::int",
+            'hourly_rate': '20 + floor(random() * 20)',
+        }, "%s u WHERE u.username LIKE '%s-driver-%%%%'" % (User._meta.db_table, prefix.lower()))
+        created[MovingCrew], crews = insert_select(cursor, MovingCrew, {
+            'crew_id': "'%sW' || d.rn" % prefix,
+            'crew_leader_id': 'd.id',
+            'max_capacity_kg': '2000 + floor(random() * 8000)::int',
+            'is_active': 'random() < 0.95',
+        }, "(SELECT *, row_number() OVER (ORDER BY id) AS rn FROM %s WHERE driver_id LIKE '%sD%%%%') d"
+            % (Driver._meta.db_table, prefix))
+
+        created[MovingAssignment], assignments = insert_select(cursor, MovingAssignment, {
+            'relocation_request_id': 'r.id',
+            'crew_id': 'w.id',
+            'status': _weighted({'completed': 80, 'cancelled': 5, 'scheduled': 10, 'in_progress': 5}, 'r.r1'),
+            # Each crew works one assignment a day, so open assignments never
+            # trip the assignment_no_crew_overlap constraint.
+            'scheduled_start_date': "r.slot + time '08:00'",
+            'scheduled_end_date': "r.slot + time '08:00' + floor(1 + random() * 12) * interval '1 hour'",
+            'estimated_distance_km': 'round((5 + random() * 1500)::numeric, 2)',
+            'date_created': 'r.date_created',
+        }, "(SELECT *, row_number() OVER (ORDER BY id) AS rn, "
+           "current_date - 1095 + (row_number() OVER (ORDER BY id) / %%s)::int AS slot, random() AS r1 "
+           "FROM %s WHERE request_id LIKE %%s AND status <> 'pending' ORDER BY id LIMIT %%s) r "
+           "JOIN %s w ON w.id = %%s + mod(r.rn, %%s)" % (RelocationRequest._meta.db_table, MovingCrew._meta.db_table),
+            [crews[1], prefix + 'R%', counts['assignments'], *crews])
+
+        created[InventoryTransfer], _ = insert_select(cursor, InventoryTransfer, {
+            'assignment_id': 'a.id',
+            'item_name': _pick(ITEMS),
+            'room_from': _pick(ROOMS),
+            'room_to': _pick(ROOMS),
+            'estimated_weight_kg': 'round((1 + power(random(), 3) * 250)::numeric, 2)',
+            # Parsed into length_cm, width_cm and height_cm by the table's trigger.
+            'dimensions': "g.l || ' x ' || g.w || ' x ' || g.h",
+            'is_fragile': 'random() < 0.15',
+            'requires_disassembly': 'random() < 0.05',
+            'status': _weighted({
+                'delivered': 75, 'pending': 8, 'packed': 5, 'loaded': 4, 'in_transit': 5, 'damaged': 2, 'lost': 1,
+            }, 'r1'),
+            'date_created': "a.date_created + random() * interval '10 days'",
+        }, '(SELECT i, random() AS r1, 20 + floor(random() * 200) AS l, 20 + floor(random() * 100) AS w, '
+           '20 + floor(random() * 150) AS h FROM generate_series(1, %%s) AS i) g JOIN %s a ON a.id = %%s + mod(i, %%s)'
+            % MovingAssignment._meta.db_table, [counts['transfers'], *assignments])
+
+        created[MovingExpense], _ = insert_select(cursor, MovingExpense, {
+            'assignment_id': 'a.id',
+            'expense_type': _pick([key for key, _ in MovingExpense.EXPENSE_TYPES], skew=2),
+            'amount': 'round((5 + random() * 500)::numeric, 2)',
+            'description': "'Synthetic expense ' || i",
+            'date_incurred': 'a.scheduled_start_date::date',
+            'submitted_by_id': 'w.crew_leader_id',
+            'is_approved': 'random() < 0.85',
+            'date_created': 'a.scheduled_start_date',
+        }, 'generate_series(1, %%s) AS i JOIN %s a ON a.id = %%s + mod(i, %%s) JOIN %s w ON w.id = a.crew_id' % (
+            MovingAssignment._meta.db_table, MovingCrew._meta.db_table,
+        ), [counts['expenses'], *assignments])
+
+        # Check the deferred foreign keys now so callers can run DDL on these
+        # tables in the same transaction.
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    return created
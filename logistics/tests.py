@@ -1,3 +1,773 @@
-from django.test import TestCase
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, models, transaction
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import ExifTags, Image
+
+from properties.models import Property
+from relocations.models import RelocationQuote, RelocationRequest, RelocationTimeline
+from smartmove.geocoding import geocode, haversine_km
+from smartmove.pagination import EstimatedCountPaginator
+from smartmove.renditions import get_renditions
+from smartmove.storage import collect_garbage
+from smartmove.testing import (
+    AdminLoginMixin, AdminQueryBudgetMixin, KeysetPaginationMixin, make_assignment, make_crew, make_driver,
+    make_expense, make_inventory_item, make_property, make_relocation_request, make_transfer, make_user,
+    make_vehicle,
+)
+from . import scheduling
+from .dimensions import parse_dimensions
+from .management.commands.benchmark_servers import WEIGHTS, Command as BenchmarkServersCommand
+from .distances import DETOUR_FACTOR, backfill_distances
+from .loading import backfill_dimensions, plan_assignments, plan_load
+from .manifest import sync_manifest
+from .models import Driver, InventoryTransfer, MovingAssignment, MovingCrew, MovingExpense, Vehicle
+from .transitions import transition_transfers
+
+
+class AdminQueryBudgetTests(AdminQueryBudgetMixin, TestCase):
+    def test_vehicle_changelist(self):
+        self.assertChangelistWithinBudget(Vehicle, 7, make_vehicle)
+
+    def test_driver_changelist(self):
+        self.assertChangelistWithinBudget(Driver, 5, make_driver)
+
+    def test_moving_crew_changelist(self):
+        self.assertChangelistWithinBudget(MovingCrew, 5, make_crew)
+
+    def test_moving_assignment_changelist(self):
+        self.assertChangelistWithinBudget(MovingAssignment, 5, make_assignment)
+
+    def test_inventory_transfer_changelist(self):
+        self.assertChangelistWithinBudget(InventoryTransfer, 5, make_transfer)
+
+    def test_moving_expense_changelist(self):
+        self.assertChangelistWithinBudget(MovingExpense, 5, make_expense)
+
+    def test_vehicle_change_form(self):
+        vehicle = make_vehicle()
+        self.assertChangeFormWithinBudget(vehicle, 3, make_vehicle)
+
+    def test_driver_change_form(self):
+        driver = make_driver()
+        self.assertChangeFormWithinBudget(driver, 5, make_driver)
+
+    def test_moving_crew_change_form(self):
+        crew = make_crew()
+
+        def make_row():
+            driver = make_driver()
+            crew.members.add(driver)
+            crew.vehicles.add(make_vehicle())
+
+        self.assertChangeFormWithinBudget(crew, 8, make_row)
+
+    def test_moving_assignment_change_form_with_inlines(self):
+        assignment = make_assignment()
+
+        def make_row():
+            driver = make_driver()
+            make_transfer(assignment=assignment, handled_by=driver)
+            make_expense(assignment=assignment, submitted_by=driver, approved_by=driver.user)
+            make_crew()
+
+        self.assertChangeFormWithinBudget(assignment, 16, make_row)
+
+    def test_inventory_transfer_change_form(self):
+        transfer = make_transfer()
+        self.assertChangeFormWithinBudget(transfer, 9, lambda: make_transfer(handled_by=make_driver()))
+
+    def test_moving_expense_change_form(self):
+        expense = make_expense()
+        self.assertChangeFormWithinBudget(expense, 11, make_expense)
+
+
+class KeysetPaginationTests(KeysetPaginationMixin, TestCase):
+    def test_transfers_paginate_on_date_created_with_ties(self):
+        assignment = make_assignment()
+        now = timezone.now()
+        for i in range(8):
+            transfer = make_transfer(assignment=assignment)
+            InventoryTransfer.objects.filter(pk=transfer.pk).update(date_created=now - timedelta(hours=i // 3))
+        expected = InventoryTransfer.objects.order_by('-date_created', '-pk').values_list('pk', flat=True)
+        self.assertKeysetPagination(InventoryTransfer, expected)
+
+    def test_large_counts_are_estimated(self):
+        assignment = make_assignment()
+        for _ in range(4):
+            make_transfer(assignment=assignment)
+        with mock.patch.object(EstimatedCountPaginator, 'exact_count_limit', 2):
+            response = self.client.get(reverse('admin:logistics_inventorytransfer_changelist'))
+        self.assertTrue(response.context['cl'].result_count_estimated)
+        self.assertContains(response, 'about')
+
+
+class SchedulingTests(TestCase):
+    def setUp(self):
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=7)
+        self.crew = make_crew()
+
+    def book(self, crew, hours_from, hours_to, **kwargs):
+        return make_assignment(
+            crew=crew,
+            scheduled_start_date=self.start + timedelta(hours=hours_from),
+            scheduled_end_date=self.start + timedelta(hours=hours_to),
+            **kwargs,
+        )
+
+    def test_overlapping_open_assignments_are_rejected(self):
+        self.book(self.crew, 0, 8)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.book(self.crew, 4, 12)
+
+    def test_back_to_back_and_closed_assignments_are_allowed(self):
+        self.book(self.crew, 0, 8)
+        self.book(self.crew, 8, 16)
+        self.book(self.crew, 2, 6, status='cancelled')
+        self.book(make_crew(), 2, 6)
+
+    def test_overlap_is_a_validation_error(self):
+        self.book(self.crew, 0, 8)
+        assignment = MovingAssignment(
+            relocation_request=make_assignment().relocation_request,
+            crew=self.crew,
+            scheduled_start_date=self.start + timedelta(hours=6),
+            scheduled_end_date=self.start + timedelta(hours=10),
+        )
+        with self.assertRaisesMessage(ValidationError, 'already booked'):
+            assignment.validate_constraints()
+
+    def test_migration_lists_the_conflicting_assignments(self):
+        constraints = import_module('logistics.migrations.0004_assignment_scheduling_constraints')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'ALTER TABLE logistics_movingassignment DROP CONSTRAINT assignment_no_crew_overlap, '
+                'DROP CONSTRAINT assignment_end_after_start'
+            )
+        first, overlapping = self.book(self.crew, 0, 8), self.book(self.crew, 4, 12)
+        self.book(self.crew, 2, 6, status='cancelled')
+        inverted = self.book(make_crew(), 8, 2)
+        with connection.schema_editor() as editor, self.assertRaises(CommandError) as raised:
+            constraints.check_schedules(django_apps, editor)
+        self.assertIn(f'1 assignments ending before they start: #{inverted.pk}', str(raised.exception))
+        self.assertIn(
+            f'1 overlapping open assignments of a crew: #{first.pk} and #{overlapping.pk} (crew #{self.crew.pk})',
+            str(raised.exception),
+        )
+
+    def test_migration_passes_valid_assignments(self):
+        constraints = import_module('logistics.migrations.0004_assignment_scheduling_constraints')
+        self.book(self.crew, 0, 8)
+        self.book(self.crew, 8, 16)
+        with connection.schema_editor() as editor:
+            constraints.check_schedules(django_apps, editor)
+
+    def test_available_crews_with_their_free_vehicles(self):
+        busy, shared, own = make_crew(), make_vehicle(), make_vehicle()
+        busy.vehicles.add(shared)
+        self.crew.vehicles.add(shared, own, make_vehicle(status='maintenance'))
+        self.book(busy, 0, 8)
+        with self.assertNumQueries(2):
+            crews = list(scheduling.available_crews(self.start, self.start + timedelta(hours=4)))
+        self.assertNotIn(busy, crews)
+        crew = crews[crews.index(self.crew)]
+        self.assertEqual(crew.available_vehicles, [own])
+
+    def test_week_schedule_in_one_query(self):
+        crews = [make_crew() for _ in range(5)]
+        self.book(crews[0], 24, 32)
+        self.book(crews[0], 2, 6)
+        self.book(crews[1], -4, 2)
+        end = self.start + timedelta(days=7)
+        with self.assertNumQueries(1):
+            schedule = {crew.pk: crew for crew in scheduling.crew_schedule(self.start, end)}
+        first = schedule[crews[0].pk]
+        self.assertEqual(
+            scheduling.free_periods(first.booked, self.start, end),
+            [
+                (self.start, self.start + timedelta(hours=2)),
+                (self.start + timedelta(hours=6), self.start + timedelta(hours=24)),
+                (self.start + timedelta(hours=32), end),
+            ],
+        )
+        self.assertEqual(
+            scheduling.free_periods(schedule[crews[1].pk].booked, self.start, end),
+            [(self.start + timedelta(hours=2), end)],
+        )
+        self.assertEqual(schedule[crews[2].pk].booked, [])
+
+
+class ExportTests(AdminLoginMixin, TestCase):
+    def test_admin_action_streams_csv_with_joined_columns(self):
+        transfer = make_transfer(item_name='Piano')
+        make_transfer()
+        response = self.client.post(reverse('admin:logistics_inventorytransfer_changelist'), {
+            'action': 'export_csv', '_selected_action': [transfer.pk],
+        })
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['item_name'], 'Piano')
+        self.assertEqual(rows[0]['crew_id'], transfer.assignment.crew.crew_id)
+        self.assertEqual(rows[0]['request_id'], transfer.assignment.relocation_request.request_id)
+
+    def test_command_writes_json_lines(self):
+        expenses = [make_expense(amount='12.50'), make_expense()]
+        out = io.StringIO()
+        call_command('export_data', 'logistics.MovingExpense', format='jsonl', chunk_size=1, stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['crew_id'] for row in rows], [e.assignment.crew.crew_id for e in expenses])
+        self.assertEqual(rows[0]['amount'], '12.50')
+
+
+class ManifestTests(TestCase):
+    def setUp(self):
+        self.assignment = make_assignment()
+        self.property = self.assignment.relocation_request.origin_property
+        self.sofa = make_inventory_item(property=self.property, item_name='Sofa', is_fragile=True)
+        self.piano = make_inventory_item(property=self.property, item_name='Piano', requires_special_handling=True)
+
+    def manifest(self):
+        return list(self.assignment.inventory_transfers.order_by('item_name').values_list(
+            'inventory_item', 'item_name', 'room_from', 'is_fragile', 'requires_disassembly', 'status',
+        ))
+
+    def test_build_in_one_statement(self):
+        make_inventory_item(item_name='Elsewhere')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(sync_manifest(self.assignment), (2, 0, 0))
+        statements = [
+            query['sql'] for query in queries.captured_queries if not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))
+        ]
+        # The lock of the assignment, and the transfers written in one statement however many items.
+        self.assertEqual(len(statements), 2)
+        self.assertIn('FOR NO KEY UPDATE', statements[0])
+        self.assertEqual(self.manifest(), [
+            (self.piano.pk, 'Piano', 'Living Room', False, True, 'pending'),
+            (self.sofa.pk, 'Sofa', 'Living Room', True, False, 'pending'),
+        ])
+        self.assertEqual(sync_manifest(self.assignment), (0, 0, 0))
+
+    def test_resync_follows_the_inventory_until_packed(self):
+        manual = make_transfer(assignment=self.assignment, item_name='Bike')
+        sync_manifest(self.assignment)
+        self.assignment.inventory_transfers.filter(inventory_item=self.piano).update(status='packed')
+        self.sofa.room = 'Lounge'
+        self.sofa.save()
+        self.piano.room = 'Hall'
+        self.piano.save()
+        lamp = make_inventory_item(property=self.property, item_name='Lamp')
+        self.assertEqual(sync_manifest(self.assignment), (1, 1, 0))
+        self.assertEqual(self.manifest(), [
+            (None, manual.item_name, 'Living Room', False, False, 'pending'),
+            (lamp.pk, 'Lamp', 'Living Room', False, False, 'pending'),
+            (self.piano.pk, 'Piano', 'Living Room', False, True, 'packed'),
+            (self.sofa.pk, 'Sofa', 'Lounge', True, False, 'pending'),
+        ])
+        lamp.property = make_inventory_item().property
+        lamp.save()
+        self.assertEqual(sync_manifest(self.assignment), (0, 0, 1))
+        self.assertFalse(self.assignment.inventory_transfers.filter(item_name='Lamp').exists())
+
+    def test_deleted_items_leave_the_manifest_until_packed(self):
+        sync_manifest(self.assignment)
+        self.assignment.inventory_transfers.filter(inventory_item=self.piano).update(status='packed')
+        self.sofa.delete()
+        self.piano.delete()
+        self.assertEqual(sync_manifest(self.assignment), (0, 0, 0))
+        self.assertEqual(self.manifest(), [(None, 'Piano', 'Living Room', False, True, 'packed')])
+
+
+class TransferItemKeyTests(TestCase):
+    def setUp(self):
+        self.assignment = make_assignment()
+        self.item = make_inventory_item(property=self.assignment.relocation_request.origin_property)
+        self.transfer = make_transfer(assignment=self.assignment, inventory_item=self.item)
+
+    def test_second_transfer_of_an_item_is_rejected(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            make_transfer(assignment=self.assignment, inventory_item=self.item)
+        other = make_transfer(assignment=self.assignment)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            InventoryTransfer.objects.filter(pk=other.pk).update(inventory_item=self.item)
+        # As are duplicates within a statement.
+        item = make_inventory_item()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            InventoryTransfer.objects.bulk_create([
+                InventoryTransfer(assignment=self.assignment, inventory_item=item, item_name='Lamp', room_from='Hall'),
+                InventoryTransfer(assignment=self.assignment, inventory_item=item, item_name='Lamp', room_from='Hall'),
+            ])
+        # Forms tell rather than fail.
+        duplicate = InventoryTransfer(assignment=self.assignment, inventory_item=self.item, item_name='Sofa', room_from='Hall')
+        with self.assertRaisesMessage(ValidationError, 'already in the manifest'):
+            duplicate.full_clean()
+        self.transfer.full_clean()
+
+    def test_keys_follow_the_transfers(self):
+        other = make_transfer()
+        # Moving transfers, between partitions too, and swapping their items frees and takes the keys.
+        InventoryTransfer.objects.filter(pk=self.transfer.pk).update(date_created=timezone.now() - timedelta(days=400))
+        InventoryTransfer.objects.filter(pk=self.transfer.pk).update(assignment=other.assignment)
+        make_transfer(assignment=self.assignment, inventory_item=self.item)
+        self.transfer.delete()
+        make_transfer(assignment=other.assignment, inventory_item=self.item)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            make_transfer(assignment=other.assignment, inventory_item=self.item)
+
+
+class ManifestConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        pool = connection.pool
+        if pool is not None:
+            # A connection for the second sync.
+            self.addCleanup(pool.resize, pool.min_size, pool.max_size)
+            pool.resize(pool.min_size, pool.max_size + 1)
+
+    def test_concurrent_syncs_add_each_item_once(self):
+        assignment = make_assignment()
+        make_inventory_item(property=assignment.relocation_request.origin_property)
+        results = []
+
+        def sync():
+            try:
+                results.append(sync_manifest(assignment))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            self.assertEqual(sync_manifest(assignment), (1, 0, 0))
+            thread = threading.Thread(target=sync)
+            thread.start()
+            thread.join(0.5)
+            # The second sync waits for the first to commit.
+            self.assertTrue(thread.is_alive())
+        thread.join(5)
+        self.assertEqual(results, [(0, 0, 0)])
+        self.assertEqual(assignment.inventory_transfers.count(), 1)
+
+
+class DistanceTests(TestCase):
+    def test_backfill(self):
+        near = make_assignment()
+        near.relocation_request.destination_zip = '62704'
+        near.relocation_request.save()
+        far = make_assignment(relocation_request=make_relocation_request(
+            destination_property=make_property(zip_code='10001-2345'),
+        ))
+        unknown = make_assignment()
+        unknown.relocation_request.destination_zip = '00000'
+        unknown.relocation_request.save()
+        set_already = make_assignment(estimated_distance_km=5)
+        self.assertEqual(backfill_distances(), 2)
+
+        springfield, new_york = geocode('62701'), geocode('10001')
+        far.refresh_from_db()
+        expected = haversine_km(*springfield, *new_york) * DETOUR_FACTOR
+        self.assertAlmostEqual(float(far.estimated_distance_km), expected, places=2)
+        self.assertGreater(float(far.estimated_distance_km), 1000)
+        near.refresh_from_db()
+        self.assertLess(float(near.estimated_distance_km), 20)
+        unknown.refresh_from_db()
+        self.assertIsNone(unknown.estimated_distance_km)
+        set_already.refresh_from_db()
+        self.assertEqual(set_already.estimated_distance_km, 5)
+        # Only the properties of the assignments being filled in are geocoded.
+        self.assertEqual(Property.objects.filter(
+            latitude=springfield[0], longitude=springfield[1],
+        ).count(), 3)
+
+        with self.assertNumQueries(5):
+            self.assertEqual(backfill_distances(), 0)
+        self.assertEqual(backfill_distances(overwrite=True, detour_factor=1), 2)
+        far.refresh_from_db()
+        self.assertAlmostEqual(float(far.estimated_distance_km), expected / DETOUR_FACTOR, places=2)
+
+    def test_zip_changes_clear_coordinates_and_distances(self):
+        far = make_assignment(relocation_request=make_relocation_request(
+            destination_property=make_property(zip_code='10001'),
+        ))
+        near = make_assignment()
+        RelocationRequest.objects.filter(pk=near.relocation_request_id).update(destination_zip='62704')
+        self.assertEqual(backfill_distances(), 2)
+        destination = far.relocation_request.destination_property
+        Property.objects.filter(pk=destination.pk).update(zip_code='62704')
+        RelocationRequest.objects.filter(pk=near.relocation_request_id).update(destination_zip='10001')
+        destination.refresh_from_db()
+        self.assertEqual((destination.latitude, destination.longitude), (None, None))
+        self.assertEqual(RelocationRequest.objects.filter(
+            pk=near.relocation_request_id, destination_latitude__isnull=True,
+        ).count(), 1)
+        self.assertEqual(MovingAssignment.objects.filter(estimated_distance_km__isnull=True).count(), 2)
+        self.assertEqual(backfill_distances(), 2)
+        far.refresh_from_db()
+        near.refresh_from_db()
+        self.assertLess(float(far.estimated_distance_km), 20)
+        self.assertGreater(float(near.estimated_distance_km), 1000)
+        # Coordinates written with the ZIP code, as the admin does, are kept.
+        destination.zip_code, (destination.latitude, destination.longitude) = '10001', geocode('10001')
+        destination.save()
+        destination.refresh_from_db()
+        self.assertEqual((destination.latitude, destination.longitude), geocode('10001'))
+
+    def test_geocode(self):
+        self.assertEqual(geocode('10001'), geocode(' 10001-2345 '))
+        self.assertEqual(geocode('10001', 'United States'), geocode('10001'))
+        self.assertEqual(geocode('10001', 'Canada'), (None, None))
+        self.assertEqual(geocode('1000'), (None, None))
+        self.assertEqual(geocode(''), (None, None))
+        self.assertAlmostEqual(haversine_km(*geocode('10001'), *geocode('10001')), 0)
+
+
+class LoadPlanningTests(TestCase):
+    def test_parse_dimensions(self):
+        cm = (Decimal('120.0'), Decimal('60.0'), Decimal('75.0'))
+        for text in ['120 x 60 x 75', '120x60x75 cm', '1.2 x 0.6 x 0.75 m', '120 × 60 × 75', '1200*600*750 mm']:
+            self.assertEqual(parse_dimensions(text), cm, text)
+        self.assertEqual(parse_dimensions('10 by 20 by 30 in'), (Decimal('25.4'), Decimal('50.8'), Decimal('76.2')))
+        self.assertEqual(parse_dimensions('2 m x 60,5 x 40 cm'), (Decimal('200.0'), Decimal('60.5'), Decimal('40.0')))
+        for text in ['', 'large', '120 x 60', '0 x 60 x 75', '2 x 3 x 2000 m']:
+            self.assertIsNone(parse_dimensions(text), text)
+
+    def test_sql_parser_matches(self):
+        with connection.cursor() as cursor:
+            for text in [
+                '120 x 60 x 75', '1.2 x 0.6 x 0.75 M', '120 × 60 × 75', '1200*600*750 mm', '10 by 20 by 30 inches',
+                '2 m x 60,5 x 40 cm', '12" x 4 x 0.25 cm', ' 1 x 1 x 0.15 x ', '', 'large', '0 x 60 x 75',
+                '2 x 3 x 2000 m', '0.04 x 1 x 1',
+            ]:
+                cursor.execute('SELECT inventory_transfer_dimensions(%s)', [text])
+                sides = cursor.fetchone()[0]
+                self.assertEqual(sides and tuple(sides), parse_dimensions(text), text)
+
+    def test_dimensions_follow_every_write(self):
+        transfer = make_transfer(dimensions='1 x 2 x 0.5 m')
+        self.assertEqual((transfer.length_cm, transfer.width_cm, transfer.height_cm), (100, 200, 50))
+        transfers = InventoryTransfer.objects.filter(pk=transfer.pk)
+        transfers.update(dimensions='10 x 20 x 30')
+        self.assertEqual(transfers.values_list('length_cm', 'width_cm', 'height_cm').get(), (10, 20, 30))
+        transfers.update(length_cm=None)
+        self.assertEqual(transfers.values_list('length_cm', flat=True).get(), 10)
+        bulk, = InventoryTransfer.objects.bulk_create([InventoryTransfer(
+            assignment=transfer.assignment, item_name='Desk', room_from='Office', dimensions='150x80x75 cm',
+        )])
+        self.assertEqual(
+            InventoryTransfer.objects.filter(pk=bulk.pk).values_list('length_cm', 'width_cm', 'height_cm').get(),
+            (150, 80, 75),
+        )
+        # Rows written before the trigger are backfilled.
+        with connection.cursor() as cursor:
+            cursor.execute('ALTER TABLE logistics_inventorytransfer DISABLE TRIGGER inventory_transfer_dimensions')
+            transfers.update(length_cm=None)
+            cursor.execute('ALTER TABLE logistics_inventorytransfer ENABLE TRIGGER inventory_transfer_dimensions')
+        make_transfer(dimensions='unknown')
+        self.assertEqual(backfill_dimensions(), 1)
+        self.assertEqual(transfers.values_list('length_cm', flat=True).get(), 10)
+
+    def test_first_fit_decreasing(self):
+        vehicles = [(1, 1000, Decimal('10.00')), (2, 2000, Decimal('20.00'))]
+        plan = plan_load([
+            (10, Decimal('1500'), 100, 100, 100, False),
+            (11, Decimal('100'), 200, 200, 200, False),
+            (12, Decimal('50'), 200, 200, 100, True),
+            (13, Decimal('3000'), 10, 10, 10, False),
+            (14, None, None, None, None, False),
+        ], vehicles)
+        # The largest vehicle takes everything that fits, fragile items loaded last.
+        self.assertEqual(plan.loads, {2: [10, 11, 14, 12]})
+        self.assertEqual(plan.overflow, [])
+        self.assertEqual(plan.unplaced, [13])
+        self.assertEqual(plan.estimated, 1)
+        self.assertEqual(plan.vehicles_needed, 1)
+        self.assertFalse(plan.fits)
+
+        plan = plan_load([(i, 900, 100, 100, 100, False) for i in range(5)], vehicles)
+        self.assertEqual(plan.loads, {2: [0, 1], 1: [2]})
+        self.assertEqual(plan.overflow, [[3, 4]])
+        self.assertEqual(plan.vehicles_needed, 3)
+        self.assertEqual(plan_load([(1, 10, 10, 10, 10, False)], []).unplaced, [1])
+        self.assertTrue(plan_load([], vehicles).fits)
+
+    def test_plan_assignments(self):
+        assignment = make_assignment()
+        truck = make_vehicle()
+        assignment.crew.vehicles.add(truck, make_vehicle(status='maintenance'))
+        pending = make_transfer(assignment=assignment, dimensions='100 x 100 x 100', estimated_weight_kg=80)
+        make_transfer(assignment=assignment, status='delivered')
+        make_transfer(dimensions='100 x 100 x 100')
+        with self.assertNumQueries(2):
+            plan = plan_assignments(MovingAssignment.objects.filter(pk=assignment.pk))
+        self.assertEqual(plan.loads, {truck.pk: [pending.pk]})
+        self.assertTrue(plan.fits)
+
+
+class ReceiptRenditionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_receipts_are_recompressed(self):
+        output = io.BytesIO()
+        exif = Image.Exif()
+        exif[ExifTags.Base.Make] = 'PhoneCo'
+        Image.new('RGB', (4000, 3000), 'white').save(output, 'PNG', exif=exif.tobytes())
+        expense = make_expense()
+        expense.receipt_image.save('receipt.png', ContentFile(output.getvalue()))
+        upload = expense.receipt_image.name
+        storage = expense.receipt_image.storage
+
+        out = io.StringIO()
+        call_command('generate_renditions', 'logistics.MovingExpense', stdout=out)
+        self.assertIn('logistics.movingexpense: rendered 1 images', out.getvalue())
+        expense.refresh_from_db()
+        self.assertNotEqual(expense.receipt_image.name, upload)
+        with expense.receipt_image.open('rb'):
+            digest = hashlib.sha256(expense.receipt_image.read()).hexdigest()
+            self.assertEqual(expense.receipt_image.name, f'expense_receipts/{digest[:2]}/{digest}.jpg')
+            receipt = Image.open(expense.receipt_image)
+            self.assertEqual((receipt.format, receipt.size), ('JPEG', (2000, 1500)))
+            self.assertEqual(dict(receipt.getexif()), {})
+        self.assertEqual(list(expense.renditions), ['thumbnail'])
+
+        # Rendering again, e.g. for a new size, doesn't recompress the receipt twice.
+        name = expense.receipt_image.name
+        get_renditions(MovingExpense).create([expense])
+        self.assertEqual(expense.receipt_image.name, name)
+        # The upload is left to the garbage collector.
+        self.assertTrue(storage.exists(upload))
+        self.assertEqual(collect_garbage(storage, grace=-1)['deleted'], 1)
+        self.assertFalse(storage.exists(upload))
+        self.assertTrue(storage.exists(name))
+
+
+class TransferStatusApiTests(TestCase):
+    def test_transfer_status(self):
+        driver = make_driver()
+        assignment = make_assignment(crew=make_crew(crew_leader=driver))
+        delivered = make_transfer(assignment=assignment, item_name='Sofa', status='delivered')
+        make_transfer(assignment=assignment, item_name='Lamp', status='loaded', is_fragile=True)
+        make_transfer(assignment=assignment, status='loaded')
+        make_transfer()
+        url = reverse('api-transfer-status', args=[assignment.relocation_request.request_id])
+        self.client.force_login(driver.user)
+        # The session, the user, the request's pk then row, whether the crew may track it, and the transfers.
+        with self.assertNumQueries(6):
+            data = self.client.get(url).json()
+        self.assertEqual(data['counts'], {'delivered': 1, 'loaded': 2})
+        self.assertEqual([transfer['item_name'] for transfer in data['transfers']][:2], ['Sofa', 'Lamp'])
+        self.assertEqual(data['transfers'][0]['id'], delivered.pk)
+        self.assertTrue(data['transfers'][1]['is_fragile'])
+        self.client.force_login(make_user())
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class BenchmarkTests(TestCase):
+    def test_generate_data(self):
+        out = io.StringIO()
+        call_command(
+            'generate_data', clients=20, properties=30, inventory=100, requests=40, vehicles=3, crews=4,
+            assignments=10, transfers=200, expenses=20, prefix='T', stdout=out,
+        )
+        self.assertEqual(InventoryTransfer.objects.count(), 200)
+        self.assertEqual(MovingCrew.objects.filter(crew_id__startswith='T').count(), 4)
+        self.assertFalse(MovingAssignment.objects.exclude(
+            relocation_request__client=models.F('relocation_request__origin_property__owner'),
+        ).exists())
+        self.assertIn('logistics.InventoryTransfer: 200 rows', out.getvalue())
+        # Quotes and timelines, whose triggers set the requests' milestones.
+        requests = RelocationRequest.objects.filter(request_id__startswith='TR')
+        self.assertFalse(requests.exclude(status='pending').filter(quotes=None).exists())
+        completed = requests.filter(status='completed')
+        self.assertTrue(completed.exists())
+        self.assertFalse(completed.exclude(current_milestone='relocation_completed').exists())
+        self.assertEqual(
+            RelocationTimeline.objects.filter(relocation_request__in=completed).count(),
+            completed.count() * len(RelocationTimeline.MILESTONE_TYPES),
+        )
+        self.assertTrue(RelocationTimeline.objects.filter(relocation_request__in=requests, is_completed=False).exists())
+        self.assertFalse(RelocationQuote.objects.filter(relocation_request__in=requests, total_cost__lte=0).exists())
+        with self.assertRaises(CommandError):
+            call_command('generate_data', clients=1, prefix='T', stdout=io.StringIO())
+
+    def test_benchmark_suite(self):
+        make_transfer()
+        make_inventory_item(property=make_assignment().relocation_request.origin_property)
+        baseline = Path(tempfile.mkdtemp()) / 'baseline.json'
+        self.addCleanup(shutil.rmtree, baseline.parent)
+        call_command('benchmark_suite', repeat=1, output=str(baseline), stderr=io.StringIO())
+        report = json.loads(baseline.read_text())
+        self.assertEqual(report['rows']['logistics.InventoryTransfer'], 1)
+        for case in [
+            'sync_manifest',
+            'logistics.MovingAssignment change form', 'logistics.InventoryTransfer search',
+            'logistics.InventoryTransfer export_csv', 'relocations.RelocationRequest changelist',
+        ]:
+            self.assertGreater(report['results'][case]['queries'], 0, case)
+        self.assertFalse(User.objects.filter(username='benchmark-suite').exists())
+
+        # Queries added to a case fail the comparison.
+        report['results']['sync_manifest']['queries'] = 0
+        baseline.write_text(json.dumps(report))
+        err = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '1 regressions: sync_manifest.'):
+            call_command(
+                'benchmark_suite', repeat=1, only='sync_manifest', compare=str(baseline), threshold=1e9,
+                stdout=io.StringIO(), stderr=err,
+            )
+        self.assertIn('REGRESSION', err.getvalue())
+
+
+class BenchmarkServersTests(LiveServerTestCase):
+    """benchmark_servers against the live server instead of gunicorn."""
+
+    def setUp(self):
+        pool = connection.pool
+        if pool is not None:
+            # Connections for the live server's threads.
+            self.addCleanup(pool.resize, pool.min_size, pool.max_size)
+            pool.resize(pool.min_size, pool.max_size + 4)
+        self.relocation = make_assignment().relocation_request
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        self.mix, self.output = directory / 'mix.json', directory / 'results.json'
+
+    @contextlib.contextmanager
+    def serve(self, app, *options, env=None):
+        yield self.server_thread.port
+
+    def run_command(self, **options):
+        with mock.patch('logistics.management.commands.benchmark_servers.serve', self.serve):
+            call_command(
+                'benchmark_servers', modes=['sync'], concurrency=[2], duration=0.5, output=str(self.output),
+                stdout=io.StringIO(), **options,
+            )
+        return json.loads(self.output.read_text())['results']
+
+    def test_sample(self):
+        mix = BenchmarkServersCommand().sample(10)
+        self.assertEqual(mix['weights'], WEIGHTS)
+        self.assertEqual(set(mix['paths']), set(mix['weights']))
+        self.assertEqual(mix['paths']['api status'], [reverse('api-request-status', args=[self.relocation.request_id])])
+        self.assertIn(
+            reverse('admin:relocations_relocationrequest_change', args=[self.relocation.pk]),
+            mix['paths']['admin change form'],
+        )
+        RelocationRequest.objects.all().delete()
+        with self.assertRaisesMessage(CommandError, 'pass --generate'):
+            BenchmarkServersCommand().sample(10)
+
+    def test_record_and_replay(self):
+        results = self.run_command(record=str(self.mix))
+        mix = json.loads(self.mix.read_text())
+        self.assertEqual(mix['paths']['api timeline'], [
+            reverse('api-request-timeline', args=[self.relocation.request_id]),
+        ])
+        totals = {result['endpoint']: result for result in results}['all']
+        self.assertGreater(totals['requests'], 0)
+        self.assertEqual(totals['errors'], 0)
+        self.assertFalse(User.objects.filter(username='benchmark-servers').exists())
+
+        # The recorded mix is replayed as it is, rather than sampled again.
+        mix['paths'] = {'api status': mix['paths']['api status']}
+        mix['weights'] = {'api status': 1}
+        self.mix.write_text(json.dumps(mix))
+        results = self.run_command(mix=str(self.mix))
+        self.assertEqual({result['endpoint'] for result in results}, {'api status', 'all'})
+        self.assertGreater(results[0]['requests'], 0)
+        self.assertEqual(results[0]['errors'], 0)
+
+
+class TransitionTests(AdminLoginMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.driver = make_driver()
+        self.assignment = make_assignment(crew=make_crew(crew_leader=self.driver))
+        self.packed_at = timezone.now() - timedelta(hours=1)
+        self.pending, self.packed, self.loaded, self.delivered = [
+            make_transfer(assignment=self.assignment, status=status, packed_datetime=self.packed_at)
+            for status in ['pending', 'packed', 'loaded', 'delivered']
+        ]
+        self.elsewhere = make_transfer()
+
+    def test_transition_transfers(self):
+        ids = [t.pk for t in [self.pending, self.packed, self.loaded, self.delivered, self.elsewhere]] + [0]
+        with self.assertNumQueries(1):
+            moved, rejections = transition_transfers(ids, 'loaded', self.driver, self.assignment)
+        self.assertEqual(moved, [self.pending.pk, self.packed.pk])
+        self.assertEqual(rejections, {
+            self.loaded.pk: 'Already loaded.',
+            self.delivered.pk: 'Cannot go from delivered to loaded.',
+            self.elsewhere.pk: 'Not a transfer of this assignment.',
+            0: 'Not a transfer of this assignment.',
+        })
+        self.pending.refresh_from_db()
+        self.assertEqual((self.pending.status, self.pending.handled_by), ('loaded', self.driver))
+        self.assertIsNotNone(self.pending.loaded_datetime)
+        # Earlier scans keep their time.
+        self.assertEqual(self.pending.packed_datetime, self.packed_at)
+        self.loaded.refresh_from_db()
+        self.assertIsNone(self.loaded.handled_by)
+
+        moved, _ = transition_transfers([self.loaded.pk], 'damaged')
+        self.loaded.refresh_from_db()
+        self.assertEqual((moved, self.loaded.status, self.loaded.damage_reported), ([self.loaded.pk], 'damaged', True))
+        with self.assertRaises(ValueError):
+            transition_transfers([self.pending.pk], 'unpacked')
+
+    def test_api(self):
+        url = reverse('api-transfer-transition', args=[self.assignment.relocation_request.request_id])
+        self.client.force_login(self.driver.user)
+        response = self.client.post(url, {
+            'status': 'packed', 'transfers': [self.pending.pk, self.loaded.pk],
+        }, content_type='application/json')
+        self.assertEqual(response.json(), {
+            'request_id': self.assignment.relocation_request.request_id, 'status': 'packed',
+            'moved': [self.pending.pk], 'rejected': {str(self.loaded.pk): 'Cannot go from loaded to packed.'},
+        })
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.handled_by, self.driver)
+        for data in [
+            {'status': 'packed'}, {'status': 'packed', 'transfers': str(self.pending.pk)},
+            {'status': 'packed', 'transfers': [True]}, {'status': 'packed', 'transfers': [float(self.pending.pk)]},
+            {'status': 'packed', 'transfers': [str(self.pending.pk)]}, {'status': 'packed', 'transfers': [2 ** 63]},
+            {'status': ['packed'], 'transfers': []}, [],
+        ]:
+            response = self.client.post(url, data, content_type='application/json')
+            self.assertEqual(response.status_code, 400, data)
+        self.assertEqual(self.client.get(url).status_code, 405)
+        # The client tracks the request but doesn't scan items.
+        client = self.assignment.relocation_request.client
+        client.user = make_user()
+        client.save()
+        self.client.force_login(client.user)
+        response = self.client.post(url, {'status': 'lost', 'transfers': [self.pending.pk]}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_admin_action(self):
+        response = self.client.post(reverse('admin:logistics_inventorytransfer_changelist'), {
+            'action': 'mark_delivered', '_selected_action': [self.loaded.pk, self.pending.pk],
+        }, follow=True)
+        self.assertContains(response, 'Transfers marked delivered: 1.')
+        self.assertContains(response, 'Cannot go from pending to delivered. (1)')
+        self.loaded.refresh_from_db()
+        self.assertEqual(self.loaded.status, 'delivered')
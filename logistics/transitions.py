@@ -0,0 +1,89 @@
+"""
+Transfer status transitions.
+
+Crews scan items through ``InventoryTransfer.status`` by the truckload.
+``transition_transfers()`` moves any number of them to a status in a single
+statement: it checks each item's move against ``TRANSITIONS``, updates those
+allowed, stamping the status's datetime field and who handled them, and
+tells why the others were rejected.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from .models import InventoryTransfer
+
+# The statuses each status may move to. Items needn't be scanned at every
+# step, e.g. furniture is loaded without being packed.
+TRANSITIONS = {
+    'pending': ['packed', 'loaded', 'damaged', 'lost'],
+    'packed': ['loaded', 'damaged', 'lost'],
+    'loaded': ['in_transit', 'delivered', 'damaged', 'lost'],
+    'in_transit': ['delivered', 'damaged', 'lost'],
+    'delivered': ['damaged'],
+    'damaged': [],
+    'lost': [],
+}
+
+# The field stamped with the time of the move to each status.
+STAMPS = {
+    'packed': 'packed_datetime',
+    'loaded': 'loaded_datetime',
+    'delivered': 'delivered_datetime',
+}
+
+
+def transition_transfers(transfer_ids, status, handled_by=None, assignment=None, at=None, using=DEFAULT_DB_ALIAS):
+    """
+    Move the transfers ``transfer_ids`` to ``status`` and return
+    ``(moved, rejections)``: the ids of the transfers moved, and a reason
+    for each of the others, by id. Only transfers of ``assignment`` are
+    moved, if given. ``handled_by`` is recorded when given, and the status's
+    datetime field set to ``at``, now by default, unless already set by an
+    earlier scan.
+    """
+    if status not in TRANSITIONS:
+        raise ValueError(f'Unknown transfer status {status!r}.')
+    sources = [source for source, targets in TRANSITIONS.items() if status in targets]
+    table = InventoryTransfer._meta.db_table
+    stamp = STAMPS.get(status)
+    assignments = 'AND t.assignment_id = %(assignment)s' if assignment is not None else ''
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"""
+            WITH scanned AS (
+                SELECT DISTINCT unnest(%(ids)s::bigint[]) AS id
+            ), current AS (
+                SELECT t.id, t.status FROM {table} t JOIN scanned s ON s.id = t.id {assignments}
+                ORDER BY t.id FOR UPDATE OF t
+            ), moved AS (
+                UPDATE {table} t SET
+                    status = %(status)s,
+                    handled_by_id = coalesce(%(handled_by)s, t.handled_by_id)
+                    {f', {stamp} = coalesce(t.{stamp}, %(at)s)' if stamp else ''}
+                    {', damage_reported = true' if status == 'damaged' else ''}
+                FROM current c
+                WHERE t.id = c.id AND c.status = ANY(%(sources)s)
+                RETURNING t.id
+            )
+            SELECT s.id, c.status, m.id IS NOT NULL
+            FROM scanned s LEFT JOIN current c ON c.id = s.id LEFT JOIN moved m ON m.id = s.id
+            ORDER BY s.id
+        """, {
+            'ids': [int(pk) for pk in transfer_ids],
+            'status': status,
+            'handled_by': handled_by.pk if handled_by is not None else None,
+            'assignment': assignment.pk if assignment is not None else None,
+            'at': at or timezone.now(),
+            'sources': sources,
+        })
+        rows = cursor.fetchall()
+    moved, rejections = [], {}
+    for pk, current, was_moved in rows:
+        if was_moved:
+            moved.append(pk)
+        elif current is None:
+            rejections[pk] = 'No such transfer.' if assignment is None else 'Not a transfer of this assignment.'
+        elif current == status:
+            rejections[pk] = f'Already {status}.'
+        else:
+            rejections[pk] = f'Cannot go from {current} to {status}.'
+    return moved, rejections
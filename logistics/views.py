@@ -1,3 +1,73 @@
-from django.shortcuts import render
+import json
+from collections import Counter
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.core.exceptions import PermissionDenied
+from django.db.models import BigIntegerField, Q
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET, require_POST
+
+from relocations.views import get_tracked_request
+from .models import Driver, InventoryTransfer, MovingAssignment, MovingCrew
+from .transitions import TRANSITIONS, transition_transfers
+
+TRANSFER_FIELDS = [
+    'id', 'item_name', 'room_from', 'room_to', 'is_fragile', 'status', 'packed_datetime', 'loaded_datetime',
+    'delivered_datetime', 'damage_reported',
+]
+
+
+@require_GET
+async def transfer_status(request, request_id):
+    """The status of each item moved for a relocation request, see relocations.views."""
+    relocation = await get_tracked_request(request, request_id)
+    transfers = [
+        transfer async for transfer in InventoryTransfer.objects.filter(
+            assignment__relocation_request=relocation,
+        ).order_by('id').values(*TRANSFER_FIELDS)
+    ]
+    return JsonResponse({
+        'request_id': request_id,
+        'counts': Counter(transfer['status'] for transfer in transfers),
+        'transfers': transfers,
+    })
+
+
+@require_POST
+async def transition_transfers_view(request, request_id):
+    """
+    Move the transfers scanned by the crew of a relocation request to a
+    status, all in one request: ``{"status": "loaded", "transfers": [ids]}``.
+    Answers with the ids moved and the reason each of the others wasn't.
+    Only the crew's members, recorded as having handled the items, and staff
+    may move them.
+    """
+    relocation = await get_tracked_request(request, request_id)
+    user = await request.auser()
+    assignment = await MovingAssignment.objects.filter(relocation_request=relocation).afirst()
+    if assignment is None:
+        raise Http404('The relocation request has no assignment.')
+    driver = await Driver.objects.filter(user=user).afirst()
+    on_crew = driver is not None and await MovingCrew.objects.filter(
+        Q(crew_leader=driver) | Q(members=driver), pk=assignment.crew_id,
+    ).aexists()
+    if not (on_crew or user.is_staff):
+        raise PermissionDenied
+    try:
+        data = json.loads(request.body)
+        status, transfer_ids = data['status'], data['transfers']
+    except (ValueError, TypeError, KeyError):
+        status = transfer_ids = None
+    if not isinstance(status, str) or not isinstance(transfer_ids, list) or not all(map(is_id, transfer_ids)):
+        return JsonResponse({'error': 'Send {"status": ..., "transfers": [ids]} as JSON.'}, status=400)
+    if status not in TRANSITIONS:
+        return JsonResponse({'error': f'Unknown status {status!r}.'}, status=400)
+    moved, rejections = await sync_to_async(transition_transfers)(
+        transfer_ids, status, handled_by=driver if on_crew else None, assignment=assignment,
+    )
+    return JsonResponse({'request_id': request_id, 'status': status, 'moved': moved, 'rejected': rejections})
+
+
+def is_id(value):
+    """Whether the JSON ``value`` is an integer a bigint primary key can hold, as opposed to a bool or a string."""
+    return isinstance(value, int) and not isinstance(value, bool) and 0 < value <= BigIntegerField.MAX_BIGINT
@@ -1,20 +1,45 @@
-from django.contrib import admin
+import csv
+import io
+
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from smartmove.admin import (
+    FacetListFilter, FullTextSearchMixin, KeysetPaginationMixin, QueryBudgetMixin, RenditionsMixin,
+)
+from smartmove.bulkload import read_csv
+from smartmove.geocoding import geocode
+from .forms import InventoryImportForm
+from .importer import InventoryImport
 from .models import Property, PropertyImage, PropertyInventory
 
-class PropertyImageInline(admin.TabularInline):
+class PropertyImageInline(RenditionsMixin, QueryBudgetMixin, admin.TabularInline):
     model = PropertyImage
     extra = 1
+    readonly_fields = ['thumbnail']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('property')
 
-class PropertyInventoryInline(admin.TabularInline):
+class PropertyInventoryInline(QueryBudgetMixin, admin.TabularInline):
     model = PropertyInventory
     extra = 0
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('property')
+
 @admin.register(Property)
-class PropertyAdmin(admin.ModelAdmin):
+class PropertyAdmin(
+    FullTextSearchMixin, KeysetPaginationMixin, RenditionsMixin, QueryBudgetMixin, admin.ModelAdmin,
+):
     list_display = ['property_id', 'owner', 'property_type', 'city', 'state', 'bedrooms', 'bathrooms', 'square_feet', 'is_active']
-    list_filter = ['property_type', 'is_active', 'city', 'state', 'has_elevator', 'has_parking']
+    list_select_related = ['owner']
+    list_filter = ['property_type', 'is_active', ('city', FacetListFilter), ('state', FacetListFilter), 'has_elevator', 'has_parking']
     search_fields = ['property_id', 'owner__first_name', 'owner__last_name', 'address', 'city']
-    readonly_fields = ['date_created', 'date_updated']
+    readonly_fields = ['latitude', 'longitude', 'date_created', 'date_updated']
+    raw_id_fields = ['owner']
     inlines = [PropertyImageInline, PropertyInventoryInline]
     
     fieldsets = (
@@ -22,7 +47,7 @@ class PropertyAdmin(admin.ModelAdmin):
             'fields': ('property_id', 'owner', 'property_type')
         }),
         ('Location', {
-            'fields': ('address', 'city', 'state', 'zip_code', 'country')
+            'fields': ('address', 'city', 'state', 'zip_code', 'country', 'latitude', 'longitude')
         }),
         ('Property Details', {
             'fields': ('bedrooms', 'bathrooms', 'square_feet', 'floor_number', 'has_elevator', 'has_parking', 'has_storage')
@@ -35,9 +60,65 @@ class PropertyAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        if not change or {'zip_code', 'country'} & set(form.changed_data):
+            obj.latitude, obj.longitude = geocode(obj.zip_code, obj.country)
+        super().save_model(request, obj, form, change)
+
 @admin.register(PropertyInventory)
-class PropertyInventoryAdmin(admin.ModelAdmin):
+class PropertyInventoryAdmin(FullTextSearchMixin, KeysetPaginationMixin, QueryBudgetMixin, admin.ModelAdmin):
     list_display = ['property', 'room', 'item_name', 'condition', 'is_fragile', 'estimated_value']
-    list_filter = ['condition', 'is_fragile', 'requires_special_handling', 'property__property_type']
+    list_select_related = ['property']
+    list_filter = ['condition', 'is_fragile', 'requires_special_handling', ('property__property_type', FacetListFilter)]
     search_fields = ['property__property_id', 'item_name', 'room', 'description']
     readonly_fields = ['date_created']
+    raw_id_fields = ['property']
+    change_list_template = 'admin/properties/propertyinventory/change_list.html'
+    max_import_errors = 200
+    # Rejected rows listed as messages once the others are imported.
+    max_import_error_messages = 20
+
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name=f'{opts.app_label}_{opts.model_name}_import'),
+            *super().get_urls(),
+        ]
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = InventoryImportForm(request.POST or None, request.FILES or None)
+        errors = []
+        if form.is_valid():
+            file = io.TextIOWrapper(form.cleaned_data['file'], encoding='utf-8-sig', newline='')
+            try:
+                columns, rows = read_csv(file)
+                importer = InventoryImport(
+                    columns, property=form.cleaned_data['property'], assignment=form.cleaned_data['assignment'],
+                )
+                created, errors = importer.load(rows, start=2)
+            except (ValueError, csv.Error) as e:
+                form.add_error('file', str(e))
+            else:
+                level = messages.WARNING if errors else messages.SUCCESS
+                self.message_user(request, f'Imported {created} items, {len(errors)} rows rejected.', level)
+                if created or not errors:
+                    # The imported rows are committed: the form isn't shown again, as submitting it
+                    # again would import them twice.
+                    for line, message in errors[:self.max_import_error_messages]:
+                        self.message_user(request, f'Line {line}: {message}', messages.WARNING)
+                    if len(errors) > self.max_import_error_messages:
+                        self.message_user(
+                            request, f'Only the first {self.max_import_error_messages} rejected rows are listed.',
+                            messages.WARNING,
+                        )
+                    return redirect(f'admin:{self.opts.app_label}_{self.opts.model_name}_changelist')
+        return TemplateResponse(request, 'admin/properties/propertyinventory/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': 'Import inventory',
+            'form': form,
+            'import_errors': errors[:self.max_import_errors],
+            'import_error_count': len(errors),
+        })
@@ -0,0 +1,4 @@
+from smartmove.cache import ObjectCache, register
+from .models import Property
+
+register(ObjectCache(Property, 'property_id', select_related=['owner']))
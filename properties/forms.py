@@ -0,0 +1,49 @@
+from django import forms
+
+from logistics.models import MovingAssignment
+from smartmove.cache import get_object_cache
+from .models import Property
+
+
+class InventoryImportForm(forms.Form):
+    file = forms.FileField(help_text=(
+        'CSV with a header line naming the fields: property (its property ID), room, item_name, description, '
+        'condition, estimated_value, is_fragile, requires_special_handling, special_instructions.'
+    ))
+    property = forms.CharField(
+        required=False, max_length=20, label='Property ID',
+        help_text='Import every item into this property instead of reading it from the file.',
+    )
+    assignment = forms.IntegerField(
+        required=False, label='Moving assignment ID',
+        help_text=(
+            'Also add every item imported to this assignment as a pending transfer. The items must be '
+            "of the origin property of the assignment's relocation request."
+        ),
+    )
+
+    def clean_property(self):
+        property_id = self.cleaned_data['property']
+        if not property_id:
+            return None
+        try:
+            return get_object_cache(Property).get(property_id=property_id)
+        except Property.DoesNotExist:
+            raise forms.ValidationError('No property with this ID.')
+
+    def clean_assignment(self):
+        pk = self.cleaned_data['assignment']
+        if pk is None:
+            return None
+        try:
+            return MovingAssignment.objects.select_related('relocation_request').get(pk=pk)
+        except MovingAssignment.DoesNotExist:
+            raise forms.ValidationError('No moving assignment with this ID.')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        prop, assignment = cleaned_data.get('property'), cleaned_data.get('assignment')
+        # Transfers of other properties' items would be removed by the next manifest sync.
+        if prop is not None and assignment is not None and assignment.relocation_request.origin_property_id != prop.pk:
+            self.add_error('assignment', "The property isn't the origin of this assignment's relocation request.")
+        return cleaned_data
@@ -0,0 +1,66 @@
+"""
+Bulk inventory import, e.g. from a surveyor's CSV export.
+"""
+from django.db import DEFAULT_DB_ALIAS
+
+from logistics.manifest import item_values
+from logistics.models import InventoryTransfer
+from relocations.models import RelocationRequest
+from smartmove.bulkload import StagedImport, insert_select_sql
+
+from .models import Property, PropertyInventory
+
+
+class InventoryImport(StagedImport):
+    """
+    Import ``PropertyInventory`` items, identifying each row's property by
+    its ``property_id`` unless ``property`` is given for the whole file. With
+    an ``assignment``, every item imported is also added to it as a pending
+    ``InventoryTransfer``, and rows for another property than the origin of
+    its relocation request are rejected, as ``sync_manifest()`` would remove
+    their transfers.
+    """
+    model = PropertyInventory
+    fields = [
+        'property', 'room', 'item_name', 'description', 'condition', 'estimated_value',
+        'is_fragile', 'requires_special_handling', 'special_instructions',
+    ]
+    natural_keys = {'property': 'property_id'}
+
+    def __init__(self, columns, property=None, assignment=None, using=DEFAULT_DB_ALIAS):
+        if property is not None and assignment is not None:
+            if assignment.relocation_request.origin_property_id != property.pk:
+                raise ValueError("The property isn't the origin of the assignment's relocation request.")
+        super().__init__(columns, {'property': property} if property is not None else None, using)
+        self.assignment = assignment
+
+    def checks(self, connection):
+        checks, params = super().checks(connection)
+        if self.assignment is not None and 'property' not in self.related:
+            i = [field.name for field in self.columns].index('property')
+            key = connection.ops.quote_name(Property._meta.get_field(self.natural_keys['property']).column)
+            checks.append(
+                'WHEN s.c%d IS DISTINCT FROM (SELECT p.%s FROM %s p JOIN %s r ON r.origin_property_id = p.id '
+                'WHERE r.id = %%s) THEN format(%%s, s.c%d)' % (
+                    i, key, Property._meta.db_table, RelocationRequest._meta.db_table, i,
+                )
+            )
+            params.extend([
+                self.assignment.relocation_request_id,
+                "property: %L isn't the origin of the assignment's relocation request.",
+            ])
+        return checks, params
+
+    def insert(self, cursor, source):
+        if self.assignment is None:
+            return super().insert(cursor, source)
+        # Insert the items and their transfers in one statement so each
+        # transfer is linked to its item, as sync_manifest() links them.
+        items, item_params = insert_select_sql(cursor.db, self.model, self.expressions(), source)
+        transfers, transfer_params = insert_select_sql(cursor.db, InventoryTransfer, {
+            'assignment_id': str(int(self.assignment.pk)),
+            'inventory_item_id': 'i.id',
+            **item_values('i'),
+        }, 'items i')
+        cursor.execute(f'WITH items AS ({items} RETURNING *) {transfers}', [*item_params, *transfer_params])
+        return cursor.rowcount
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from smartmove import renditions
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the renditions that uploaded images are missing, e.g. those uploaded before renditions existed '
+        'or after a size was added, on a process pool.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help='Model labels, e.g. properties.PropertyImage; defaults to all.')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        renditions.autodiscover()
+        labels = [label.lower() for label in options['models']] or sorted(renditions.registry)
+        for label in labels:
+            if label not in renditions.registry:
+                choices = ', '.join(sorted(renditions.registry))
+                raise CommandError(f"No renditions for '{label}'. Choose from: {choices}.")
+        for label in labels:
+            started = time.perf_counter()
+            model_renditions = renditions.registry[label]
+            field_name = model_renditions.field_name
+            queryset = model_renditions.model._default_manager.using(options['database']).exclude(
+                Q(**{f'{field_name}__isnull': True}) | Q(**{field_name: ''}),
+            ).exclude(renditions__has_keys=list(model_renditions.sizes)).order_by('pk')
+            count, last = 0, None
+            while batch := list((queryset if last is None else queryset.filter(pk__gt=last))[:options['batch_size']]):
+                count += model_renditions.create(batch)
+                last = batch[-1].pk
+            self.stdout.write(f'{label}: rendered {count} images in {time.perf_counter() - started:.2f}s.')
@@ -0,0 +1,51 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from logistics.models import MovingAssignment
+from properties.importer import InventoryImport
+from properties.models import Property
+from smartmove.bulkload import read_csv
+
+
+class Command(BaseCommand):
+    help = (
+        'Import property inventory items from a CSV file with a header line naming the fields. Rows '
+        'with errors are reported and skipped; the others are loaded through COPY in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="CSV file to import, or '-' for stdin.")
+        parser.add_argument('--property', help='property_id of the property every item belongs to.')
+        parser.add_argument('--assignment', type=int, help='ID of a moving assignment to add the items to.')
+        parser.add_argument('--batch-size', type=int, default=InventoryImport.batch_size)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        prop = assignment = None
+        try:
+            if options['property']:
+                prop = Property.objects.using(using).get(property_id=options['property'])
+            if options['assignment']:
+                assignment = MovingAssignment.objects.using(using).get(pk=options['assignment'])
+        except (Property.DoesNotExist, MovingAssignment.DoesNotExist) as e:
+            raise CommandError(e)
+        file = sys.stdin if options['file'] == '-' else open(options['file'], newline='', encoding='utf-8-sig')
+        with file:
+            columns, rows = read_csv(file)
+            try:
+                importer = InventoryImport(columns, property=prop, assignment=assignment, using=using)
+            except ValueError as e:
+                raise CommandError(e)
+            importer.batch_size = options['batch_size']
+            started = time.perf_counter()
+            created, errors = importer.load(rows, start=2)
+            elapsed = time.perf_counter() - started
+        for line, message in errors:
+            self.stderr.write(f'Line {line}: {message}')
+        self.stdout.write(
+            f'Imported {created} items in {elapsed:.2f}s ({created / max(elapsed, 1e-6):,.0f} rows/s), {len(errors)} rows rejected.'
+        )
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:19
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking out writes on the large tables.
+    atomic = False
+
+    dependencies = [
+        ('clients', '0002_hot_path_indexes'),
+        ('properties', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='property',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-date_created'], name='property_active_created_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:28
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('clients', '0003_search_indexes'),
+        ('properties', '0002_hot_path_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='property',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('property_id', 'address', 'city', config='simple'), name='property_search_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='propertyinventory',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('item_name', 'room', 'description', config='simple'), name='inventory_search_idx'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations
+
+from smartmove.facets import CreateFacet
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0005_image_renditions'),
+    ]
+
+    operations = [
+        CreateFacet('property', 'city'),
+        CreateFacet('property', 'state'),
+        CreateFacet('propertyinventory', 'property__property_type'),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from clients.models import Client
+from smartmove.search import search_index
 
 class Property(models.Model):
     PROPERTY_TYPES = [
@@ -21,6 +22,9 @@ class Property(models.Model):
     state = models.CharField(max_length=100)
     zip_code = models.CharField(max_length=10)
     country = models.CharField(max_length=100, default='United States')
+    # Cached centroid of the ZIP code, see smartmove.geocoding.
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
     
     # Property details
     bedrooms = models.IntegerField(validators=[MinValueValidator(0)], null=True, blank=True)
@@ -45,6 +49,10 @@ class Property(models.Model):
     class Meta:
         ordering = ['-date_created']
         verbose_name_plural = 'Properties'
+        indexes = [
+            models.Index(fields=['-date_created'], condition=models.Q(is_active=True), name='property_active_created_idx'),
+            search_index('property_search_idx', 'property_id', 'address', 'city'),
+        ]
         
     def __str__(self):
         return f"{self.property_id} - {self.address}, {self.city}"
@@ -56,6 +64,8 @@ class Property(models.Model):
 class PropertyImage(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='property_images/')
+    # Names of the downsized copies of the image, see smartmove.renditions.
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     caption = models.CharField(max_length=200, blank=True)
     is_primary = models.BooleanField(default=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -85,6 +95,9 @@ class PropertyInventory(models.Model):
     
     class Meta:
         verbose_name_plural = 'Property Inventories'
+        indexes = [
+            search_index('inventory_search_idx', 'item_name', 'room', 'description'),
+        ]
         
     def __str__(self):
         return f"{self.item_name} - {self.property.property_id}"
@@ -0,0 +1,4 @@
+from smartmove.renditions import Renditions, register
+from .models import PropertyImage
+
+register(Renditions(PropertyImage, 'image', {'thumbnail': 320, 'medium': 1280}))
@@ -1,3 +1,232 @@
-from django.test import TestCase
+import hashlib
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import ExifTags, Image
+
+from logistics.models import InventoryTransfer
+from smartmove.renditions import EXTENSIONS, FORMAT, get_renditions
+from smartmove.testing import (
+    AdminLoginMixin, AdminQueryBudgetMixin, make_assignment, make_client, make_inventory_item, make_property,
+    make_property_image, make_relocation_request,
+)
+from .importer import InventoryImport
+from .models import Property, PropertyImage, PropertyInventory
+
+
+class AdminQueryBudgetTests(AdminQueryBudgetMixin, TestCase):
+    def test_property_changelist(self):
+        self.assertChangelistWithinBudget(Property, 7, make_property)
+
+    def test_property_inventory_changelist(self):
+        # One more than the choices alone cost for the counts of property types.
+        self.assertChangelistWithinBudget(PropertyInventory, 6, make_inventory_item)
+
+    def test_property_change_form_with_inlines(self):
+        prop = make_property()
+
+        def make_row():
+            make_property_image(property=prop)
+            make_inventory_item(property=prop)
+
+        self.assertChangeFormWithinBudget(prop, 6, make_row)
+
+    def test_property_inventory_change_form(self):
+        item = make_inventory_item()
+        self.assertChangeFormWithinBudget(item, 5, make_client)
+
+
+class InventoryImportTests(TestCase):
+    columns = ['property', 'room', 'item_name', 'condition', 'estimated_value', 'is_fragile']
+
+    def setUp(self):
+        self.property = make_property()
+
+    def load(self, rows, **kwargs):
+        importer = InventoryImport(self.columns, **kwargs)
+        importer.batch_size = 2
+        return importer.load(rows, start=2)
+
+    def test_valid_rows_are_loaded_and_invalid_ones_reported(self):
+        pid = self.property.property_id
+        created, errors = self.load([
+            [pid, 'Kitchen', 'Table', 'fair', '120.50', 'yes'],
+            ['NOPE', 'Kitchen', 'Chair', 'good', '', ''],
+            [pid, 'Kitchen', 'Lamp', 'broken', '', ''],
+            [pid, 'Office', 'Desk', '', 'lots', ''],
+            [pid, '', 'Rug', '', '', ''],
+            [pid, 'Office'],
+            [],
+            [pid, ' Office ', 'Chair', '', '', 'no'],
+        ])
+        self.assertEqual(created, 2)
+        self.assertEqual(errors, [
+            (3, "property: No property with property_id 'NOPE'."),
+            (4, "condition: Value 'broken' is not a valid choice."),
+            (5, 'estimated_value: invalid input syntax for type numeric: "lots"'),
+            (6, 'room: This field is required.'),
+            (7, 'Expected 6 values, got 2.'),
+        ])
+        items = PropertyInventory.objects.filter(property=self.property).order_by('pk')
+        self.assertEqual(
+            [(item.room, item.item_name, item.condition, item.estimated_value, item.is_fragile) for item in items],
+            [('Kitchen', 'Table', 'fair', Decimal('120.50'), True), ('Office', 'Chair', 'good', None, False)],
+        )
+
+    def test_property_for_every_row(self):
+        self.columns = ['room', 'item_name']
+        created, errors = self.load([['Garage', 'Bike'], ['Garage', 'Tools'], ['Attic', 'Boxes']], property=self.property)
+        self.assertEqual((created, errors), (3, []))
+        self.assertEqual(self.property.inventory.count(), 3)
+
+    def test_transfers_for_assignment(self):
+        assignment = make_assignment(relocation_request=make_relocation_request(origin_property=self.property))
+        pid = self.property.property_id
+        other = make_property().property_id
+        created, errors = self.load([
+            [pid, 'Kitchen', 'Table', '', '', 'yes'],
+            [pid, 'Kitchen', 'Lamp', 'bad', '', ''],
+            [other, 'Kitchen', 'Chair', '', '', ''],
+        ], assignment=assignment)
+        self.assertEqual(created, 1)
+        self.assertEqual(errors[1], (4, f"property: '{other}' isn't the origin of the assignment's relocation request."))
+        transfer, = InventoryTransfer.objects.filter(assignment=assignment)
+        self.assertEqual((transfer.item_name, transfer.room_from, transfer.is_fragile, transfer.status), (
+            'Table', 'Kitchen', True, 'pending',
+        ))
+        self.assertEqual(transfer.inventory_item, PropertyInventory.objects.get(item_name='Table'))
+        with self.assertRaisesMessage(ValueError, "The property isn't the origin of the assignment's relocation request."):
+            InventoryImport(['room', 'item_name'], property=make_property(), assignment=assignment)
+
+    def test_columns_are_checked(self):
+        with self.assertRaisesMessage(ValueError, 'Unknown columns: colour.'):
+            InventoryImport(['property', 'room', 'item_name', 'colour'])
+        with self.assertRaisesMessage(ValueError, 'Missing columns: property, item_name.'):
+            InventoryImport(['room'])
+
+
+class AdminInventoryImportTests(AdminLoginMixin, TestCase):
+    url = reverse('admin:properties_propertyinventory_import')
+
+    def upload(self, content, follow=False, **data):
+        return self.client.post(
+            self.url, {'file': SimpleUploadedFile('inventory.csv', content.encode()), **data}, follow=follow,
+        )
+
+    def test_import(self):
+        prop = make_property()
+        response = self.upload(f'property,room,item_name\n{prop.property_id},Kitchen,Table\n')
+        self.assertRedirects(response, reverse('admin:properties_propertyinventory_changelist'))
+        self.assertEqual(prop.inventory.get().item_name, 'Table')
+
+    def test_import_reports_rejected_rows(self):
+        prop = make_property()
+        response = self.upload('room,item_name\nKitchen,Table\n,Chair\n', property=prop.property_id, follow=True)
+        self.assertRedirects(response, reverse('admin:properties_propertyinventory_changelist'))
+        self.assertEqual([str(message) for message in response.context['messages']], [
+            'Imported 1 items, 1 rows rejected.', 'Line 3: room: This field is required.',
+        ])
+        self.assertEqual(prop.inventory.count(), 1)
+        # Nothing imported, so the file can be fixed and sent again.
+        response = self.upload('room,item_name\n,Chair\n', property=prop.property_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['import_errors'], [(2, 'room: This field is required.')])
+
+    def test_assignment_of_another_property(self):
+        assignment = make_assignment()
+        response = self.upload('room,item_name\nKitchen,Table\n', property=make_property().property_id, assignment=assignment.pk)
+        self.assertFormError(
+            response.context['form'], 'assignment', "The property isn't the origin of this assignment's relocation request.",
+        )
+        response = self.upload(
+            'room,item_name\nKitchen,Table\n', property=assignment.relocation_request.origin_property.property_id,
+            assignment=assignment.pk,
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(InventoryTransfer.objects.get(assignment=assignment).item_name, 'Table')
+
+    def test_invalid_header(self):
+        response = self.upload('room\nKitchen\n')
+        self.assertFormError(response.context['form'], 'file', 'Missing columns: property, item_name.')
+
+
+def photo(size=(1200, 900), orientation=6):
+    """A JPEG such as a phone takes: EXIF with camera details and the orientation to display it in."""
+    exif = Image.Exif()
+    exif[ExifTags.Base.Orientation] = orientation
+    exif[ExifTags.Base.Make] = 'PhoneCo'
+    output = io.BytesIO()
+    Image.new('RGB', size, 'teal').save(output, 'JPEG', exif=exif.tobytes())
+    return output.getvalue()
+
+
+class RenditionTests(AdminLoginMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.renditions = get_renditions(PropertyImage)
+
+    def make_image(self, data):
+        image = PropertyImage(property=make_property())
+        image.image.save('IMG_0001.jpg', ContentFile(data))
+        return image
+
+    def test_renditions(self):
+        data = photo()
+        image, copy = self.make_image(data), self.make_image(data)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.renditions.create([image]), 1)
+        self.assertEqual(PropertyImage.objects.get(pk=image.pk).renditions, image.renditions)
+        self.assertEqual(set(image.renditions), {'thumbnail', 'medium'})
+        for path in image.renditions.values():
+            # Stored next to the original, under their own SHA-256.
+            with image.image.storage.open(path) as file:
+                digest = hashlib.sha256(file.read()).hexdigest()
+            self.assertEqual(path, f'property_images/{digest[:2]}/{digest}.{EXTENSIONS[FORMAT]}')
+        with image.image.storage.open(image.renditions['thumbnail']) as file:
+            thumbnail = Image.open(file)
+            # Turned upright, cut down and stripped of the camera's EXIF.
+            self.assertEqual(thumbnail.size, (240, 320))
+            self.assertEqual(dict(thumbnail.getexif()), {})
+        with image.image.storage.open(image.renditions['medium']) as file:
+            self.assertEqual(Image.open(file).size, (900, 1200))
+
+        # The same photo uploaded again reuses them.
+        with mock.patch('smartmove.renditions.pool') as pool:
+            self.renditions.create([copy])
+        pool.assert_not_called()
+        self.assertEqual(copy.renditions, image.renditions)
+
+    def test_admin_renders_uploads_and_shows_thumbnails(self):
+        prop = make_property()
+        url = reverse('admin:properties_property_change', args=[prop.pk])
+        response = self.client.get(url)
+        data = {}
+        forms = [response.context['adminform'].form]
+        for inline in response.context['inline_admin_formsets']:
+            forms += [inline.formset.management_form, *inline.formset.forms]
+        for form in forms:
+            for field in form:
+                value = field.value()
+                if value is True:
+                    data[field.html_name] = 'on'
+                elif value is not None and value is not False and value != '':
+                    data[field.html_name] = value
+        data['images-0-image'] = SimpleUploadedFile('IMG_0002.jpg', photo(orientation=1), 'image/jpeg')
+        response = self.client.post(url, data)
+        self.assertRedirects(response, reverse('admin:properties_property_changelist'))
+
+        image = prop.images.get()
+        self.assertEqual(set(image.renditions), {'thumbnail', 'medium'})
+        response = self.client.get(url)
+        self.assertContains(response, f'<img src="{image.image.storage.url(image.renditions["thumbnail"])}"')
+        self.assertNotContains(response, f'<img src="{image.image.url}"')
@@ -1,22 +1,43 @@
 from django.contrib import admin
+from smartmove.admin import (
+    ExportMixin, FacetListFilter, FullTextSearchMixin, KeysetPaginationMixin, QueryBudgetMixin,
+)
+from smartmove.geocoding import geocode
 from .models import RelocationRequest, RelocationQuote, RelocationTimeline
 
-class RelocationQuoteInline(admin.TabularInline):
+class RelocationQuoteInline(QueryBudgetMixin, admin.TabularInline):
     model = RelocationQuote
     extra = 0
     readonly_fields = ['total_cost']
 
-class RelocationTimelineInline(admin.TabularInline):
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('relocation_request__client')
+
+class RelocationTimelineInline(QueryBudgetMixin, admin.TabularInline):
     model = RelocationTimeline
     extra = 0
     readonly_fields = ['date_created']
+    cached_choice_fields = ['updated_by']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('relocation_request')
 
 @admin.register(RelocationRequest)
-class RelocationRequestAdmin(admin.ModelAdmin):
-    list_display = ['request_id', 'client', 'relocation_type', 'status', 'priority', 'preferred_date', 'assigned_to', 'estimated_cost']
-    list_filter = ['status', 'priority', 'relocation_type', 'requires_packing', 'requires_storage', 'date_created']
+class RelocationRequestAdmin(
+    ExportMixin, FullTextSearchMixin, KeysetPaginationMixin, QueryBudgetMixin, admin.ModelAdmin,
+):
+    list_display = ['request_id', 'client', 'relocation_type', 'status', 'current_milestone', 'priority', 'preferred_date', 'assigned_to', 'estimated_cost']
+    list_select_related = ['client', 'assigned_to']
+    list_filter = [
+        'status', ('current_milestone', FacetListFilter), 'priority', 'relocation_type', 'requires_packing',
+        'requires_storage', 'date_created',
+    ]
     search_fields = ['request_id', 'client__first_name', 'client__last_name', 'origin_property__address']
-    readonly_fields = ['date_created', 'date_updated']
+    readonly_fields = [
+        'destination_latitude', 'destination_longitude', 'current_milestone', 'current_milestone_datetime',
+        'milestone_progress', 'date_created', 'date_updated',
+    ]
+    raw_id_fields = ['client', 'origin_property', 'destination_property']
     inlines = [RelocationQuoteInline, RelocationTimelineInline]
     
     fieldsets = (
@@ -27,12 +48,15 @@ class RelocationRequestAdmin(admin.ModelAdmin):
             'fields': ('origin_property', 'destination_property')
         }),
         ('Destination Address (if no property record)', {
-            'fields': ('destination_address', 'destination_city', 'destination_state', 'destination_zip', 'destination_country'),
+            'fields': ('destination_address', 'destination_city', 'destination_state', 'destination_zip', 'destination_country', 'destination_latitude', 'destination_longitude'),
             'classes': ['collapse']
         }),
         ('Scheduling', {
             'fields': ('preferred_date', 'alternative_date', 'scheduled_date', 'actual_start_date', 'actual_completion_date')
         }),
+        ('Progress', {
+            'fields': ('current_milestone', 'current_milestone_datetime', 'milestone_progress')
+        }),
         ('Services Required', {
             'fields': ('requires_packing', 'requires_unpacking', 'requires_storage', 'requires_insurance', 'requires_cleaning')
         }),
@@ -44,12 +68,20 @@ class RelocationRequestAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        if not change or {'destination_zip', 'destination_country'} & set(form.changed_data):
+            obj.destination_latitude, obj.destination_longitude = geocode(obj.destination_zip, obj.destination_country)
+        super().save_model(request, obj, form, change)
+
 @admin.register(RelocationQuote)
-class RelocationQuoteAdmin(admin.ModelAdmin):
+class RelocationQuoteAdmin(FullTextSearchMixin, KeysetPaginationMixin, QueryBudgetMixin, admin.ModelAdmin):
     list_display = ['quote_number', 'relocation_request', 'status', 'total_cost', 'valid_until', 'date_created']
+    list_select_related = ['relocation_request__client']
     list_filter = ['status', 'date_created', 'valid_until']
     search_fields = ['quote_number', 'relocation_request__request_id', 'relocation_request__client__first_name']
+    id_search_fields = ['quote_number', 'relocation_request__request_id']
     readonly_fields = ['total_cost', 'date_created']
+    raw_id_fields = ['relocation_request']
     
     fieldsets = (
         ('Quote Information', {
@@ -67,8 +99,10 @@ class RelocationQuoteAdmin(admin.ModelAdmin):
     )
 
 @admin.register(RelocationTimeline)
-class RelocationTimelineAdmin(admin.ModelAdmin):
+class RelocationTimelineAdmin(FullTextSearchMixin, KeysetPaginationMixin, QueryBudgetMixin, admin.ModelAdmin):
     list_display = ['relocation_request', 'milestone_type', 'scheduled_datetime', 'actual_datetime', 'is_completed', 'updated_by']
+    list_select_related = ['relocation_request__client', 'updated_by']
     list_filter = ['milestone_type', 'is_completed', 'scheduled_datetime']
     search_fields = ['relocation_request__request_id', 'description']
     readonly_fields = ['date_created']
+    raw_id_fields = ['relocation_request']
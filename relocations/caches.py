@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+
+from smartmove.cache import ObjectCache, register
+from .models import RelocationRequest, RelocationTimeline
+
+requests = register(ObjectCache(
+    RelocationRequest, 'request_id', select_related=['client', 'origin_property', 'destination_property'],
+))
+
+
+def timeline_changed(sender, instance, **kwargs):
+    # The triggers of migration 0009 may have moved the request's current milestone.
+    requests.invalidate(instance.relocation_request_id)
+
+
+post_save.connect(timeline_changed, sender=RelocationTimeline)
+post_delete.connect(timeline_changed, sender=RelocationTimeline)
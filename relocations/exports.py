@@ -0,0 +1,25 @@
+from django.db.models import Value
+from django.db.models.functions import Concat
+
+from smartmove.exports import Export, register
+from .models import RelocationRequest
+
+register(Export(RelocationRequest, [
+    ('request_id', 'request_id'),
+    ('client_id', 'client__client_id'),
+    ('client_name', Concat('client__first_name', Value(' '), 'client__last_name')),
+    ('company_name', 'client__company_name'),
+    ('origin_property_id', 'origin_property__property_id'),
+    ('origin_city', 'origin_property__city'),
+    ('destination_city', 'destination_city'),
+    ('destination_country', 'destination_country'),
+    ('relocation_type', 'relocation_type'),
+    ('status', 'status'),
+    ('priority', 'priority'),
+    ('preferred_date', 'preferred_date'),
+    ('scheduled_date', 'scheduled_date'),
+    ('estimated_cost', 'estimated_cost'),
+    ('actual_cost', 'actual_cost'),
+    ('assigned_to', 'assigned_to__username'),
+    ('date_created', 'date_created'),
+], name='relocation_requests'))
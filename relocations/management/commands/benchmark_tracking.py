@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from smartmove.loadtest import load, logged_in, serve
+
+from ...models import RelocationRequest
+
+ENDPOINTS = {
+    'status': 'api-request-status',
+    'timeline': 'api-request-timeline',
+    'transfers': 'api-transfer-status',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Poll the tracking API from many concurrent clients, served by gunicorn under WSGI with threaded '
+        'workers and under ASGI with uvicorn workers, and compare throughput and latency. The servers use '
+        'the database of the current settings; a staff user and its session are created for the run and '
+        'deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 500])
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per run.')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--threads', type=int, default=8, help='Threads of each WSGI worker.')
+        parser.add_argument('--sample', type=int, default=500, help='Relocation requests polled.')
+
+    def handle(self, *args, **options):
+        request_ids = list(
+            RelocationRequest.objects.order_by('?').values_list('request_id', flat=True)[:options['sample']]
+        )
+        if not request_ids:
+            raise CommandError('There are no relocation requests to track.')
+        mix = {
+            kind: [reverse(name, args=[request_id]) for request_id in request_ids]
+            for kind, name in ENDPOINTS.items()
+        }
+        workers = ['--workers', str(options['workers'])]
+        servers = [
+            ('wsgi', 'smartmove.wsgi:application', [*workers, '--threads', str(options['threads'])],
+             {'GUNICORN_THREADS': str(options['threads'])}),
+            # With as many connections per process as the WSGI workers.
+            ('asgi', 'smartmove.asgi:application', [*workers, '--worker-class', 'uvicorn_worker.UvicornWorker'],
+             {'DB_POOL_SIZE': str(options['threads'])}),
+        ]
+
+        user = User.objects.create_user('benchmark-tracking', is_staff=True)
+        try:
+            with logged_in(user) as headers:
+                self.stdout.write(
+                    f"{'server':<6} {'clients':>7} {'endpoint':<10} {'req/s':>8} "
+                    f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+                )
+                for server, app, gunicorn_options, env in servers:
+                    with serve(app, *gunicorn_options, env=env) as port:
+                        # Warm up the workers and their connections.
+                        load(port, mix, options['workers'] * 4, 1, headers)
+                        for concurrency in options['concurrency']:
+                            results = load(port, mix, concurrency, options['duration'], headers)
+                            for kind, result in results.items():
+                                self.stdout.write(
+                                    f"{server:<6} {concurrency:>7} {kind:<10} {result['rate']:>8.0f} "
+                                    f"{self.ms(result['p50'])} {self.ms(result['p95'])} {self.ms(result['p99'])} "
+                                    f"{result['errors']:>7}"
+                                )
+        finally:
+            user.delete()
+
+    def ms(self, value):
+        return f'{value:>9.1f}' if value is not None else f"{'-':>9}"
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from relocations.pricing import generate_quotes, unquoted_requests
+
+
+class Command(BaseCommand):
+    help = (
+        'Price every pending relocation request without an open quote from the rate table '
+        '(settings.QUOTE_RATES over relocations.pricing.DEFAULT_RATES) and create draft quotes in bulk.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        quotes = generate_quotes(unquoted_requests(options['database']), batch_size=options['batch_size'])
+        self.stdout.write(f'Created {len(quotes)} draft quotes in {time.perf_counter() - started:.2f}s.')
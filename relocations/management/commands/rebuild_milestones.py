@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from smartmove.cache import get_object_cache
+
+from ...models import RelocationRequest
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the current milestone of every relocation request from its timeline. Triggers keep it up '
+        'to date; this is for after writes that fire none, such as TRUNCATE or a restore, or to check them. '
+        'Requests whose timeline was partly archived keep their milestone unless an entry left is later.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000, help='Requests per transaction.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        last, checked, refreshed = 0, 0, 0
+        while True:
+            with transaction.atomic(using), connections[using].cursor() as cursor:
+                cursor.execute(
+                    'SELECT max(id), count(*), relocation_request_refresh_milestones(array_agg(id ORDER BY id)) '
+                    f'FROM (SELECT id FROM {RelocationRequest._meta.db_table} WHERE id > %s ORDER BY id LIMIT %s) batch',
+                    [last, options['batch_size']],
+                )
+                last, count, changed = cursor.fetchone()
+            if not count:
+                break
+            checked += count
+            refreshed += changed
+        if refreshed:
+            get_object_cache(RelocationRequest).invalidate_all()
+        self.stdout.write(f'Checked {checked} relocation requests, refreshed {refreshed}.')
@@ -0,0 +1,43 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from relocations.models import RelocationQuote
+from relocations.pricing import COST_FIELDS, OPEN_STATUSES, reprice
+
+
+def factor(value):
+    name, sep, number = value.partition('=')
+    try:
+        if not sep or name not in COST_FIELDS:
+            raise InvalidOperation
+        return name, Decimal(number)
+    except InvalidOperation:
+        raise ValueError(value)
+
+
+class Command(BaseCommand):
+    help = (
+        'Reprice quotes in a single UPDATE: scale cost fields and/or apply a new tax rate. Totals are '
+        'computed by the database and follow.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tax-rate', type=Decimal, help='Tax rate on the subtotal, e.g. 0.0825.')
+        parser.add_argument(
+            '--factor', type=factor, action='append', default=[], metavar='FIELD=FACTOR',
+            help=f'Multiply a cost field, e.g. transportation_cost=1.05. One of: {", ".join(COST_FIELDS)}.',
+        )
+        parser.add_argument(
+            '--status', nargs='+', default=OPEN_STATUSES, choices=[key for key, _ in RelocationQuote.QUOTE_STATUS],
+            help=f'Statuses of the quotes to reprice; defaults to {" and ".join(OPEN_STATUSES)}.',
+        )
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['tax_rate'] is None and not options['factor']:
+            raise CommandError('Give a --tax-rate or at least one --factor.')
+        queryset = RelocationQuote.objects.using(options['database']).filter(status__in=options['status'])
+        count = reprice(queryset, options['tax_rate'], **dict(options['factor']))
+        self.stdout.write(f'Repriced {count} quotes.')
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:19
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking out writes on the large tables.
+    atomic = False
+
+    dependencies = [
+        ('clients', '0002_hot_path_indexes'),
+        ('properties', '0002_hot_path_indexes'),
+        ('relocations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='relocationrequest',
+            index=models.Index(fields=['-date_created'], name='relreq_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='relocationrequest',
+            index=models.Index(fields=['status', 'priority', 'preferred_date'], name='relreq_status_prio_pref_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='relocationrequest',
+            index=models.Index(fields=['status', '-date_created'], name='relreq_status_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='relocationrequest',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'approved', 'in_progress', 'on_hold'])), fields=['priority', 'preferred_date'], name='relreq_open_prio_pref_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:28
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('clients', '0003_search_indexes'),
+        ('properties', '0003_search_indexes'),
+        ('relocations', '0002_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='relocationquote',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('quote_number', config='simple'), name='quote_search_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='relocationrequest',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('request_id', config='simple'), name='relreq_search_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='relocationtimeline',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('description', config='simple'), name='timeline_search_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-17 04:51
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('relocations', '0003_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='relocationtimeline',
+            index=models.Index(fields=['scheduled_datetime', 'date_created'], name='timeline_scheduled_idx'),
+        ),
+    ]
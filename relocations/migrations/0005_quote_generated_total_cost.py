@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relocations', '0004_timeline_ordering_index'),
+    ]
+
+    operations = [
+        # A column can't be altered into a generated one: drop it and add it
+        # back as GENERATED ALWAYS AS (...) STORED. Adding it rewrites the
+        # table, computing total_cost afresh for every existing quote, which
+        # also corrects totals left stale by bulk writes.
+        migrations.RemoveField(
+            model_name='relocationquote',
+            name='total_cost',
+        ),
+        migrations.AddField(
+            model_name='relocationquote',
+            name='total_cost',
+            field=models.GeneratedField(db_persist=True, expression=models.F('base_cost') + models.F('packing_cost') + models.F('transportation_cost') + models.F('insurance_cost') + models.F('storage_cost') + models.F('additional_services_cost') + models.F('tax_amount'), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-17 05:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relocations', '0005_quote_generated_total_cost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relocationrequest',
+            name='destination_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='relocationrequest',
+            name='destination_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
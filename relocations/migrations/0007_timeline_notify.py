@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Publishes timeline entries on the channel smartmove.events listens to.
+NOTIFY_FUNCTION = """
+CREATE FUNCTION relocation_timeline_notify() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('relocation_events', json_build_object(
+        'type', 'timeline',
+        'request', NEW.relocation_request_id,
+        'id', NEW.id,
+        'milestone_type', NEW.milestone_type,
+        'is_completed', NEW.is_completed,
+        'scheduled_datetime', NEW.scheduled_datetime,
+        'actual_datetime', NEW.actual_datetime
+    )::text);
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER relocation_timeline_notify
+    AFTER INSERT OR UPDATE ON relocations_relocationtimeline
+    FOR EACH ROW EXECUTE FUNCTION relocation_timeline_notify();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relocations', '0006_destination_coordinates'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            NOTIFY_FUNCTION,
+            reverse_sql="""
+            DROP TRIGGER relocation_timeline_notify ON relocations_relocationtimeline;
+            DROP FUNCTION relocation_timeline_notify();
+            """,
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('relocations', '0007_timeline_notify'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='relocationtimeline',
+            index=models.Index(
+                condition=models.Q(('is_completed', True)),
+                fields=['relocation_request', '-scheduled_datetime', '-date_created', '-id'],
+                name='timeline_completed_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+# The milestones in order, so that reaching the n-th of 14 is n * 100 / 14 percent.
+MILESTONES = (
+    "'quote_sent', 'quote_accepted', 'survey_scheduled', 'survey_completed', 'packing_started', "
+    "'packing_completed', 'loading_started', 'loading_completed', 'in_transit', 'unloading_started', "
+    "'unloading_completed', 'unpacking_started', 'unpacking_completed', 'relocation_completed'"
+)
+
+# Sets the current milestone of the requests from their timelines: the last
+# completed entry in the timeline's order, entries without a scheduled time
+# last. Requests whose milestone is unchanged aren't written.
+REFRESH_FUNCTION = f"""
+CREATE FUNCTION relocation_request_refresh_milestones(request_ids bigint[]) RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    refreshed integer;
+BEGIN
+    UPDATE relocations_relocationrequest r SET
+        current_milestone = m.milestone_type,
+        current_milestone_datetime = m.reached,
+        milestone_progress = coalesce(
+            array_position(ARRAY[{MILESTONES}], m.milestone_type::text) * 100
+            / cardinality(ARRAY[{MILESTONES}]), 0
+        )
+    FROM unnest(request_ids) AS ids (id)
+    LEFT JOIN LATERAL (
+        SELECT t.milestone_type, coalesce(t.actual_datetime, t.scheduled_datetime) AS reached
+        FROM relocations_relocationtimeline t
+        WHERE t.relocation_request_id = ids.id AND t.is_completed
+        ORDER BY t.scheduled_datetime DESC NULLS FIRST, t.date_created DESC, t.id DESC
+        LIMIT 1
+    ) m ON true
+    WHERE r.id = ids.id
+    AND (r.current_milestone, r.current_milestone_datetime) IS DISTINCT FROM (m.milestone_type, m.reached);
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END
+$$;
+"""
+
+# Refreshes the requests whose timeline a statement changed, once per
+# statement, in the order of their ids to avoid deadlocks.
+TRIGGERS = """
+CREATE FUNCTION relocation_timeline_milestones() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM relocation_request_refresh_milestones(ARRAY(
+            SELECT DISTINCT relocation_request_id FROM new_rows WHERE is_completed ORDER BY 1
+        ));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM relocation_request_refresh_milestones(ARRAY(
+            SELECT DISTINCT relocation_request_id FROM old_rows WHERE is_completed ORDER BY 1
+        ));
+    ELSE
+        PERFORM relocation_request_refresh_milestones(ARRAY(
+            SELECT DISTINCT unnest(ARRAY[o.relocation_request_id, n.relocation_request_id])
+            FROM old_rows o JOIN new_rows n ON n.id = o.id
+            WHERE (o.is_completed OR n.is_completed)
+            AND (o.relocation_request_id, o.milestone_type, o.is_completed, o.scheduled_datetime,
+                 o.actual_datetime, o.date_created)
+            IS DISTINCT FROM (n.relocation_request_id, n.milestone_type, n.is_completed,
+                              n.scheduled_datetime, n.actual_datetime, n.date_created)
+            ORDER BY 1
+        ));
+    END IF;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER relocation_timeline_milestones_insert
+    AFTER INSERT ON relocations_relocationtimeline REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION relocation_timeline_milestones();
+CREATE TRIGGER relocation_timeline_milestones_delete
+    AFTER DELETE ON relocations_relocationtimeline REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION relocation_timeline_milestones();
+CREATE TRIGGER relocation_timeline_milestones_update
+    AFTER UPDATE ON relocations_relocationtimeline REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION relocation_timeline_milestones();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER relocation_timeline_milestones_insert ON relocations_relocationtimeline;
+DROP TRIGGER relocation_timeline_milestones_delete ON relocations_relocationtimeline;
+DROP TRIGGER relocation_timeline_milestones_update ON relocations_relocationtimeline;
+DROP FUNCTION relocation_timeline_milestones();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0004_client_facets'),
+        ('properties', '0006_property_facets'),
+        ('relocations', '0008_timeline_completed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relocationrequest',
+            name='current_milestone',
+            field=models.CharField(blank=True, choices=[('quote_sent', 'Quote Sent'), ('quote_accepted', 'Quote Accepted'), ('survey_scheduled', 'Survey Scheduled'), ('survey_completed', 'Survey Completed'), ('packing_started', 'Packing Started'), ('packing_completed', 'Packing Completed'), ('loading_started', 'Loading Started'), ('loading_completed', 'Loading Completed'), ('in_transit', 'In Transit'), ('unloading_started', 'Unloading Started'), ('unloading_completed', 'Unloading Completed'), ('unpacking_started', 'Unpacking Started'), ('unpacking_completed', 'Unpacking Completed'), ('relocation_completed', 'Relocation Completed')], editable=False, max_length=30, null=True),
+        ),
+        migrations.AddField(
+            model_name='relocationrequest',
+            name='current_milestone_datetime',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='relocationrequest',
+            name='milestone_progress',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(REFRESH_FUNCTION, reverse_sql='DROP FUNCTION relocation_request_refresh_milestones(bigint[]);'),
+        migrations.RunSQL(TRIGGERS, reverse_sql=DROP_TRIGGERS),
+        # The milestones of the existing requests are set by 0013, in batches outside of this
+        # migration's transaction and its lock of the table, and counted by 0014's facet.
+    ]
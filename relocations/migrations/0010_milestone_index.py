@@ -0,0 +1,17 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('relocations', '0009_current_milestone'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='relocationrequest',
+            index=models.Index(fields=['current_milestone', 'current_milestone_datetime'], name='relreq_milestone_idx'),
+        ),
+    ]
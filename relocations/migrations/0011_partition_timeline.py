@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from smartmove.partitions import PartitionByRange
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relocations', '0010_milestone_index'),
+    ]
+
+    operations = [
+        PartitionByRange('relocationtimeline', 'date_created'),
+    ]
@@ -0,0 +1,57 @@
+from importlib import import_module
+
+from django.db import migrations, models
+
+current_milestone = import_module('relocations.migrations.0009_current_milestone')
+
+# As in 0009, except that the milestone of a request whose timeline was
+# partly archived only moves on to a later one of the entries left: those
+# archived can't be compared with.
+REFRESH_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION relocation_request_refresh_milestones(request_ids bigint[]) RETURNS integer
+LANGUAGE plpgsql AS $$
+DECLARE
+    refreshed integer;
+BEGIN
+    UPDATE relocations_relocationrequest r SET
+        current_milestone = m.milestone_type,
+        current_milestone_datetime = m.reached,
+        milestone_progress = coalesce(
+            array_position(ARRAY[{current_milestone.MILESTONES}], m.milestone_type::text) * 100
+            / cardinality(ARRAY[{current_milestone.MILESTONES}]), 0
+        )
+    FROM unnest(request_ids) AS ids (id)
+    LEFT JOIN LATERAL (
+        SELECT t.milestone_type, coalesce(t.actual_datetime, t.scheduled_datetime) AS reached
+        FROM relocations_relocationtimeline t
+        WHERE t.relocation_request_id = ids.id AND t.is_completed
+        ORDER BY t.scheduled_datetime DESC NULLS FIRST, t.date_created DESC, t.id DESC
+        LIMIT 1
+    ) m ON true
+    WHERE r.id = ids.id
+    AND (r.current_milestone, r.current_milestone_datetime) IS DISTINCT FROM (m.milestone_type, m.reached)
+    AND (NOT r.timeline_archived OR r.current_milestone IS NULL OR m.reached >= r.current_milestone_datetime);
+    GET DIAGNOSTICS refreshed = ROW_COUNT;
+    RETURN refreshed;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relocations', '0011_partition_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relocationrequest',
+            name='timeline_archived',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunSQL(
+            REFRESH_FUNCTION,
+            reverse_sql=current_milestone.REFRESH_FUNCTION.replace('CREATE FUNCTION', 'CREATE OR REPLACE FUNCTION', 1),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, transaction
+
+BATCH_SIZE = 10000
+
+
+def backfill_milestones(apps, schema_editor):
+    # A transaction per batch, as in rebuild_milestones, so that each locks
+    # the rows of its requests only for as long as it takes to refresh them.
+    connection = schema_editor.connection
+    table = apps.get_model('relocations', 'RelocationRequest')._meta.db_table
+    last = 0
+    while True:
+        with transaction.atomic(connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT max(id), count(*), relocation_request_refresh_milestones(array_agg(id ORDER BY id)) '
+                f'FROM (SELECT id FROM {table} WHERE id > %s ORDER BY id LIMIT %s) batch',
+                [last, BATCH_SIZE],
+            )
+            last, count, _ = cursor.fetchone()
+        if not count:
+            break
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('relocations', '0012_timeline_archived'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_milestones, migrations.RunPython.noop, elidable=True),
+    ]
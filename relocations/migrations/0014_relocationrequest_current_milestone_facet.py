@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from smartmove.facets import Facet
+
+
+def create_facet(apps, schema_editor):
+    facet = Facet(apps.get_model('relocations', 'RelocationRequest'), 'current_milestone')
+    # Databases migrated before the facet was moved out of 0009 have it already.
+    if facet.table not in schema_editor.connection.introspection.table_names():
+        for statement in [*facet.create_sql(), facet.count_sql()]:
+            schema_editor.execute(statement)
+
+
+def drop_facet(apps, schema_editor):
+    for statement in Facet(apps.get_model('relocations', 'RelocationRequest'), 'current_milestone').drop_sql():
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relocations', '0013_backfill_milestones'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_facet, drop_facet),
+    ]
@@ -3,6 +3,27 @@ from django.core.validators import MinValueValidator
 from django.contrib.auth.models import User
 from clients.models import Client
 from properties.models import Property
+from smartmove.search import search_index
+
+# In the order relocations go through them.
+MILESTONE_TYPES = [
+    ('quote_sent', 'Quote Sent'),
+    ('quote_accepted', 'Quote Accepted'),
+    ('survey_scheduled', 'Survey Scheduled'),
+    ('survey_completed', 'Survey Completed'),
+    ('packing_started', 'Packing Started'),
+    ('packing_completed', 'Packing Completed'),
+    ('loading_started', 'Loading Started'),
+    ('loading_completed', 'Loading Completed'),
+    ('in_transit', 'In Transit'),
+    ('unloading_started', 'Unloading Started'),
+    ('unloading_completed', 'Unloading Completed'),
+    ('unpacking_started', 'Unpacking Started'),
+    ('unpacking_completed', 'Unpacking Completed'),
+    ('relocation_completed', 'Relocation Completed'),
+]
+
+MILESTONE_FIELDS = ['current_milestone', 'current_milestone_datetime', 'milestone_progress', 'timeline_archived']
 
 class RelocationRequest(models.Model):
     STATUS_CHOICES = [
@@ -39,6 +60,9 @@ class RelocationRequest(models.Model):
     destination_state = models.CharField(max_length=100, blank=True)
     destination_zip = models.CharField(max_length=10, blank=True)
     destination_country = models.CharField(max_length=100, blank=True)
+    # Cached centroid of destination_zip, see smartmove.geocoding.
+    destination_latitude = models.FloatField(null=True, blank=True)
+    destination_longitude = models.FloatField(null=True, blank=True)
     
     relocation_type = models.CharField(max_length=20, choices=RELOCATION_TYPES, default='local')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -67,15 +91,46 @@ class RelocationRequest(models.Model):
     notes = models.TextField(blank=True)
     assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_relocations')
     
+    # The last completed milestone of the timeline, when it was reached, and how far along
+    # MILESTONE_TYPES it is in percent. Kept by database triggers, see migration 0009.
+    current_milestone = models.CharField(max_length=30, choices=MILESTONE_TYPES, null=True, blank=True, editable=False)
+    current_milestone_datetime = models.DateTimeField(null=True, blank=True, editable=False)
+    milestone_progress = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Whether entries of the timeline were archived, see archive_partitions. The milestone then
+    # only moves on to a later one of the remaining entries, rather than be recomputed from them.
+    timeline_archived = models.BooleanField(default=False, editable=False)
+    
     # Timestamps
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-date_created']
+        indexes = [
+            models.Index(fields=['-date_created'], name='relreq_created_idx'),
+            models.Index(fields=['status', 'priority', 'preferred_date'], name='relreq_status_prio_pref_idx'),
+            models.Index(fields=['status', '-date_created'], name='relreq_status_created_idx'),
+            models.Index(
+                fields=['priority', 'preferred_date'],
+                condition=models.Q(status__in=['pending', 'approved', 'in_progress', 'on_hold']),
+                name='relreq_open_prio_pref_idx',
+            ),
+            search_index('relreq_search_idx', 'request_id'),
+            models.Index(fields=['current_milestone', 'current_milestone_datetime'], name='relreq_milestone_idx'),
+        ]
         
     def __str__(self):
         return f"{self.request_id} - {self.client.full_name}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            # Leave the milestone to the triggers, rather than write back the one read with the row.
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in MILESTONE_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
     
     @property
     def full_destination_address(self):
@@ -110,7 +165,16 @@ class RelocationQuote(models.Model):
     storage_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
     additional_services_cost = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0, validators=[MinValueValidator(0)])
-    total_cost = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    # Computed by the database so bulk writes and QuerySet.update() keep it right.
+    total_cost = models.GeneratedField(
+        expression=(
+            models.F('base_cost') + models.F('packing_cost') + models.F('transportation_cost') +
+            models.F('insurance_cost') + models.F('storage_cost') + models.F('additional_services_cost') +
+            models.F('tax_amount')
+        ),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
     
     # Validity
     valid_until = models.DateField()
@@ -121,35 +185,16 @@ class RelocationQuote(models.Model):
     date_sent = models.DateTimeField(null=True, blank=True)
     date_responded = models.DateTimeField(null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            search_index('quote_search_idx', 'quote_number'),
+        ]
+    
     def __str__(self):
         return f"Quote {self.quote_number} - {self.relocation_request.client.full_name}"
     
-    def save(self, *args, **kwargs):
-        # Calculate total cost
-        self.total_cost = (
-            self.base_cost + self.packing_cost + self.transportation_cost + 
-            self.insurance_cost + self.storage_cost + self.additional_services_cost + 
-            self.tax_amount
-        )
-        super().save(*args, **kwargs)
-
 class RelocationTimeline(models.Model):
-    MILESTONE_TYPES = [
-        ('quote_sent', 'Quote Sent'),
-        ('quote_accepted', 'Quote Accepted'),
-        ('survey_scheduled', 'Survey Scheduled'),
-        ('survey_completed', 'Survey Completed'),
-        ('packing_started', 'Packing Started'),
-        ('packing_completed', 'Packing Completed'),
-        ('loading_started', 'Loading Started'),
-        ('loading_completed', 'Loading Completed'),
-        ('in_transit', 'In Transit'),
-        ('unloading_started', 'Unloading Started'),
-        ('unloading_completed', 'Unloading Completed'),
-        ('unpacking_started', 'Unpacking Started'),
-        ('unpacking_completed', 'Unpacking Completed'),
-        ('relocation_completed', 'Relocation Completed'),
-    ]
+    MILESTONE_TYPES = MILESTONE_TYPES
     
     relocation_request = models.ForeignKey(RelocationRequest, on_delete=models.CASCADE, related_name='timeline')
     milestone_type = models.CharField(max_length=30, choices=MILESTONE_TYPES)
@@ -159,10 +204,20 @@ class RelocationTimeline(models.Model):
     is_completed = models.BooleanField(default=False)
     notes = models.TextField(blank=True)
     updated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    # The table is partitioned by month of date_created, see smartmove.partitions.
     date_created = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['scheduled_datetime', 'date_created']
+        indexes = [
+            models.Index(fields=['scheduled_datetime', 'date_created'], name='timeline_scheduled_idx'),
+            # The last completed entry of a request, as the milestone triggers look it up.
+            models.Index(
+                fields=['relocation_request', '-scheduled_datetime', '-date_created', '-id'],
+                condition=models.Q(is_completed=True), name='timeline_completed_idx',
+            ),
+            search_index('timeline_search_idx', 'description'),
+        ]
         
     def __str__(self):
         return f"{self.relocation_request.request_id} - {self.get_milestone_type_display()}"
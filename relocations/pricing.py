@@ -0,0 +1,249 @@
+"""
+Quote pricing.
+
+``generate_quotes()`` prices requests in bulk: their features are fetched in
+a few set-based queries, every cost component is computed at once as NumPy
+arrays from a rate table, and the draft quotes are written with
+``bulk_create()``.
+
+``total_cost`` is a generated column, so repricing is a matter of updating
+the cost fields: ``reprice()`` does it for any number of quotes in a single
+``UPDATE`` and every total follows.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import add
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from logistics.models import InventoryTransfer
+from properties.models import PropertyInventory
+from .models import RelocationQuote, RelocationRequest
+
+# Quotes that can still be repriced.
+OPEN_STATUSES = ['draft', 'sent']
+
+# The costs tax is charged on.
+COST_FIELDS = [
+    'base_cost', 'packing_cost', 'transportation_cost', 'insurance_cost', 'storage_cost', 'additional_services_cost',
+]
+
+
+# Amounts are in the quote currency; keys of dicts are relocation types.
+# settings.QUOTE_RATES overrides any of them.
+DEFAULT_RATES = {
+    'base': {'local': 350, 'long_distance': 900, 'international': 2500, 'corporate': 1500},
+    'per_bedroom': 120,
+    'per_square_foot': 0.25,
+    'per_km': {'local': 2.5, 'long_distance': 1.6, 'international': 2.8, 'corporate': 2.0},
+    # Used when the assignment has no estimated distance yet.
+    'default_distance_km': {'local': 30, 'long_distance': 800, 'international': 4000, 'corporate': 250},
+    'per_kg': 0.4,
+    # Used for items without a weight on their transfer.
+    'default_item_weight_kg': 30,
+    'packing_per_item': 6,
+    'packing_per_fragile_item': 14,
+    'unpacking_per_item': 4,
+    'storage_per_kg': 0.3,
+    'insurance_rate': 0.015,
+    'insurance_minimum': 75,
+    'cleaning_per_square_foot': 0.12,
+    'cleaning_minimum': 150,
+    'tax_rate': 0,
+    'validity_days': 30,
+    'terms': 'Prices are estimates based on the surveyed inventory and are valid until the date shown.',
+}
+
+
+def get_rates(rates=None):
+    """
+    Return ``DEFAULT_RATES`` overridden by ``settings.QUOTE_RATES``, then by
+    ``rates``. Rates by relocation type are overridden type by type.
+    """
+    merged = dict(DEFAULT_RATES)
+    for overrides in [getattr(settings, 'QUOTE_RATES', {}), rates or {}]:
+        for name, value in overrides.items():
+            if isinstance(value, dict) and isinstance(merged.get(name), dict):
+                value = {**merged[name], **value}
+            merged[name] = value
+    return merged
+
+
+def unquoted_requests(using=None):
+    """Return the pending requests without an open quote."""
+    quoted = RelocationQuote.objects.filter(relocation_request=OuterRef('pk'), status__in=OPEN_STATUSES)
+    return RelocationRequest.objects.using(using).filter(status='pending').exclude(Exists(quoted))
+
+
+def request_features(queryset):
+    """
+    Return the pricing features of the requests of ``queryset`` as a dict of
+    NumPy arrays, in three queries: the requests, then the inventory of their
+    origin properties and the transfers of their assignments, aggregated by
+    the database and joined to the requests in NumPy. Unknown numbers are NaN.
+    """
+    rows = list(queryset.order_by('pk').values_list(
+        'pk', 'relocation_type', 'requires_packing', 'requires_unpacking', 'requires_storage',
+        'requires_insurance', 'requires_cleaning', 'origin_property', 'origin_property__bedrooms',
+        'origin_property__square_feet', 'assignment__estimated_distance_km',
+    ))
+    columns = list(zip(*rows)) or [()] * 11
+    features = {
+        'pk': np.array(columns[0], dtype=np.int64),
+        'relocation_type': np.array(columns[1], dtype=object),
+        'bedrooms': np.array(columns[8], dtype=float),
+        'square_feet': np.array(columns[9], dtype=float),
+        'distance_km': np.array(columns[10], dtype=float),
+    }
+    for i, name in enumerate(['packing', 'unpacking', 'storage', 'insurance', 'cleaning'], 2):
+        features[f'requires_{name}'] = np.array(columns[i], dtype=bool)
+    properties = np.array(columns[7], dtype=np.int64)
+
+    inventory = PropertyInventory.objects.using(queryset.db).filter(
+        property__in=queryset.values('origin_property'),
+    ).values('property').annotate(
+        items=Count('pk'), fragile=Count('pk', filter=Q(is_fragile=True)), value=Sum('estimated_value'),
+    ).values_list('property', 'items', 'fragile', 'value')
+    keys, items, fragile, value = _columns(inventory, 4)
+    features['items'] = _lookup(properties, keys, items, 0)
+    features['fragile_items'] = _lookup(properties, keys, fragile, 0)
+    features['declared_value'] = _lookup(properties, keys, value, 0)
+
+    transfers = InventoryTransfer.objects.using(queryset.db).filter(
+        assignment__relocation_request__in=queryset.values('pk'),
+    ).values('assignment__relocation_request').annotate(
+        weight=Sum('estimated_weight_kg'), unweighed=Count('pk', filter=Q(estimated_weight_kg__isnull=True)),
+        fragile=Count('pk', filter=Q(is_fragile=True)),
+    ).values_list('assignment__relocation_request', 'weight', 'unweighed', 'fragile')
+    keys, weight, unweighed, fragile = _columns(transfers, 4)
+    weight = _lookup(features['pk'], keys, weight, np.nan)
+    features['weight_kg'] = weight
+    features['unweighed_items'] = _lookup(features['pk'], keys, unweighed, np.nan)
+    features['fragile_items'] = np.maximum(features['fragile_items'], _lookup(features['pk'], keys, fragile, 0))
+    return features
+
+
+def price(features, rates=None):
+    """Return the quote cost fields of ``request_features()`` as arrays of amounts rounded to the cent."""
+    rates = get_rates(rates)
+    types, index = np.unique(features['relocation_type'], return_inverse=True)
+
+    def by_type(name):
+        return np.array([rates[name][t] for t in types], dtype=float)[index]
+
+    bedrooms = np.nan_to_num(features['bedrooms'])
+    square_feet = np.nan_to_num(features['square_feet'])
+    distance = np.where(np.isnan(features['distance_km']), by_type('default_distance_km'), features['distance_km'])
+    # Items without a transfer weight are counted at the default weight.
+    unweighed = np.where(np.isnan(features['unweighed_items']), features['items'], features['unweighed_items'])
+    weight = np.nan_to_num(features['weight_kg']) + unweighed * rates['default_item_weight_kg']
+    items, fragile = features['items'], features['fragile_items']
+
+    costs = {
+        'base_cost': by_type('base') + bedrooms * rates['per_bedroom'] + square_feet * rates['per_square_foot'],
+        'transportation_cost': distance * by_type('per_km') + weight * rates['per_kg'],
+        'packing_cost': (
+            features['requires_packing'] * (items * rates['packing_per_item'] + fragile * rates['packing_per_fragile_item'])
+            + features['requires_unpacking'] * items * rates['unpacking_per_item']
+        ),
+        'storage_cost': features['requires_storage'] * weight * rates['storage_per_kg'],
+        'insurance_cost': features['requires_insurance'] * np.maximum(
+            np.nan_to_num(features['declared_value']) * rates['insurance_rate'], rates['insurance_minimum'],
+        ),
+        'additional_services_cost': features['requires_cleaning'] * np.maximum(
+            square_feet * rates['cleaning_per_square_foot'], rates['cleaning_minimum'],
+        ),
+    }
+    costs = {name: np.round(cost, 2) for name, cost in costs.items()}
+    costs['tax_amount'] = np.round(reduce(add, costs.values()) * rates['tax_rate'], 2)
+    return costs
+
+
+def generate_quotes(queryset=None, rates=None, batch_size=2000):
+    """
+    Price the requests of ``queryset``, by default the unquoted pending ones,
+    and create a draft quote for each with ``bulk_create()``. Return the
+    quotes created.
+
+    Quotes are numbered ``A<yymmdd>-<request pk>``, with ``-2``, ``-3``... for
+    the request's next ones of the day, e.g. after its first was rejected.
+    """
+    if queryset is None:
+        queryset = unquoted_requests()
+    rates = get_rates(rates)
+    features = request_features(queryset)
+    costs = price(features, rates)
+    today = timezone.localdate()
+    valid_until = today + timedelta(days=rates['validity_days'])
+    amounts = {name: np.char.mod('%.2f', cost) for name, cost in costs.items()}
+    prefix = f'A{today:%y%m%d}-'
+    taken = set(
+        RelocationQuote.objects.using(queryset.db).filter(quote_number__startswith=prefix)
+        .values_list('quote_number', flat=True)
+    )
+
+    def quote_number(pk):
+        number, n = f'{prefix}{pk}', 1
+        while number in taken:
+            n += 1
+            number = f'{prefix}{pk}-{n}'
+        return number
+
+    quotes = [
+        RelocationQuote(
+            relocation_request_id=pk, quote_number=quote_number(pk), status='draft', valid_until=valid_until,
+            terms_and_conditions=rates['terms'], **{name: Decimal(amount[i]) for name, amount in amounts.items()},
+        )
+        for i, pk in enumerate(features['pk'].tolist())
+    ]
+    return RelocationQuote.objects.using(queryset.db).bulk_create(quotes, batch_size=batch_size)
+
+
+def _columns(rows, width):
+    columns = list(zip(*rows)) or [()] * width
+    return [np.array(columns[0], dtype=np.int64), *[np.array(column, dtype=float) for column in columns[1:]]]
+
+
+def _lookup(keys, ids, values, default):
+    """Return the ``values`` of ``ids`` matching each of ``keys``, or ``default``."""
+    if not len(ids):
+        return np.full(len(keys), default, dtype=float)
+    order = np.argsort(ids)
+    ids, values = ids[order], values[order]
+    positions = np.minimum(np.searchsorted(ids, keys), len(ids) - 1)
+    return np.where(ids[positions] == keys, values[positions], default)
+
+
+def open_quotes(using=None):
+    return RelocationQuote.objects.using(using).filter(status__in=OPEN_STATUSES)
+
+
+def reprice(queryset=None, tax_rate=None, **factors):
+    """
+    Reprice the quotes of ``queryset``, by default the open ones, in one
+    ``UPDATE`` and return how many were updated.
+
+    Each keyword names a cost field and the factor to multiply it by, e.g.
+    ``transportation_cost=Decimal('1.05')`` for a 5% fuel surcharge. With
+    ``tax_rate``, ``tax_amount`` becomes that rate of the repriced subtotal.
+    Amounts are rounded to the cent.
+    """
+    unknown = set(factors).difference(COST_FIELDS)
+    if unknown:
+        raise ValueError('Unknown cost fields: %s.' % ', '.join(sorted(unknown)))
+    if queryset is None:
+        queryset = open_quotes()
+    costs = {name: Round(F(name) * Value(Decimal(str(factor))), 2) for name, factor in factors.items()}
+    updates = dict(costs)
+    if tax_rate is not None:
+        # The UPDATE sees the old costs, so tax the new ones' expressions.
+        subtotal = reduce(add, [costs.get(name, F(name)) for name in COST_FIELDS])
+        updates['tax_amount'] = Round(subtotal * Value(Decimal(str(tax_rate))), 2)
+    if not updates:
+        return 0
+    return queryset.update(**updates)
@@ -1,3 +1,437 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from logistics.models import InventoryTransfer
+from smartmove.events import CHANNEL, listener
+from smartmove.testing import (
+    AdminLoginMixin, AdminQueryBudgetMixin, KeysetPaginationMixin, make_assignment, make_client, make_crew,
+    make_driver, make_inventory_item, make_quote, make_relocation_request, make_timeline_entry, make_transfer,
+    make_user,
+)
+from . import pricing
+from .models import RelocationQuote, RelocationRequest, RelocationTimeline
+
+
+class AdminQueryBudgetTests(AdminQueryBudgetMixin, TestCase):
+    def test_relocation_request_changelist(self):
+        # One more for the counts of current milestones.
+        self.assertChangelistWithinBudget(
+            RelocationRequest, 6, lambda: make_relocation_request(assigned_to=make_user()),
+        )
+
+    def test_relocation_quote_changelist(self):
+        self.assertChangelistWithinBudget(RelocationQuote, 5, make_quote)
+
+    def test_relocation_timeline_changelist(self):
+        self.assertChangelistWithinBudget(
+            RelocationTimeline, 5, lambda: make_timeline_entry(updated_by=make_user()),
+        )
+
+    def test_relocation_request_change_form_with_inlines(self):
+        request = make_relocation_request()
+
+        def make_row():
+            make_quote(relocation_request=request)
+            make_timeline_entry(relocation_request=request, updated_by=make_user())
+
+        self.assertChangeFormWithinBudget(request, 11, make_row)
+
+    def test_relocation_quote_change_form(self):
+        quote = make_quote()
+        self.assertChangeFormWithinBudget(quote, 7, make_relocation_request)
+
+    def test_relocation_timeline_change_form(self):
+        entry = make_timeline_entry()
+        self.assertChangeFormWithinBudget(entry, 7, make_user)
+
+
+class KeysetPaginationTests(KeysetPaginationMixin, TestCase):
+    def test_timeline_paginates_across_unscheduled_entries(self):
+        request = make_relocation_request()
+        now = timezone.now()
+        for i in range(10):
+            scheduled = None if i % 3 == 0 else now + timedelta(days=i % 4)
+            make_timeline_entry(relocation_request=request, scheduled_datetime=scheduled)
+        expected = RelocationTimeline.objects.order_by(
+            'scheduled_datetime', 'date_created', '-pk',
+        ).values_list('pk', flat=True)
+        self.assertKeysetPagination(RelocationTimeline, expected)
+
+
+class AdminSearchTests(AdminLoginMixin, TestCase):
+    def test_whole_word_matches_rank_first(self):
+        for request_id in ['SRCH1', 'SRCH10', 'SRCH11']:
+            make_relocation_request(request_id=request_id)
+        response = self.client.get(reverse('admin:relocations_relocationrequest_changelist'), {'q': 'srch1'})
+        result = [obj.request_id for obj in response.context['cl'].result_list]
+        self.assertEqual(result, ['SRCH1', 'SRCH11', 'SRCH10'])
+
+    def test_middle_of_id_falls_back_to_contains(self):
+        make_relocation_request(request_id='RR000123')
+        make_relocation_request(request_id='RR000124')
+        response = self.client.get(reverse('admin:relocations_relocationrequest_changelist'), {'q': '000123'})
+        self.assertEqual([obj.request_id for obj in response.context['cl'].result_list], ['RR000123'])
+        response = self.client.get(reverse('admin:relocations_relocationrequest_changelist'), {'q': 'rr00012'})
+        self.assertEqual(len(response.context['cl'].result_list), 2)
+
+
+class PricingTests(TestCase):
+    def test_total_follows_bulk_writes(self):
+        quote = make_quote(packing_cost=Decimal('100.00'), tax_amount=Decimal('50.00'))
+        self.assertEqual(quote.total_cost, Decimal('1150.00'))
+        RelocationQuote.objects.filter(pk=quote.pk).update(storage_cost=Decimal('25.00'))
+        quote.refresh_from_db()
+        self.assertEqual(quote.total_cost, Decimal('1175.00'))
+        quote, = RelocationQuote.objects.bulk_create([RelocationQuote(
+            relocation_request=quote.relocation_request, quote_number='BULK1', base_cost=Decimal('10.00'),
+            insurance_cost=Decimal('2.50'), valid_until=quote.valid_until, terms_and_conditions='Terms.',
+        )])
+        self.assertEqual(RelocationQuote.objects.get(pk=quote.pk).total_cost, Decimal('12.50'))
+
+    def test_reprice_open_quotes_in_one_query(self):
+        draft = make_quote(transportation_cost=Decimal('200.00'))
+        sent = make_quote(status='sent', base_cost=Decimal('99.99'))
+        accepted = make_quote(status='accepted')
+        with self.assertNumQueries(1):
+            self.assertEqual(pricing.reprice(tax_rate='0.08', transportation_cost='1.05'), 2)
+        draft.refresh_from_db()
+        sent.refresh_from_db()
+        accepted.refresh_from_db()
+        self.assertEqual((draft.transportation_cost, draft.tax_amount, draft.total_cost), (
+            Decimal('210.00'), Decimal('96.80'), Decimal('1306.80'),
+        ))
+        self.assertEqual((sent.tax_amount, sent.total_cost), (Decimal('8.00'), Decimal('107.99')))
+        self.assertEqual((accepted.tax_amount, accepted.total_cost), (Decimal('0.00'), Decimal('1000.00')))
+
+    def test_unknown_cost_field(self):
+        with self.assertRaisesMessage(ValueError, 'Unknown cost fields: total_cost.'):
+            pricing.reprice(total_cost=2)
+
+    def test_command(self):
+        quote = make_quote()
+        out = io.StringIO()
+        call_command('reprice_quotes', '--tax-rate', '0.1', '--factor', 'base_cost=1.5', stdout=out)
+        self.assertEqual(out.getvalue(), 'Repriced 1 quotes.\n')
+        quote.refresh_from_db()
+        self.assertEqual(quote.total_cost, Decimal('1650.00'))
+
+
+class QuoteGenerationTests(TestCase):
+    rates = {
+        'base': {'local': 300, 'long_distance': 900, 'international': 2500, 'corporate': 1500},
+        'per_bedroom': 100,
+        'per_square_foot': 0.5,
+        'per_km': {'local': 2, 'long_distance': 1, 'international': 3, 'corporate': 2},
+        'default_distance_km': {'local': 20, 'long_distance': 500, 'international': 4000, 'corporate': 200},
+        'per_kg': 0.5,
+        'default_item_weight_kg': 10,
+        'packing_per_item': 5,
+        'packing_per_fragile_item': 10,
+        'unpacking_per_item': 3,
+        'storage_per_kg': 1,
+        'insurance_rate': 0.01,
+        'insurance_minimum': 50,
+        'cleaning_per_square_foot': 0.1,
+        'cleaning_minimum': 120,
+        'tax_rate': 0.1,
+    }
+
+    def test_price_from_features(self):
+        nan = float('nan')
+        costs = pricing.price({
+            'relocation_type': np.array(['local', 'long_distance'], dtype=object),
+            'requires_packing': np.array([True, False]),
+            'requires_unpacking': np.array([True, False]),
+            'requires_storage': np.array([False, True]),
+            'requires_insurance': np.array([True, True]),
+            'requires_cleaning': np.array([False, True]),
+            'bedrooms': np.array([2, nan]),
+            'square_feet': np.array([1000, nan]),
+            'distance_km': np.array([12.5, nan]),
+            'items': np.array([4, 0]),
+            'fragile_items': np.array([1, 0]),
+            'declared_value': np.array([9000, nan]),
+            'weight_kg': np.array([nan, 40]),
+            'unweighed_items': np.array([nan, 1]),
+        }, self.rates)
+        self.assertEqual({name: cost.tolist() for name, cost in costs.items()}, {
+            'base_cost': [1000.0, 900.0],
+            'transportation_cost': [45.0, 525.0],
+            'packing_cost': [42.0, 0.0],
+            'storage_cost': [0.0, 50.0],
+            'insurance_cost': [90.0, 50.0],
+            'additional_services_cost': [0.0, 120.0],
+            'tax_amount': [117.7, 164.5],
+        })
+
+    @override_settings(QUOTE_RATES={'per_km': {'local': 3}, 'tax_rate': 0.2})
+    def test_rates_by_type_are_overridden_by_type(self):
+        rates = pricing.get_rates({'base': {'corporate': 1000}})
+        self.assertEqual(rates['per_km'], {**pricing.DEFAULT_RATES['per_km'], 'local': 3})
+        self.assertEqual(rates['base'], {**pricing.DEFAULT_RATES['base'], 'corporate': 1000})
+        self.assertEqual(rates['tax_rate'], 0.2)
+        self.assertEqual(pricing.DEFAULT_RATES['per_km']['local'], 2.5)
+
+    def test_generate_draft_quotes_for_unquoted_requests(self):
+        request = make_relocation_request(requires_packing=True, requires_insurance=True)
+        prop = request.origin_property
+        make_inventory_item(property=prop, is_fragile=True, estimated_value=Decimal('6000'))
+        make_inventory_item(property=prop, estimated_value=Decimal('4000'))
+        assignment = make_assignment(relocation_request=request, estimated_distance_km=Decimal('100'))
+        make_transfer(assignment=assignment, estimated_weight_kg=Decimal('55.5'))
+        make_transfer(assignment=assignment)
+        quoted = make_relocation_request()
+        make_quote(relocation_request=quoted, status='sent')
+        make_relocation_request(status='approved')
+
+        # One for the numbers the day's quotes took.
+        with self.assertNumQueries(5):
+            quote, = pricing.generate_quotes(pricing.unquoted_requests(), rates=self.rates)
+        self.assertEqual(quote.relocation_request, request)
+        self.assertEqual(quote.status, 'draft')
+        # 55.5 kg weighed plus one unweighed item at 10 kg.
+        self.assertEqual(quote.transportation_cost, Decimal('232.75'))
+        self.assertEqual(quote.packing_cost, Decimal('20.00'))
+        self.assertEqual(quote.insurance_cost, Decimal('100.00'))
+        self.assertEqual(quote.total_cost, RelocationQuote.objects.get(pk=quote.pk).total_cost)
+        self.assertFalse(pricing.unquoted_requests().exists())
+
+    def test_second_run_of_the_day(self):
+        request, other = make_relocation_request(), make_relocation_request()
+        first, _ = pricing.generate_quotes(pricing.unquoted_requests(), rates=self.rates)
+        self.assertEqual(first.quote_number, f'A{timezone.localdate():%y%m%d}-{request.pk}')
+        # Rejected the same day, and quoted again with the other's quote still open.
+        first.status = 'rejected'
+        first.save()
+        out = io.StringIO()
+        call_command('generate_quotes', stdout=out)
+        self.assertIn('Created 1 draft quotes', out.getvalue())
+        pricing.generate_quotes(RelocationRequest.objects.filter(pk__in=[request.pk, other.pk]), rates=self.rates)
+        self.assertEqual(sorted(request.quotes.values_list('quote_number', flat=True)), [
+            first.quote_number, f'{first.quote_number}-2', f'{first.quote_number}-3',
+        ])
+        self.assertEqual(other.quotes.count(), 2)
+
+
+class TrackingApiTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.relocation = make_relocation_request(client=make_client(user=self.user), status='approved')
+
+    def test_request_status(self):
+        url = reverse('api-request-status', args=[self.relocation.request_id])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.user)
+        # The session, the user, the request's pk then row, read as it is not cached yet, then its status.
+        with self.assertNumQueries(5):
+            response = self.client.get(url)
+        data = response.json()
+        self.assertEqual((data['request_id'], data['status'], data['status_display']), (
+            self.relocation.request_id, 'approved', 'Approved',
+        ))
+        self.assertEqual(data['preferred_date'], self.relocation.preferred_date.isoformat())
+        # Written by another process, whose invalidation doesn't reach this one's cache.
+        RelocationRequest.objects.filter(pk=self.relocation.pk).update(status='in_progress')
+        stale = mock.Mock(aget=mock.AsyncMock(return_value=self.relocation))
+        with mock.patch('relocations.views.get_object_cache', return_value=stale):
+            data = self.client.get(url).json()
+        self.assertEqual((data['status'], data['status_display']), ('in_progress', 'In Progress'))
+        self.assertEqual(self.client.post(url).status_code, 405)
+
+    def test_visibility(self):
+        url = reverse('api-request-status', args=[self.relocation.request_id])
+        self.client.force_login(make_user())
+        self.assertEqual(self.client.get(url).status_code, 404)
+        member = make_driver()
+        crew = make_crew()
+        crew.members.add(member)
+        make_assignment(relocation_request=self.relocation, crew=crew)
+        for user in [member.user, crew.crew_leader.user, make_user(is_staff=True)]:
+            self.client.force_login(user)
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(reverse('api-request-status', args=['RR-NONE'])).status_code, 404)
+
+    async def test_timeline(self):
+        now = timezone.now()
+        await RelocationTimeline.objects.abulk_create([
+            RelocationTimeline(
+                relocation_request=self.relocation, milestone_type='packing_started', description='Packing',
+                scheduled_datetime=now + timedelta(days=1),
+            ),
+            RelocationTimeline(
+                relocation_request=self.relocation, milestone_type='quote_accepted', description='Accepted',
+                scheduled_datetime=now, actual_datetime=now, is_completed=True,
+            ),
+        ])
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('api-request-timeline', args=[self.relocation.request_id]))
+        timeline = response.json()['timeline']
+        self.assertEqual([(row['milestone'], row['is_completed']) for row in timeline], [
+            ('Quote Accepted', True), ('Packing Started', False),
+        ])
+        self.assertTrue(timeline[0]['actual_datetime'].startswith(now.strftime('%Y-%m-%dT%H:%M:%S')))
+
+
+class CurrentMilestoneTests(TestCase):
+    def setUp(self):
+        self.relocation = make_relocation_request()
+        self.now = timezone.now()
+
+    def milestone(self, relocation=None):
+        relocation = RelocationRequest.objects.get(pk=(relocation or self.relocation).pk)
+        return relocation.current_milestone, relocation.current_milestone_datetime, relocation.milestone_progress
+
+    def test_kept_from_timeline(self):
+        self.assertEqual(self.milestone(), (None, None, 0))
+        make_timeline_entry(relocation_request=self.relocation, milestone_type='packing_started')
+        self.assertEqual(self.milestone(), (None, None, 0))
+        sent, accepted = RelocationTimeline.objects.bulk_create([
+            RelocationTimeline(
+                relocation_request=self.relocation, milestone_type='quote_sent', description='Sent',
+                scheduled_datetime=self.now - timedelta(days=2), is_completed=True,
+            ),
+            RelocationTimeline(
+                relocation_request=self.relocation, milestone_type='quote_accepted', description='Accepted',
+                scheduled_datetime=self.now - timedelta(days=1), actual_datetime=self.now, is_completed=True,
+            ),
+        ])
+        self.assertEqual(self.milestone(), ('quote_accepted', self.now, 14))
+        RelocationTimeline.objects.filter(pk=accepted.pk).update(is_completed=False)
+        self.assertEqual(self.milestone(), ('quote_sent', sent.scheduled_datetime, 7))
+        # Moved to another request.
+        other = make_relocation_request()
+        RelocationTimeline.objects.filter(pk=sent.pk).update(relocation_request=other)
+        self.assertEqual(self.milestone(), (None, None, 0))
+        self.assertEqual(self.milestone(other), ('quote_sent', sent.scheduled_datetime, 7))
+        sent.delete()
+        self.assertEqual(self.milestone(other), (None, None, 0))
+
+    def test_saving_the_request_keeps_the_milestone(self):
+        relocation = RelocationRequest.objects.get(pk=self.relocation.pk)
+        make_timeline_entry(
+            relocation_request=self.relocation, milestone_type='relocation_completed', is_completed=True,
+        )
+        relocation.status = 'completed'
+        relocation.save()
+        self.assertEqual(self.milestone()[::2], ('relocation_completed', 100))
+
+    def test_rebuild(self):
+        make_timeline_entry(relocation_request=self.relocation, milestone_type='in_transit', is_completed=True)
+        RelocationRequest.objects.update(current_milestone=None, milestone_progress=0)
+        out = io.StringIO()
+        call_command('rebuild_milestones', batch_size=1, stdout=out)
+        self.assertEqual(self.milestone()[::2], ('in_transit', 64))
+        self.assertIn('refreshed 1', out.getvalue())
+
+    def test_backfill_migration(self):
+        backfill = import_module('relocations.migrations.0013_backfill_milestones')
+        make_timeline_entry(relocation_request=self.relocation, milestone_type='in_transit', is_completed=True)
+        other = make_relocation_request()
+        make_timeline_entry(relocation_request=other, milestone_type='quote_sent', is_completed=True)
+        RelocationRequest.objects.update(current_milestone=None, milestone_progress=0)
+        with mock.patch.object(backfill, 'BATCH_SIZE', 1), connection.schema_editor(atomic=False) as editor:
+            backfill.backfill_milestones(django_apps, editor)
+        self.assertEqual(self.milestone()[::2], ('in_transit', 64))
+        self.assertEqual(self.milestone(other)[::2], ('quote_sent', 7))
+
+    def test_admin_filter(self):
+        make_timeline_entry(relocation_request=self.relocation, milestone_type='in_transit', is_completed=True)
+        make_relocation_request()
+        self.client.force_login(make_user(is_staff=True, is_superuser=True))
+        url = reverse('admin:relocations_relocationrequest_changelist')
+        response = self.client.get(url)
+        self.assertContains(response, 'In Transit (1)')
+        response = self.client.get(url, {'current_milestone__exact': 'in_transit'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.relocation])
+
+
+class RelocationEventsTests(TransactionTestCase):
+    # Notifications are only sent on commit.
+
+    def setUp(self):
+        self.user = make_user()
+        self.relocation = make_relocation_request(client=make_client(user=self.user))
+
+    async def test_notifications(self):
+        transfer = await sync_to_async(make_transfer)(
+            assignment=await sync_to_async(make_assignment)(relocation_request=self.relocation),
+        )
+        async with listener.subscribe(self.relocation.pk) as queue:
+            entry = await sync_to_async(make_timeline_entry)(relocation_request=self.relocation)
+            event = await asyncio.wait_for(queue.get(), 5)
+            self.assertEqual(
+                (event['type'], event['id'], event['milestone_type']), ('timeline', entry.pk, 'quote_sent'),
+            )
+            # Only status changes are published, from bulk updates too.
+            await InventoryTransfer.objects.filter(pk=transfer.pk).aupdate(room_to='Attic')
+            await InventoryTransfer.objects.filter(pk=transfer.pk).aupdate(status='packed')
+            event = await asyncio.wait_for(queue.get(), 5)
+            self.assertEqual(
+                (event['type'], event['id'], event['previous_status'], event['status']),
+                ('transfer', transfer.pk, 'pending', 'packed'),
+            )
+            # Other requests' events aren't received.
+            await sync_to_async(make_timeline_entry)()
+            await asyncio.sleep(0.2)
+            self.assertTrue(queue.empty())
+        self.assertIsNone(listener.task)
+
+    async def test_malformed_notifications(self):
+        async with listener.subscribe(self.relocation.pk) as queue:
+            with self.assertLogs('smartmove.events', 'WARNING') as logs:
+                for payload in ['not json', '{}', '[]', '{"request": {}}']:
+                    await sync_to_async(self.notify)(payload)
+                entry = await sync_to_async(make_timeline_entry)(relocation_request=self.relocation)
+                event = await asyncio.wait_for(queue.get(), 5)
+            self.assertEqual(event['id'], entry.pk)
+            self.assertEqual(len(logs.output), 4)
+            self.assertFalse(listener.task.done())
+
+    async def test_finished_listener_is_replaced(self):
+        listener.task = asyncio.create_task(asyncio.sleep(0))
+        await listener.task
+        async with listener.subscribe(self.relocation.pk) as queue:
+            self.assertFalse(listener.task.done())
+            entry = await sync_to_async(make_timeline_entry)(relocation_request=self.relocation)
+            self.assertEqual((await asyncio.wait_for(queue.get(), 5))['id'], entry.pk)
+        self.assertIsNone(listener.task)
+
+    def notify(self, payload):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+    async def test_event_stream(self):
+        url = reverse('api-request-events', args=[self.relocation.request_id])
+        self.assertEqual((await self.async_client.get(url)).status_code, 403)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        entry = await sync_to_async(make_timeline_entry)(relocation_request=self.relocation)
+        message = (await asyncio.wait_for(anext(stream), 5)).decode()
+        self.assertTrue(message.startswith('event: timeline\ndata: '))
+        self.assertEqual(json.loads(message.split('data: ')[1])['id'], entry.pk)
+        # The server cancels the response when the client disconnects.
+        read = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        read.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await read
+        self.assertIsNone(listener.task)
+        # Under WSGI a stream would take a thread for as long as it lasts.
+        self.assertEqual((await sync_to_async(self.client.get)(url)).status_code, 501)
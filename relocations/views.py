@@ -1,3 +1,128 @@
-from django.shortcuts import render
+"""
+Read-only tracking API.
 
-# Create your views here.
+Clients and crews poll these endpoints for where their relocation stands.
+They are async views on the async ORM, so under ASGI the requests a
+process serves at once are bounded by its pool of connections rather than
+its threads, and those waiting for a connection cost no thread. Anyone
+logged in may track the requests they are the client of or whose crew
+they are on; staff may track all of them. Who that is comes from the
+requests' object cache, see ``smartmove.cache``, but their status is read
+from the table: milestones are written by triggers and bulk updates, and
+other processes' writes don't invalidate this process's cache.
+
+``request_events`` pushes the changes as Server-Sent Events instead, see
+``smartmove.events``. It needs ASGI, as each stream lasts as long as the
+page is open.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from logistics.models import MovingCrew
+from smartmove.cache import get_object_cache
+from smartmove.events import listener
+from .models import RelocationRequest, RelocationTimeline
+
+REQUEST_FIELDS = [
+    'request_id', 'status', 'priority', 'relocation_type', 'preferred_date', 'scheduled_date',
+    'actual_start_date', 'actual_completion_date', 'current_milestone', 'current_milestone_datetime',
+    'milestone_progress', 'date_updated',
+]
+
+TIMELINE_FIELDS = [
+    'milestone_type', 'description', 'scheduled_datetime', 'actual_datetime', 'is_completed',
+]
+
+# Milliseconds browsers wait before reconnecting a dropped event stream.
+EVENTS_RETRY = 3000
+# Seconds between comments that keep idle streams open through proxies.
+EVENTS_KEEPALIVE = 15
+
+
+def visible_requests(user):
+    requests = RelocationRequest.objects.all()
+    if user.is_staff:
+        return requests
+    crews = MovingCrew.objects.filter(Q(crew_leader__user=user) | Q(members__user=user))
+    return requests.filter(Q(client__user=user) | Q(assignment__crew__in=crews))
+
+
+async def get_tracked_request(request, request_id):
+    """Return the relocation request ``request_id``, from the object cache, if the user may track it."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        raise PermissionDenied
+    try:
+        relocation = await get_object_cache(RelocationRequest).aget(request_id=request_id)
+    except RelocationRequest.DoesNotExist:
+        raise Http404('No such relocation request.')
+    # Clients, the most of those polling, are found without a query.
+    if not (
+        user.is_staff or relocation.client.user_id == user.pk
+        or await visible_requests(user).filter(pk=relocation.pk).aexists()
+    ):
+        raise Http404('No such relocation request.')
+    return relocation
+
+
+@require_GET
+async def request_status(request, request_id):
+    relocation = await get_tracked_request(request, request_id)
+    relocation = await RelocationRequest.objects.only(*REQUEST_FIELDS).aget(pk=relocation.pk)
+    data = {field: getattr(relocation, field) for field in REQUEST_FIELDS}
+    data['status_display'] = relocation.get_status_display()
+    data['current_milestone_display'] = relocation.get_current_milestone_display()
+    return JsonResponse(data)
+
+
+@require_GET
+async def request_timeline(request, request_id):
+    relocation = await get_tracked_request(request, request_id)
+    milestones = dict(RelocationTimeline.MILESTONE_TYPES)
+    timeline = [
+        {**row, 'milestone': milestones.get(row['milestone_type'], row['milestone_type'])}
+        async for row in RelocationTimeline.objects.filter(relocation_request=relocation).values(*TIMELINE_FIELDS)
+    ]
+    return JsonResponse({'request_id': request_id, 'timeline': timeline})
+
+
+@require_GET
+async def request_events(request, request_id):
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse('Events are only served under ASGI.', status=501, content_type='text/plain')
+    relocation = await get_tracked_request(request, request_id)
+    # Give the connection back now rather than when the stream ends.
+    await sync_to_async(close_connection)()
+    response = StreamingHttpResponse(event_stream(relocation.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def close_connection():
+    connections[DEFAULT_DB_ALIAS].close()
+
+
+async def event_stream(key):
+    """
+    Yield the events of relocation request ``key`` in the event stream
+    format, once the process listens to them. Clients should fetch the
+    current state after the first message, and again after reconnecting.
+    """
+    async with listener.subscribe(key) as queue:
+        yield f'retry: {EVENTS_RETRY}\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), EVENTS_KEEPALIVE)
+            except TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,398 @@
+"""
+Shared ModelAdmin building blocks for the smartmove apps.
+"""
+from django.contrib import admin
+from django.contrib.admin.utils import lookup_spawns_duplicates
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ALL_VAR, ORDER_VAR, PAGE_VAR, ChangeList
+from django.contrib.postgres.search import SearchRank
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.html import format_html
+from django.utils.text import smart_split, unescape_string_literal
+from django.utils.translation import gettext as _
+
+from .exports import get_export
+from .facets import Facet
+from .pagination import (
+    EstimatedCountPaginator, count_rows, decode_cursor, encode_cursor, keyset_fields, reverse_keys, seek,
+)
+from .renditions import get_renditions
+from .search import exact_query, model_document, prefix_query
+
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+
+class QueryBudgetMixin:
+    """
+    Keep admin forms at a fixed number of queries.
+
+    ``choice_select_related`` maps a foreign key or many-to-many field name to
+    the relations its choice queryset should join, so that rendering each
+    option's ``__str__`` doesn't issue a query of its own.
+
+    ``cached_choice_fields`` lists foreign keys whose choices are evaluated
+    once per request and shared by every form built from it. Inline rows
+    otherwise re-run the choice query for each ``<select>`` they render.
+    """
+    choice_select_related = {}
+    cached_choice_fields = ()
+
+    def get_field_queryset(self, db, db_field, request):
+        queryset = super().get_field_queryset(db, db_field, request)
+        related = self.choice_select_related.get(db_field.name)
+        if related:
+            if queryset is None:
+                queryset = db_field.remote_field.model._default_manager.using(db)
+            queryset = queryset.select_related(*related)
+        return queryset
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if formfield is not None and db_field.name in self.cached_choice_fields:
+            cache = request.__dict__.setdefault('_admin_choice_cache', {})
+            key = (db_field.model._meta.label, db_field.name)
+            if key not in cache:
+                cache[key] = list(formfield.choices)
+            formfield.choices = cache[key]
+        return formfield
+
+
+class FacetListFilter(admin.AllValuesFieldListFilter):
+    """
+    Offer the values of a field with a ``smartmove.facets.Facet`` from its
+    summary table, each with the number of rows having it, rather than from
+    a ``SELECT DISTINCT`` over the table. The counts are over the whole
+    table; with "Show counts" on, they are counted for the current filters
+    instead, as Django does.
+    """
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.counts = Facet(model, field_path).counts(model_admin.get_queryset(request).db)
+        self.lookup_choices = list(self.counts)
+
+    def choices(self, changelist):
+        if changelist.add_facets:
+            yield from super().choices(changelist)
+            return
+        yield {
+            'selected': self.lookup_val is None and self.lookup_val_isnull is None,
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg, self.lookup_kwarg_isnull]),
+            'display': _('All'),
+        }
+        labels = dict(self.field.flatchoices)
+        for value, count in self.counts.items():
+            if value is None:
+                selected = bool(self.lookup_val_isnull)
+                query_string = changelist.get_query_string({self.lookup_kwarg_isnull: 'True'}, [self.lookup_kwarg])
+                display = self.empty_value_display
+            else:
+                selected = self.lookup_val is not None and value in self.lookup_val
+                query_string = changelist.get_query_string({self.lookup_kwarg: value}, [self.lookup_kwarg_isnull])
+                display = labels.get(self.field.to_python(value), value)
+            yield {'selected': selected, 'query_string': query_string, 'display': f'{display} ({count})'}
+
+
+def admin_facets(site=admin.site):
+    """Return the ``Facet`` of each ``FacetListFilter`` of the site's changelists."""
+    return [
+        Facet(model, list_filter[0])
+        for model, model_admin in site._registry.items()
+        for list_filter in model_admin.list_filter
+        if isinstance(list_filter, tuple) and issubclass(list_filter[1], FacetListFilter)
+    ]
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Page through the changelist with cursors instead of OFFSET.
+
+    The previous and next links carry the ordering values of the first and
+    last row shown, and the following page is fetched with ``seek()`` from
+    there, so page 10,000 costs the same as page 2. The page number is kept
+    for display only. Orderings that can't be seeked (expressions, related
+    fields) fall back to OFFSET pages.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # A cursor is only valid for the page it was made on; drop it from
+        # the sorting and filtering links.
+        new_params = new_params or {}
+        remove = [*(remove or []), *(var for var in (AFTER_VAR, BEFORE_VAR) if var not in new_params)]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        result_count = paginator.count
+        if self.model_admin.show_full_result_count:
+            full_result_count, self.full_result_count_estimated = count_rows(
+                self.root_queryset, EstimatedCountPaginator.exact_count_limit,
+            )
+        else:
+            full_result_count = None
+            self.full_result_count_estimated = False
+        can_show_all = result_count <= self.list_max_show_all
+        multi_page = result_count > self.list_per_page
+
+        keys = keyset_fields(self.queryset)
+        after, before = request.GET.get(AFTER_VAR), request.GET.get(BEFORE_VAR)
+        if (self.show_all and can_show_all) or not multi_page:
+            keys = None
+            result_list = self.queryset._clone()
+        elif keys is not None and (after or before):
+            try:
+                values = decode_cursor(keys, after or before)
+            except ValueError:
+                raise IncorrectLookupParameters
+            if after:
+                result_list = seek(self.queryset, keys, values, self.list_per_page)
+            else:
+                page = seek(self.queryset.reverse(), reverse_keys(keys), values, self.list_per_page)
+                result_list = self.queryset.filter(pk__in=page.values('pk'))
+        else:
+            try:
+                result_list = paginator.page(self.page_num).object_list
+            except InvalidPage:
+                raise IncorrectLookupParameters
+
+        self.result_count = result_count
+        self.result_count_estimated = getattr(paginator, 'estimated', False)
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.show_admin_actions = not self.show_full_result_count or bool(full_result_count)
+        self.full_result_count = full_result_count
+        self.result_list = result_list
+        self.can_show_all = can_show_all
+        self.multi_page = multi_page
+        self.paginator = paginator
+        self.show_all_url = (
+            can_show_all and not self.show_all and multi_page and self.get_query_string({ALL_VAR: ''})
+        )
+        self.first_page_url = self.previous_page_url = self.next_page_url = None
+        if multi_page and not (self.show_all and can_show_all):
+            self.set_page_urls(keys, before)
+
+    def set_page_urls(self, keys, before):
+        if self.page_num > 1:
+            self.first_page_url = self.get_query_string(remove=[PAGE_VAR])
+        if keys is None:
+            if self.page_num > 1:
+                self.previous_page_url = self.get_query_string({PAGE_VAR: self.page_num - 1})
+            if self.page_num < self.paginator.num_pages:
+                self.next_page_url = self.get_query_string({PAGE_VAR: self.page_num + 1})
+            return
+        rows = list(self.result_list)
+        if not rows:
+            return
+        if self.page_num > 1:
+            self.previous_page_url = self.get_query_string({
+                PAGE_VAR: self.page_num - 1, BEFORE_VAR: encode_cursor(keys, rows[0]),
+            })
+        last = [getattr(rows[-1], field.attname) for field, _ in keys]
+        # Coming back from a later page proves there is one; otherwise look.
+        if before or (len(rows) == self.list_per_page and seek(self.queryset, keys, last, 1).exists()):
+            self.next_page_url = self.get_query_string({
+                PAGE_VAR: self.page_num + 1, AFTER_VAR: encode_cursor(keys, rows[-1]),
+            })
+
+
+class SearchRankChangeList(KeysetChangeList):
+    """Order search results by relevance unless the user picked a column."""
+
+    def get_queryset(self, request, exclude_parameters=None):
+        # The search runs after ChangeList has applied its ordering, so the
+        # rank can only be put in front of it here.
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.query and ORDER_VAR not in self.params and 'search_rank' in queryset.query.annotations:
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
+
+
+class KeysetPaginationMixin:
+    """
+    Paginate the changelist with ``KeysetChangeList`` and count it with
+    ``EstimatedCountPaginator``, which shows "about N" once a count would
+    have to visit more than ``exact_count_limit`` rows.
+    """
+    paginator = EstimatedCountPaginator
+    change_list_template = 'admin/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class FullTextSearchMixin:
+    """
+    Answer ``search_fields`` from the full-text indexes declared with
+    ``smartmove.search.search_index`` and rank direct hits first.
+
+    Search fields are grouped by the relation they go through and each group
+    becomes one ``<relation>__in`` subquery, so the outer table is reached
+    through its foreign key indexes rather than an OR across joins. A group
+    whose model has a search document matches through its GIN index; other
+    groups fall back to Django's ``icontains`` lookups. Every term must match
+    somewhere, as with the stock admin search.
+
+    Words only match from their start, so a middle part of an ID (000123 of
+    RR000123) matches nothing. When nothing matches, the search is retried
+    with ``icontains`` over ``id_search_fields``, by default the search fields
+    named ``*_id``.
+    """
+    id_search_fields = None
+    search_help_text = 'Matches the start of words. IDs also match by any part when nothing else does.'
+
+    def get_changelist(self, request, **kwargs):
+        return SearchRankChangeList
+
+    def get_id_search_fields(self, request):
+        if self.id_search_fields is not None:
+            return self.id_search_fields
+        return [
+            field_name for field_name in self.get_search_fields(request)
+            if str(field_name).lstrip('^=@').endswith('_id')
+        ]
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = [str(field_name) for field_name in self.get_search_fields(request)]
+        if not search_fields or not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        unfiltered = queryset
+
+        groups = {}
+        for field_name in search_fields:
+            lookup = field_name.lstrip('^=@')
+            path, _, name = lookup.rpartition(LOOKUP_SEP)
+            groups.setdefault(path, []).append(field_name[:len(field_name) - len(lookup)] + name)
+        root_document = model_document(self.model) if '' in groups else None
+
+        term_queries = []
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            query = prefix_query(bit)
+            matches = []
+            for path, field_names in groups.items():
+                model = self._search_model(path)
+                if model is None:
+                    continue
+                document = model_document(model)
+                if document is None:
+                    match = self._contains(field_names, bit)
+                elif query is not None:
+                    match = Q(search_document=query)
+                else:
+                    continue
+                related = model._default_manager.all()
+                if document is not None:
+                    related = related.alias(search_document=document)
+                related = related.filter(match)
+                if path:
+                    related = self.model._default_manager.filter(**{f'{path}__in': related.values('pk')})
+                matches.append((path, match, related.values('pk')))
+            if len(matches) == 1 and not matches[0][0]:
+                term_queries.append(matches[0][1])
+            elif matches:
+                # A UNION lets every branch use its own index; an OR across
+                # them would force a scan of the outer table.
+                subqueries = [subquery for _, _, subquery in matches]
+                term_queries.append(Q(pk__in=subqueries[0].union(*subqueries[1:])))
+        if root_document is not None:
+            queryset = queryset.alias(search_document=root_document)
+        queryset = queryset.filter(*term_queries)
+
+        rank_query = prefix_query(search_term)
+        if root_document is not None and rank_query is not None:
+            # Whole-word hits (e.g. a complete request_id) outrank prefix hits.
+            queryset = queryset.annotate(search_rank=(
+                SearchRank(root_document, rank_query) + SearchRank(root_document, exact_query(search_term))
+            ))
+        may_have_duplicates = any(
+            lookup_spawns_duplicates(self.opts, field_name.lstrip('^=@')) for field_name in search_fields
+        )
+        id_fields = [str(field_name).lstrip('^=@') for field_name in self.get_id_search_fields(request)]
+        if id_fields and not queryset.exists():
+            queryset = unfiltered.filter(self._contains(id_fields, search_term.strip()))
+            may_have_duplicates = any(lookup_spawns_duplicates(self.opts, name) for name in id_fields)
+        return queryset, may_have_duplicates
+
+    def _search_model(self, path):
+        model = self.model
+        for part in path.split(LOOKUP_SEP) if path else []:
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                return None
+            if not field.is_relation:
+                return None
+            model = field.related_model
+        return model
+
+    @staticmethod
+    def _contains(field_names, bit):
+        lookups = []
+        for field_name in field_names:
+            if field_name.startswith('^'):
+                lookups.append(f'{field_name[1:]}__istartswith')
+            elif field_name.startswith('='):
+                lookups.append(f'{field_name[1:]}__iexact')
+            else:
+                lookups.append(f"{field_name.lstrip('@')}__icontains")
+        return Q.create([(lookup, bit) for lookup in lookups], connector=Q.OR)
+
+
+class ExportMixin:
+    """
+    Add actions that stream the selected rows through the model's registered
+    ``smartmove.exports.Export``, whatever their number.
+    """
+    actions = ['export_csv', 'export_jsonl']
+
+    @admin.action(description='Export selected %(verbose_name_plural)s as CSV', permissions=['view'])
+    def export_csv(self, request, queryset):
+        return get_export(self.model).response(queryset, 'csv')
+
+    @admin.action(description='Export selected %(verbose_name_plural)s as JSON Lines', permissions=['view'])
+    def export_jsonl(self, request, queryset):
+        return get_export(self.model).response(queryset, 'jsonl')
+
+
+class RenditionsMixin:
+    """
+    Render the images uploaded through the form and its inlines with their
+    registered ``smartmove.renditions.Renditions``, all those of a model in
+    one run of the pool, and show ``thumbnail`` instead of the original.
+    """
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        uploads = {}
+        renditions = get_renditions(self.model)
+        if renditions and renditions.field_name in form.changed_data:
+            uploads[renditions] = [form.instance]
+        for formset in formsets:
+            renditions = get_renditions(formset.model)
+            if renditions:
+                uploads.setdefault(renditions, []).extend([
+                    *formset.new_objects,
+                    *(obj for obj, fields in formset.changed_objects if renditions.field_name in fields),
+                ])
+        for renditions, objects in uploads.items():
+            for obj in objects:
+                obj.renditions = {}
+            renditions.create(objects)
+
+    @admin.display(description='Thumbnail')
+    def thumbnail(self, obj):
+        url = get_renditions(type(obj)).url(obj, 'thumbnail')
+        if url is None:
+            return '-'
+        return format_html('<img src="{}" alt="" style="max-width: 160px; max-height: 160px">', url)
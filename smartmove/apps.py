@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class SmartmoveConfig(AppConfig):
+    """The project's shared infrastructure, installed for its management commands."""
+    name = 'smartmove'
+
+    def ready(self):
+        from . import checks  # noqa: F401
@@ -0,0 +1,238 @@
+"""
+Set-based loading: ``INSERT ... SELECT`` built from the model, and imports
+through ``COPY`` into a staging table.
+"""
+import csv
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def insert_select(cursor, model, expressions, source, params=()):
+    """
+    Run ``INSERT INTO <model> SELECT <expressions> FROM <source>`` and return
+    the number of rows inserted.
+
+    ``expressions`` maps field attnames to SQL. Concrete fields missing from
+    it get their model default, or ``now()`` for ``auto_now`` fields, so
+    callers keep working as fields are added to the models.
+    """
+    sql, defaults = insert_select_sql(cursor.db, model, expressions, source)
+    cursor.execute(sql, [*defaults, *params])
+    return cursor.rowcount
+
+
+def insert_select_sql(connection, model, expressions, source):
+    """
+    Return the statement run by ``insert_select()`` and the params of the
+    defaults it selects, which come before any params of ``source``. Use it
+    to embed the insert in a larger statement.
+    """
+    columns, select, defaults = [], [], []
+    for field in model._meta.concrete_fields:
+        if field.primary_key or getattr(field, 'generated', False):
+            continue
+        columns.append(connection.ops.quote_name(field.column))
+        if field.attname in expressions:
+            select.append(expressions[field.attname])
+        elif getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            select.append('now()')
+        else:
+            select.append('%s')
+            defaults.append(field.get_db_prep_save(field.get_default(), connection))
+    sql = 'INSERT INTO %s (%s) SELECT %s FROM %s' % (
+        model._meta.db_table, ', '.join(columns), ', '.join(select), source,
+    )
+    return sql, defaults
+
+
+def update_rows(cursor, model, pks, **columns):
+    """
+    Set each field named in ``columns`` to its sequence of values on the rows
+    with primary keys ``pks``, in one ``UPDATE`` joined to the ``unnest()``-ed
+    arrays, and return the number of rows updated.
+    """
+    connection = cursor.db
+    opts = model._meta
+    fields = [opts.get_field(name) for name in columns]
+    names = [connection.ops.quote_name(field.column) for field in fields]
+    cursor.execute('UPDATE %s t SET %s FROM unnest(%s) AS v(pk, %s) WHERE t.%s = v.pk' % (
+        opts.db_table,
+        ', '.join('%s = v.%s' % (name, name) for name in names),
+        ', '.join('%%s::%s[]' % field.db_type(connection) for field in [opts.pk, *fields]),
+        ', '.join(names),
+        connection.ops.quote_name(opts.pk.column),
+    ), [_as_list(pks), *[_as_list(values) for values in columns.values()]])
+    return cursor.rowcount
+
+
+def read_csv(file):
+    """Return the header of a CSV text file and a reader over its remaining rows."""
+    reader = csv.reader(file)
+    return [name.strip() for name in next(reader, [])], reader
+
+
+class StagedImport:
+    """
+    Load rows of text into ``model`` in batches. Each batch is ``COPY``-ed
+    into a temporary table, checked into a staging table in one pass and
+    moved over with ``INSERT ... SELECT``, so the values are only ever parsed
+    by Postgres. Rows failing a check are reported by line and left out; they
+    don't stop the rest of the load.
+
+    Subclasses set ``model``, the importable ``fields`` and, for foreign keys
+    given by a natural key, ``natural_keys`` mapping the field to the unique
+    field of the related model that identifies it.
+    """
+    model = None
+    fields = []
+    natural_keys = {}
+    batch_size = 50000
+
+    def __init__(self, columns, related=None, using=DEFAULT_DB_ALIAS):
+        """
+        ``columns`` names the field of each value of a row, usually from a
+        header. ``related`` sets foreign keys for every row instead, e.g.
+        ``{'property': prop}``. Raise ValueError if the columns don't cover
+        the required fields.
+        """
+        self.related = related or {}
+        self.using = using
+        opts = self.model._meta
+        unknown = [name for name in columns if name not in self.fields or name in self.related]
+        if unknown:
+            raise ValueError('Unknown columns: %s.' % ', '.join(unknown))
+        if len(set(columns)) != len(columns):
+            raise ValueError('Duplicate columns.')
+        missing = [
+            name for name in self.fields
+            if name not in columns and name not in self.related and _required(opts.get_field(name))
+        ]
+        if missing:
+            raise ValueError('Missing columns: %s.' % ', '.join(missing))
+        connection = connections[using]
+        self.columns = [opts.get_field(name) for name in columns]
+        self.blanks = [_blank(field, connection) for field in self.columns]
+        # SQL for each field's value in the staged rows joined to their keys.
+        self.values = {name: str(int(obj.pk)) for name, obj in self.related.items()}
+        self.joins = []
+        for i, field in enumerate(self.columns):
+            if field.name in self.natural_keys:
+                related = field.related_model._meta
+                key = related.get_field(self.natural_keys[field.name])
+                self.joins.append('LEFT JOIN %s r%d ON r%d.%s = s.c%d' % (
+                    related.db_table, i, i, connection.ops.quote_name(key.column), i,
+                ))
+                self.values[field.name] = 'r%d.%s' % (i, connection.ops.quote_name(related.pk.column))
+            else:
+                self.values[field.name] = 's.c%d::%s' % (i, field.db_type(connection))
+
+    def load(self, rows, start=1):
+        """
+        Import ``rows``, sequences of strings numbered from line ``start``.
+        Return ``(created, errors)``, ``errors`` being ``(line, message)``
+        pairs in line order.
+        """
+        created, errors, batch = 0, [], []
+        width = len(self.columns)
+        for line, row in enumerate(rows, start):
+            if not row:
+                continue
+            if len(row) != width:
+                errors.append((line, 'Expected %d values, got %d.' % (width, len(row))))
+                continue
+            batch.append((line, row))
+            if len(batch) == self.batch_size:
+                created += self.load_batch(batch, errors)
+                batch = []
+        if batch:
+            created += self.load_batch(batch, errors)
+        errors.sort()
+        return created, errors
+
+    def load_batch(self, batch, errors):
+        width = len(self.columns)
+        columns = ', '.join('c%d' % i for i in range(width))
+        connection = connections[self.using]
+        with transaction.atomic(self.using), connection.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE import_rows (line integer, %s)' % ', '.join(
+                'c%d text' % i for i in range(width)
+            ))
+            with cursor.copy('COPY import_rows (line, %s) FROM STDIN' % columns) as copy:
+                for line, row in batch:
+                    copy.write_row((line, *row))
+            # Blank values are replaced and every row checked in the same
+            # pass that writes the staging table.
+            values, value_params = [], []
+            for i, blank in enumerate(self.blanks):
+                if blank is None:
+                    values.append("nullif(btrim(c%d), '') AS c%d" % (i, i))
+                else:
+                    values.append("coalesce(nullif(btrim(c%d), ''), %%s) AS c%d" % (i, i))
+                    value_params.append(blank)
+            checks, check_params = self.checks(connection)
+            cursor.execute(
+                'CREATE TEMPORARY TABLE import_staging AS SELECT s.*, CASE %s END AS error '
+                'FROM (SELECT line, %s FROM import_rows) s' % (' '.join(checks), ', '.join(values)),
+                [*check_params, *value_params],
+            )
+            cursor.execute('SELECT line, error FROM import_staging WHERE error IS NOT NULL')
+            errors.extend(cursor.fetchall())
+            created = self.insert(cursor, 'import_staging s %s WHERE s.error IS NULL ORDER BY s.line' % ' '.join(self.joins))
+            cursor.execute('DROP TABLE import_rows, import_staging')
+        return created
+
+    def checks(self, connection):
+        """
+        Return the ``WHEN ... THEN <message>`` clauses rejecting a staged row
+        and their params. Values are checked with ``pg_input_is_valid()`` for
+        the column type, so the messages are Postgres' own.
+        """
+        checks, params = [], []
+        for i, field in enumerate(self.columns):
+            value = 's.c%d' % i
+            if not field.null:
+                checks.append('WHEN %s IS NULL THEN %%s' % value)
+                params.append('%s: This field is required.' % field.name)
+            if field.name in self.natural_keys:
+                related = field.related_model._meta
+                key = related.get_field(self.natural_keys[field.name])
+                checks.append('WHEN %s IS NOT NULL AND NOT EXISTS (SELECT FROM %s WHERE %s = %s) THEN format(%%s, %s)' % (
+                    value, related.db_table, connection.ops.quote_name(key.column), value, value,
+                ))
+                params.append('%s: No %s with %s %%L.' % (field.name, related.verbose_name, key.name))
+                continue
+            db_type = field.db_type(connection)
+            checks.append('WHEN NOT pg_input_is_valid(%s, %%s) THEN %%s || (pg_input_error_info(%s, %%s)).message' % (
+                value, value,
+            ))
+            params.extend([db_type, '%s: ' % field.name, db_type])
+            if field.choices:
+                checks.append('WHEN %s <> ALL(%%s) THEN format(%%s, %s)' % (value, value))
+                params.extend([[str(key) for key, _ in field.flatchoices], '%s: Value %%L is not a valid choice.' % field.name])
+        return checks, params
+
+    def expressions(self):
+        """Return the ``insert_select()`` expressions of the staged values."""
+        return {self.model._meta.get_field(name).attname: value for name, value in self.values.items()}
+
+    def insert(self, cursor, source):
+        """Insert the checked rows selected from ``source`` and return their number."""
+        return insert_select(cursor, self.model, self.expressions(), source)
+
+
+def _required(field):
+    return not (field.has_default() or field.null or field.blank)
+
+
+def _blank(field, connection):
+    """Return the text a blank value stands for: the default, '' for blank text or None."""
+    if field.has_default():
+        return str(field.get_db_prep_save(field.get_default(), connection))
+    if field.blank and field.empty_strings_allowed and not field.null:
+        return ''
+    return None
+
+
+def _as_list(values):
+    # NumPy arrays convert to lists of Python numbers, which psycopg adapts.
+    return values.tolist() if hasattr(values, 'tolist') else list(values)
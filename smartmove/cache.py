@@ -0,0 +1,212 @@
+"""
+Read-through cache of model instances.
+
+An ``ObjectCache`` keeps instances of a model, with the related objects it
+selects, in the default cache, found by primary key or by natural key such
+as ``client_id``. An instance is cached under a key holding a version of
+the row, and saving or deleting the row, or a related object it selects,
+moves to a new version, so that stale copies are never read again, even
+those a concurrent request is writing. Bulk writes, which send no signals,
+call ``rows_changed()`` instead, or ``invalidate_all()``.
+
+With the local-memory backend each process only sees the writes made by
+others when their copies expire after ``OBJECT_CACHE_TIMEOUT``; the
+file-based backend, under ``CACHE_DIR``, is shared by the processes of a
+host.
+
+Caches are declared in the apps' ``caches`` modules with ``register()``,
+imported when the apps are ready so that no write is missed.
+"""
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+registry = {}
+
+
+class ObjectCache:
+    """
+    ``natural_key`` is the unique field the instances are also found by, and
+    ``select_related`` the foreign keys whose objects are cached with them.
+    A miss only queries the database once, however many requests ask for
+    the same row at the same time: the others wait up to ``lock_timeout``
+    seconds for it to be cached.
+    """
+    lock_timeout = 2
+    poll_interval = 0.02
+
+    def __init__(self, model, natural_key, select_related=(), timeout=None, cache_alias='default'):
+        self.model = model
+        self.natural_key = natural_key
+        self.select_related = list(select_related)
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self.prefix = f'objects:{model._meta.label_lower}'
+        self.counts = Counter()
+        self.counts_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def count(self, name):
+        with self.counts_lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        """Return the hits, misses, waits for another request's load, and invalidations."""
+        with self.counts_lock:
+            return {name: self.counts[name] for name in ['hits', 'misses', 'waits', 'invalidations']}
+
+    def version(self, key):
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, uuid.uuid4().hex, None)
+            version = self.cache.get(key)
+        return version
+
+    def object_key(self, pk):
+        generation, version = self.version(f'{self.prefix}:generation'), self.version(f'{self.prefix}:{pk}:version')
+        return f'{self.prefix}:{pk}:{generation}:{version}'
+
+    def natural_key_key(self, value):
+        return f'{self.prefix}:{self.natural_key}:{value}'
+
+    def get(self, pk=None, **natural_key):
+        """
+        Return the instance with primary key ``pk``, or with the natural key
+        given as keyword argument, raising the model's DoesNotExist if there
+        is none.
+        """
+        if set(natural_key) - {self.natural_key} or (pk is None) == (not natural_key):
+            raise TypeError(f'Give the pk or the {self.natural_key} of the {self.model.__name__}.')
+        obj = self.cached(pk, natural_key)
+        if obj is not None:
+            self.count('hits')
+            return obj
+        return self.load(pk, natural_key)
+
+    async def aget(self, pk=None, **natural_key):
+        return await sync_to_async(self.get)(pk, **natural_key)
+
+    def cached(self, pk, natural_key):
+        if pk is None:
+            pk = self.cache.get(self.natural_key_key(natural_key[self.natural_key]))
+            if pk is None:
+                return None
+        obj = self.cache.get(self.object_key(pk))
+        # The natural key of the row may have changed since it was cached.
+        if obj is None or any(getattr(obj, field) != value for field, value in natural_key.items()):
+            return None
+        return obj
+
+    def load(self, pk, natural_key):
+        self.count('misses')
+        lookup = {'pk': pk} if pk is not None else natural_key
+        lock = '{}:{}:{}:lock'.format(self.prefix, *next(iter(lookup.items())))
+        locked = self.cache.add(lock, 1, self.lock_timeout)
+        if not locked:
+            # Another request is loading the row: wait for it rather than query too.
+            self.count('waits')
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                obj = self.cached(pk, natural_key)
+                if obj is not None:
+                    return obj
+        try:
+            if pk is None:
+                pk = self.resolve(natural_key)
+            # Versions are read before the row, so that a write meanwhile makes the copy stale.
+            key = self.object_key(pk)
+            queryset = self.model._default_manager.select_related(*self.select_related)
+            obj = queryset.filter(pk=pk).first()
+            if natural_key and (obj is None or getattr(obj, self.natural_key) != natural_key[self.natural_key]):
+                # The natural key moved to another row since it was resolved.
+                return queryset.get(**natural_key)
+            if obj is None:
+                raise self.does_not_exist()
+            if transaction.get_connection().in_atomic_block:
+                # The row may be one the transaction wrote and will roll back.
+                return obj
+            self.cache.set_many({
+                key: obj,
+                self.natural_key_key(getattr(obj, self.natural_key)): obj.pk,
+            }, self.timeout or settings.OBJECT_CACHE_TIMEOUT)
+            return obj
+        finally:
+            if locked:
+                self.cache.delete(lock)
+
+    def resolve(self, natural_key):
+        """Return the pk of the row with ``natural_key``, from the cache if it was found before."""
+        pk = self.cache.get(self.natural_key_key(natural_key[self.natural_key]))
+        if pk is None:
+            pk = self.model._default_manager.filter(**natural_key).values_list('pk', flat=True).first()
+            if pk is None:
+                raise self.does_not_exist()
+        return pk
+
+    def does_not_exist(self):
+        return self.model.DoesNotExist(f'{self.model._meta.object_name} matching query does not exist.')
+
+    def invalidate(self, *pks):
+        """Make the cached copies of the rows ``pks`` stale, now and when the transaction commits."""
+        if not pks:
+            return
+        keys = [f'{self.prefix}:{pk}:version' for pk in pks]
+        self.cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+        if transaction.get_connection().in_atomic_block:
+            # A request could otherwise cache the old row again before the new one is committed.
+            transaction.on_commit(lambda: self.cache.set_many({key: uuid.uuid4().hex for key in keys}, None))
+        self.count('invalidations')
+
+    def invalidate_all(self):
+        """Make every cached copy stale, e.g. after ``QuerySet.update()``."""
+        self.cache.set(f'{self.prefix}:generation', uuid.uuid4().hex, None)
+        self.count('invalidations')
+
+    def connect(self):
+        for model in {self.model, *self.related_models()}:
+            post_save.connect(self.changed, sender=model, weak=False)
+            post_delete.connect(self.changed, sender=model, weak=False)
+
+    def related_models(self):
+        return [self.model._meta.get_field(name).related_model for name in self.select_related]
+
+    def changed(self, sender, instance, created=False, **kwargs):
+        if not created:
+            self.rows_changed(sender, [instance.pk])
+
+    def rows_changed(self, model, pks):
+        """Invalidate the instances that are, or are cached with, the rows ``pks`` of ``model``."""
+        if model is self.model:
+            self.invalidate(*pks)
+        for name in self.select_related:
+            if self.model._meta.get_field(name).related_model is model:
+                self.invalidate(*self.model._default_manager.filter(
+                    **{f'{name}__in': pks},
+                ).values_list('pk', flat=True))
+
+
+def register(object_cache):
+    registry[object_cache.model._meta.label_lower] = object_cache
+    object_cache.connect()
+    return object_cache
+
+
+def get_object_cache(model):
+    return registry.get(model._meta.label_lower)
+
+
+def rows_changed(model, pks):
+    """Invalidate the cached copies of the rows ``pks`` of ``model``, for writes that send no signals."""
+    for object_cache in registry.values():
+        object_cache.rows_changed(model, list(pks))
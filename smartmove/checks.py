@@ -0,0 +1,29 @@
+"""
+System checks of the database the project runs on.
+
+The project needs PostgreSQL 16: ``smartmove.bulkload`` validates staged
+rows with ``pg_input_is_valid()`` and ``pg_input_error_info()``, new in 16,
+and the facet tables of ``smartmove.facets`` have ``UNIQUE NULLS NOT
+DISTINCT`` keys, new in 15. Older servers fail only when those run, so the
+check stops ``migrate``, and ``check --database``, before they do.
+"""
+from django.core.checks import Error, Tags, register
+from django.db import connections
+
+MIN_POSTGRESQL_VERSION = 160000
+
+
+@register(Tags.database)
+def check_postgresql_version(app_configs, databases=None, **kwargs):
+    errors = []
+    for alias in databases or []:
+        connection = connections[alias]
+        if connection.vendor != 'postgresql' or connection.pg_version >= MIN_POSTGRESQL_VERSION:
+            continue
+        errors.append(Error(
+            f'Database {alias!r} runs PostgreSQL {connection.pg_version // 10000}.{connection.pg_version % 10000}, '
+            f'the project needs {MIN_POSTGRESQL_VERSION // 10000} or later.',
+            hint='Imports use pg_input_is_valid() and facets UNIQUE NULLS NOT DISTINCT, see smartmove.checks.',
+            id='smartmove.E001',
+        ))
+    return errors
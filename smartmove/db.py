@@ -0,0 +1,97 @@
+"""
+Database connection handling.
+
+``connection_settings()`` gives the ``DATABASES`` entries for each way web
+processes can get their connections:
+
+- ``pooled``: each process keeps a psycopg pool of connections, checked
+  out for the length of a request. Connections are checked before being
+  handed out, and a request that waits longer than the pool's timeout for
+  one gets a 503 from ``PoolExhaustedMiddleware`` rather than a 500.
+- ``persistent``: each thread keeps its connection across requests, and
+  checks it at the start of each one.
+- ``unpooled``: each request opens and closes its own connection.
+
+``pool_stats()`` reports the pools of the current process.
+"""
+import logging
+
+from django.db import connections
+from django.db.utils import OperationalError
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+from psycopg_pool import PoolTimeout
+
+logger = logging.getLogger(__name__)
+
+MODES = ['pooled', 'persistent', 'unpooled']
+
+# Seconds a persistent connection is kept.
+PERSISTENT_MAX_AGE = 600
+
+
+def connection_settings(mode, pool_size=1, pool_timeout=5):
+    """
+    Return the ``DATABASES`` entries for connection ``mode``. A pool holds
+    ``pool_size`` connections and requests wait at most ``pool_timeout``
+    seconds for one.
+    """
+    if mode == 'pooled':
+        # A fixed size, as the pool is only ever asked for as many connections as the process has threads.
+        # No CONN_HEALTH_CHECKS: Django already has the pool check connections before handing them out.
+        return {'CONN_MAX_AGE': 0, 'OPTIONS': {'pool': {
+            'min_size': pool_size, 'max_size': pool_size, 'timeout': pool_timeout,
+        }}}
+    if mode == 'persistent':
+        return {'CONN_MAX_AGE': PERSISTENT_MAX_AGE, 'CONN_HEALTH_CHECKS': True}
+    if mode == 'unpooled':
+        return {'CONN_MAX_AGE': 0}
+    raise ValueError(f"Unknown connection mode {mode!r}, expected one of {', '.join(MODES)}.")
+
+
+def pool_stats():
+    """
+    Return the statistics of the connection pool of each database of the
+    current process that has one: its size, the connections checked out and
+    the requests waiting for one, how many requests were served and how long
+    they waited in all, and how many gave up.
+    """
+    stats = {}
+    for alias in connections:
+        if connections.settings[alias]['OPTIONS'].get('pool') and connections[alias].vendor == 'postgresql':
+            pool = connections[alias].pool.get_stats()
+            stats[alias] = {
+                'size': pool['pool_size'],
+                'max_size': pool['pool_max'],
+                'checked_out': pool['pool_size'] - pool['pool_available'],
+                'waiting': pool['requests_waiting'],
+                'requests': pool.get('requests_num', 0),
+                'requests_queued': pool.get('requests_queued', 0),
+                'wait_ms': pool.get('requests_wait_ms', 0),
+                'timeouts': pool.get('requests_errors', 0),
+                'connections_opened': pool.get('connections_num', 0),
+                'connections_lost': pool.get('connections_lost', 0) + pool.get('returns_bad', 0),
+            }
+    return stats
+
+
+def pool_exhausted(exception):
+    """Return whether ``exception`` is a request that timed out waiting for a pooled connection."""
+    return isinstance(exception, OperationalError) and isinstance(exception.__cause__, PoolTimeout)
+
+
+class PoolExhaustedMiddleware(MiddlewareMixin):
+    """
+    Answer the requests that timed out waiting for a pooled connection with a
+    503 and a Retry-After, so that clients and load balancers back off.
+    """
+    retry_after = 1
+
+    def process_exception(self, request, exception):
+        if not pool_exhausted(exception):
+            return None
+        logger.warning('No database connection available for %s: %s', request.path, exception.__cause__)
+        return HttpResponse(
+            'The service is busy, please retry shortly.', status=503, content_type='text/plain',
+            headers={'Retry-After': str(self.retry_after)},
+        )
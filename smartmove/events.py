@@ -0,0 +1,101 @@
+"""
+Relocation events pushed to browsers.
+
+Database triggers, see the relocations and logistics migrations, NOTIFY
+``CHANNEL`` with a JSON payload whenever a timeline entry is written or a
+transfer changes status, whatever the code path: admin saves, bulk updates
+or plain SQL. The notifications are sent when the transaction commits.
+
+Each process keeps one connection LISTENing to the channel, opened when the
+first client subscribes and closed when the last one leaves, and hands each
+event to the queues of the clients following its relocation request.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+from collections import defaultdict
+
+import psycopg
+from django.db import DEFAULT_DB_ALIAS, connections
+from psycopg import sql
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'relocation_events'
+
+
+class Listener:
+    # Events kept for a client that reads slower than they come, the oldest being dropped.
+    queue_size = 100
+    reconnect_delay = 1
+
+    def __init__(self, channel=CHANNEL, using=DEFAULT_DB_ALIAS):
+        self.channel = channel
+        self.using = using
+        self.subscribers = defaultdict(set)
+        self.task = None
+        self.ready = None
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, key):
+        """
+        Yield a queue receiving the events of relocation request ``key``, a
+        primary key, once the process listens to the channel.
+        """
+        queue = asyncio.Queue(self.queue_size)
+        self.subscribers[key].add(queue)
+        try:
+            if self.task is None or self.task.done():
+                self.ready = asyncio.Event()
+                self.task = asyncio.create_task(self.listen())
+            await self.ready.wait()
+            yield queue
+        finally:
+            self.subscribers[key].discard(queue)
+            if not self.subscribers[key]:
+                del self.subscribers[key]
+            if not self.subscribers and self.task is not None:
+                self.task.cancel()
+                self.task = None
+
+    async def listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    **self.connection_params(), autocommit=True,
+                ) as connection:
+                    await connection.execute(sql.SQL('LISTEN {}').format(sql.Identifier(self.channel)))
+                    self.ready.set()
+                    async for notify in connection.notifies():
+                        self.dispatch(notify.payload)
+            except Exception as e:
+                # Events sent meanwhile are lost; clients fetch the current state when they reconnect.
+                self.ready.clear()
+                if isinstance(e, psycopg.OperationalError):
+                    logger.warning('Lost the connection listening to %s: %s', self.channel, e)
+                else:
+                    logger.exception('Listening to %s failed, reconnecting.', self.channel)
+                await asyncio.sleep(self.reconnect_delay)
+
+    def connection_params(self):
+        params = connections[self.using].get_connection_params()
+        # Django's cursor classes and adapters are for synchronous connections.
+        params.pop('cursor_factory', None)
+        params.pop('context', None)
+        return params
+
+    def dispatch(self, payload):
+        try:
+            event = json.loads(payload)
+            queues = self.subscribers.get(event['request'], ())
+        except (ValueError, TypeError, KeyError):
+            logger.warning('Skipped a malformed event on %s: %r', self.channel, payload)
+            return
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+listener = Listener()
@@ -0,0 +1,204 @@
+"""
+Distinct values of a column, and their counts, kept in a summary table.
+
+A ``Facet`` of a field, or of a field one foreign key away such as
+``property__property_type``, has a table with a row per value and the
+number of rows having it. Triggers keep it up to date as rows are written,
+whatever the code path: each statement adds the difference it makes to the
+counts of the values it touched, so that bulk writes update each value once.
+The admin's ``FacetListFilter`` reads its options from there instead of
+running a ``SELECT DISTINCT`` over the whole table.
+
+The tables and triggers are created by the ``CreateFacet`` migration
+operation; ``rebuild()`` recounts a table from scratch, e.g. after a
+``TRUNCATE``, which sends no trigger.
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.backends.utils import truncate_name
+from django.db.migrations.operations.base import Operation
+from django.db.models.constants import LOOKUP_SEP
+
+# Identifiers longer than this are truncated by PostgreSQL.
+MAX_NAME_LENGTH = 63
+
+
+class Facet:
+    def __init__(self, model, field_path):
+        path = field_path.split(LOOKUP_SEP)
+        if len(path) > 2:
+            raise ValueError(f'A facet follows one foreign key at most, not {field_path!r}.')
+        self.model = model
+        self.field_path = field_path
+        self.relation = model._meta.get_field(path[0]) if len(path) == 2 else None
+        self.field = (self.relation.related_model if self.relation else model)._meta.get_field(path[-1])
+        self.table = truncate_name(f"{model._meta.db_table}_{'_'.join(path)}_facet", MAX_NAME_LENGTH)
+
+    def counts(self, using=DEFAULT_DB_ALIAS):
+        """Return ``{value: count}`` ordered by value, the values as text, ``None`` last."""
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'SELECT value, count FROM {self.quote(self.table)} WHERE count > 0')
+            rows = cursor.fetchall()
+        rows.sort(key=lambda row: (row[0] is None, row[0] is not None and self.field.to_python(row[0])))
+        return dict(rows)
+
+    def rebuild(self, using=DEFAULT_DB_ALIAS):
+        """Recount the values from the table."""
+        with transaction.atomic(using), connections[using].cursor() as cursor:
+            # Writers wait until the new counts are committed rather than change the old ones.
+            cursor.execute(f'LOCK TABLE {self.quote(self.table)} IN SHARE ROW EXCLUSIVE MODE')
+            cursor.execute(f'DELETE FROM {self.quote(self.table)}')
+            cursor.execute(self.count_sql())
+
+    # SQL
+
+    def quote(self, name):
+        return connections[DEFAULT_DB_ALIAS].ops.quote_name(name)
+
+    def name(self, suffix):
+        return self.quote(truncate_name(f'{self.table}_{suffix}', MAX_NAME_LENGTH))
+
+    def values(self, alias, delta, rows, where=''):
+        """Select the value of each row of ``rows``, with ``delta``."""
+        q = self.quote
+        if self.relation is None:
+            return f'SELECT {alias}.{q(self.field.column)}::text AS value, {delta} AS delta FROM {rows} {alias} {where}'
+        related = self.relation.related_model._meta
+        return (
+            f'SELECT r.{q(self.field.column)}::text AS value, {delta} AS delta FROM {rows} {alias} '
+            f'LEFT JOIN {q(related.db_table)} r ON r.{q(self.relation.target_field.column)} = '
+            f'{alias}.{q(self.relation.column)} {where}'
+        )
+
+    def add(self, changes):
+        """Add the deltas selected by ``changes`` to the counts, in the order of the values to avoid deadlocks."""
+        return (
+            f'INSERT INTO {self.quote(self.table)} AS facet (value, count) '
+            f'SELECT value, sum(delta) FROM ({changes}) AS changes GROUP BY value HAVING sum(delta) <> 0 '
+            f'ORDER BY value ON CONFLICT (value) DO UPDATE SET count = facet.count + EXCLUDED.count;'
+        )
+
+    def count_sql(self):
+        return (
+            f'INSERT INTO {self.quote(self.table)} (value, count) SELECT value, count(*) '
+            f'FROM ({self.values("t", 1, self.quote(self.model._meta.db_table))}) AS counted GROUP BY value'
+        )
+
+    def create_sql(self):
+        q = self.quote
+        table = q(self.model._meta.db_table)
+        pk = q(self.model._meta.pk.column)
+        # The column deciding a row's value: the field's, or the foreign key's.
+        column = q(self.relation.column if self.relation else self.field.column)
+        changed = (
+            f'WHERE t.{pk} IN (SELECT o.{pk} FROM old_rows o JOIN new_rows n ON n.{pk} = o.{pk} '
+            f'WHERE o.{column} IS DISTINCT FROM n.{column})'
+        )
+        inserted = self.add(self.values('t', 1, 'new_rows'))
+        deleted = self.add(self.values('t', -1, 'old_rows'))
+        updated = self.add(
+            f"{self.values('t', -1, 'old_rows', changed)} UNION ALL {self.values('t', 1, 'new_rows', changed)}"
+        )
+        statements = [
+            f'CREATE TABLE {q(self.table)} (value text UNIQUE NULLS NOT DISTINCT, count bigint NOT NULL)',
+            f"""
+            CREATE FUNCTION {self.name('count')}() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    {inserted}
+                ELSIF TG_OP = 'DELETE' THEN
+                    {deleted}
+                ELSE
+                    {updated}
+                END IF;
+                RETURN NULL;
+            END
+            $$
+            """,
+            *(
+                f"CREATE TRIGGER {self.name(event.lower())} AFTER {event} ON {table} "
+                f"REFERENCING {transition} FOR EACH STATEMENT EXECUTE FUNCTION {self.name('count')}()"
+                for event, transition in [
+                    ('INSERT', 'NEW TABLE AS new_rows'),
+                    ('DELETE', 'OLD TABLE AS old_rows'),
+                    ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+                ]
+            ),
+        ]
+        if self.relation is not None:
+            # Changing the value of a related row moves the rows pointing to it.
+            related = self.relation.related_model._meta
+            related_pk = q(self.relation.target_field.column)
+            field = q(self.field.column)
+            moved_rows = (
+                f'FROM old_related o JOIN new_related n ON n.{related_pk} = o.{related_pk} '
+                f'JOIN {table} t ON t.{q(self.relation.column)} = o.{related_pk} '
+                f'WHERE o.{field} IS DISTINCT FROM n.{field}'
+            )
+            moved = self.add(
+                f'SELECT o.{field}::text AS value, -1 AS delta {moved_rows} '
+                f'UNION ALL SELECT n.{field}::text, 1 {moved_rows}'
+            )
+            statements += [
+                f"""
+                CREATE FUNCTION {self.name('move')}() RETURNS trigger LANGUAGE plpgsql AS $$
+                BEGIN
+                    {moved}
+                    RETURN NULL;
+                END
+                $$
+                """,
+                f"CREATE TRIGGER {self.name('move')} AFTER UPDATE ON {q(related.db_table)} "
+                f"REFERENCING OLD TABLE AS old_related NEW TABLE AS new_related "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION {self.name('move')}()",
+            ]
+        return statements
+
+    def drop_sql(self):
+        q = self.quote
+        statements = [
+            f'DROP TRIGGER {self.name(event)} ON {q(self.model._meta.db_table)}'
+            for event in ['insert', 'delete', 'update']
+        ]
+        statements.append(f"DROP FUNCTION {self.name('count')}()")
+        if self.relation is not None:
+            statements += [
+                f"DROP TRIGGER {self.name('move')} ON {q(self.relation.related_model._meta.db_table)}",
+                f"DROP FUNCTION {self.name('move')}()",
+            ]
+        statements.append(f'DROP TABLE {q(self.table)}')
+        return statements
+
+
+class CreateFacet(Operation):
+    """Create the summary table of ``Facet(model, field_path)``, its triggers, and count the rows."""
+    reversible = True
+
+    def __init__(self, model_name, field_path):
+        self.model_name = model_name
+        self.field_path = field_path
+
+    def deconstruct(self):
+        return self.__class__.__qualname__, [self.model_name, self.field_path], {}
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            facet = Facet(model, self.field_path)
+            for statement in [*facet.create_sql(), facet.count_sql()]:
+                schema_editor.execute(statement)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            for statement in Facet(model, self.field_path).drop_sql():
+                schema_editor.execute(statement)
+
+    def describe(self):
+        return f'Create facet {self.field_path} of {self.model_name}'
+
+    @property
+    def migration_name_fragment(self):
+        return f"{self.model_name.lower()}_{self.field_path.replace(LOOKUP_SEP, '_')}_facet"
@@ -0,0 +1,74 @@
+"""
+Offline geocoding from postal codes.
+
+Addresses resolve to the centroid of their ZIP code, looked up in a table
+bundled in ``data/`` (US ZIP codes, see ``data/us_zip_centroids.LICENSE``),
+so no network access is needed. Lookups and distances work on whole NumPy
+arrays at once; the coordinates are cached on the models by the callers.
+"""
+import csv
+import gzip
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+CENTROIDS = Path(__file__).resolve().parent / 'data' / 'us_zip_centroids.csv.gz'
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Spellings of the countries the table covers; a blank country counts too.
+COUNTRIES = {'', 'us', 'usa', 'u.s.', 'u.s.a.', 'united states', 'united states of america'}
+
+_ZIP = re.compile(r'\s*(\d{5})(?:[-\s]?\d{4})?\s*$')
+
+
+@lru_cache(maxsize=None)
+def centroids():
+    """Return the bundled ZIP codes, as sorted integers, and their latitudes and longitudes."""
+    with gzip.open(CENTROIDS, 'rt', newline='') as file:
+        reader = csv.reader(file)
+        next(reader)
+        codes, latitudes, longitudes = zip(*reader)
+    return np.array(codes, dtype=np.int64), np.array(latitudes, dtype=float), np.array(longitudes, dtype=float)
+
+
+def zip_key(zip_code, country=''):
+    """Return the ZIP code as the integer the table is sorted by, or -1 if it can't be in the table."""
+    match = _ZIP.match(zip_code or '')
+    if not match or (country or '').strip().lower() not in COUNTRIES:
+        return -1
+    return int(match[1])
+
+
+def locate(zip_codes, countries=None):
+    """
+    Return arrays of the latitudes and longitudes of ``zip_codes``, NaN where
+    a code is unknown or in another country than the table's.
+    """
+    codes, latitudes, longitudes = centroids()
+    if countries is None:
+        countries = [''] * len(zip_codes)
+    keys = np.array([zip_key(code, country) for code, country in zip(zip_codes, countries)], dtype=np.int64)
+    positions = np.minimum(np.searchsorted(codes, keys), len(codes) - 1)
+    found = codes[positions] == keys
+    return np.where(found, latitudes[positions], np.nan), np.where(found, longitudes[positions], np.nan)
+
+
+def geocode(zip_code, country=''):
+    """Return the ``(latitude, longitude)`` of one ZIP code, or ``(None, None)``."""
+    latitude, longitude = locate([zip_code], [country])
+    if np.isnan(latitude[0]):
+        return None, None
+    return float(latitude[0]), float(longitude[0])
+
+
+def haversine_km(latitude1, longitude1, latitude2, longitude2):
+    """Return the great-circle distances between arrays of points, in kilometres."""
+    latitude1, longitude1, latitude2, longitude2 = map(np.radians, (latitude1, longitude1, latitude2, longitude2))
+    a = (
+        np.sin((latitude2 - latitude1) / 2) ** 2
+        + np.cos(latitude1) * np.cos(latitude2) * np.sin((longitude2 - longitude1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
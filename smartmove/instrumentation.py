@@ -0,0 +1,364 @@
+"""
+Per-request database instrumentation.
+
+``InstrumentationMiddleware`` times each request and, through an execute
+wrapper installed on every database connection, the queries it runs. Totals
+are kept per URL name in ``request_metrics`` and served by the ``metrics``
+view in Prometheus' text format: histograms of the response time, the
+database time and the number of queries, and counters of the requests, the
+server errors and the repeated queries.
+
+A query is repeated when a request runs the same SQL, parameters aside,
+more than once, the mark of an N+1 access pattern. Requests slower or
+heavier than the ``SLOW_REQUEST_*`` settings are logged with their most
+repeated queries.
+
+The queries are attributed through a context variable, so those that async
+views run in threads are counted too, as are those run while a streaming
+response is read, the request being recorded once its content is out.
+
+The metrics are kept by each process. With ``METRICS_DIR`` set, each saves
+its own in a file there within ``SAVE_SECONDS`` of a request, and the one
+scraped serves the sum of all the files, so that scraping any gunicorn
+worker gives the metrics of the whole server.
+"""
+import atexit
+import bisect
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import FileResponse
+
+logger = logging.getLogger(__name__)
+
+# Seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Seconds a process waits after a request to save its metrics in METRICS_DIR, for the next ones to join in.
+SAVE_SECONDS = 1
+
+current_request = contextvars.ContextVar('current_request', default=None)
+
+IN_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+
+
+def fingerprint(sql):
+    """The SQL of a query without the length of its ``IN`` lists, its parameters being apart already."""
+    return IN_LIST.sub('%s, ...', sql)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+
+    def repeated(self):
+        """Return ``[(fingerprint, executions)]`` of the queries run more than once, most run first."""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > 1]
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - start
+        stats.queries += 1
+        stats.fingerprints[fingerprint(sql)] += 1
+
+
+def instrument(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip([*self.buckets, '+Inf'], self.counts):
+            cumulative += count
+            yield f'{name}_bucket', {**labels, 'le': str(bound)}, cumulative
+        yield f'{name}_sum', labels, self.sum
+        yield f'{name}_count', labels, cumulative
+
+    def state(self):
+        return {'counts': self.counts, 'sum': self.sum}
+
+    def add(self, state):
+        self.counts = [count + other for count, other in zip(self.counts, state['counts'])]
+        self.sum += state['sum']
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.server_errors = 0
+        self.slow_requests = 0
+        self.repeated_queries = 0
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.db_duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+
+    COUNTERS = ('requests', 'server_errors', 'slow_requests', 'repeated_queries')
+    HISTOGRAMS = ('duration', 'db_duration', 'queries')
+
+    def state(self):
+        """Return the metrics as a dict for JSON, which ``add()`` sums back."""
+        return {
+            **{name: getattr(self, name) for name in self.COUNTERS},
+            **{name: getattr(self, name).state() for name in self.HISTOGRAMS},
+        }
+
+    def add(self, state):
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + state[name])
+        for name in self.HISTOGRAMS:
+            getattr(self, name).add(state[name])
+
+
+# (name, type, help, sample).
+METRICS = [
+    ('smartmove_requests_total', 'counter', 'Requests served.', lambda view: view.requests),
+    ('smartmove_request_server_errors_total', 'counter', 'Requests answered with a 5xx.',
+     lambda view: view.server_errors),
+    ('smartmove_slow_requests_total', 'counter', 'Requests over a SLOW_REQUEST_* threshold.',
+     lambda view: view.slow_requests),
+    ('smartmove_request_repeated_queries_total', 'counter',
+     'Queries whose SQL the request had already run, as in N+1 access patterns.',
+     lambda view: view.repeated_queries),
+    ('smartmove_request_duration_seconds', 'histogram', 'Time to the response, to its end if streamed.',
+     lambda view: view.duration),
+    ('smartmove_request_db_duration_seconds', 'histogram', 'Time spent in database queries.',
+     lambda view: view.db_duration),
+    ('smartmove_request_queries', 'histogram', 'Database queries per request.', lambda view: view.queries),
+]
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(ViewMetrics)
+        self.save_timer = None
+        # The file of the process in METRICS_DIR, named afresh in a forked one.
+        self.pid = self.filename = None
+        atexit.register(self.save_pending)
+
+    def record(self, view, status, duration, stats, slow):
+        with self.lock:
+            metrics = self.views[view]
+            metrics.requests += 1
+            metrics.server_errors += status >= 500
+            metrics.slow_requests += slow
+            metrics.repeated_queries += sum(count - 1 for _, count in stats.repeated())
+            metrics.duration.observe(duration)
+            metrics.db_duration.observe(stats.db_time)
+            metrics.queries.observe(stats.queries)
+            if settings.METRICS_DIR and self.save_timer is None:
+                self.save_timer = threading.Timer(SAVE_SECONDS, self.save)
+                self.save_timer.daemon = True
+                self.save_timer.start()
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+            self.cancel_save()
+            if settings.METRICS_DIR and self.filename:
+                (Path(settings.METRICS_DIR) / self.filename).unlink(missing_ok=True)
+
+    def cancel_save(self):
+        if self.save_timer is not None:
+            self.save_timer.cancel()
+            self.save_timer = None
+
+    def save_pending(self):
+        if self.save_timer is not None:
+            self.save()
+
+    def save(self):
+        """Write the metrics of this process to its file in ``METRICS_DIR``."""
+        with self.lock:
+            self.cancel_save()
+            if self.pid != os.getpid():
+                self.pid, self.filename = os.getpid(), f'{os.getpid()}-{uuid.uuid4().hex}.json'
+            state = json.dumps({view: metrics.state() for view, metrics in self.views.items()})
+        # Renamed into place, so that readers never see half of it.
+        path = Path(settings.METRICS_DIR) / self.filename
+        partial = path.with_suffix('.partial')
+        partial.write_text(state)
+        partial.replace(path)
+
+    def totals(self):
+        """Return ``{view: ViewMetrics}`` of this process or, with ``METRICS_DIR``, of all those saved there."""
+        views = defaultdict(ViewMetrics)
+        if not settings.METRICS_DIR:
+            with self.lock:
+                for view, metrics in self.views.items():
+                    views[view].add(metrics.state())
+            return views
+        self.save()
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            for view, state in json.loads(path.read_text()).items():
+                views[view].add(state)
+        return views
+
+    def exposition(self):
+        """Return the metrics in Prometheus' text format."""
+        lines = []
+        views = sorted(self.totals().items())
+        for name, kind, help_text, sample in METRICS:
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+            for view, metrics in views:
+                value = sample(metrics)
+                samples = value.samples(name, {'view': view}) if kind == 'histogram' else [
+                    (name, {'view': view}, value),
+                ]
+                lines += [
+                    f'{sample_name}{{{format_labels(labels)}}} {number}' for sample_name, labels, number in samples
+                ]
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    return ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items())
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_metrics = RequestMetrics()
+
+
+class InstrumentationMiddleware:
+    """
+    Record the response time and database use of each request in
+    ``request_metrics``. Goes first in ``MIDDLEWARE``, so that the time of
+    the other middleware counts.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(instrument, dispatch_uid='smartmove.instrumentation')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        # Connections opened before the middleware was loaded sent no signal.
+        for connection in connections.all(initialized_only=True):
+            instrument(connection)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, start, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, start, stats)
+
+    def finish(self, request, response, start, stats):
+        """Record the request, or have its streaming content record it once read to the end or closed."""
+        # Files are sent as they are, by the server's file wrapper if it has one.
+        if not response.streaming or isinstance(response, FileResponse):
+            self.record(request, response, time.perf_counter() - start, stats)
+            return response
+
+        def done():
+            self.record(request, response, time.perf_counter() - start, stats)
+
+        content = response.streaming_content
+        response.streaming_content = (
+            count_async(content, stats, done) if response.is_async else count_sync(content, stats, done)
+        )
+        return response
+
+    def record(self, request, response, duration, stats):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else 'unresolved'
+        repeated = stats.repeated()
+        slow = (
+            duration > settings.SLOW_REQUEST_SECONDS
+            or stats.db_time > settings.SLOW_REQUEST_DB_SECONDS
+            or stats.queries > settings.SLOW_REQUEST_QUERIES
+            or sum(count - 1 for _, count in repeated) > settings.SLOW_REQUEST_REPEATED_QUERIES
+        )
+        request_metrics.record(view, response.status_code, duration, stats, slow)
+        if slow:
+            logger.warning(
+                'Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms%s',
+                request.method, request.path, view, duration * 1000, stats.queries, stats.db_time * 1000,
+                ''.join(f'\n  {count} x {sql[:500]}' for sql, count in repeated[:3]),
+            )
+
+
+def count_sync(chunks, stats, done):
+    """Yield ``chunks``, counting the queries run to produce them in ``stats``, then call ``done()``."""
+    chunks = iter(chunks)
+    try:
+        while True:
+            token = current_request.set(stats)
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                current_request.reset(token)
+            yield chunk
+    finally:
+        done()
+
+
+async def count_async(chunks, stats, done):
+    """``count_sync()`` of an asynchronous iterator."""
+    chunks = aiter(chunks)
+    try:
+        while True:
+            token = current_request.set(stats)
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                return
+            finally:
+                current_request.reset(token)
+            yield chunk
+    finally:
+        done()
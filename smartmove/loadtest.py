@@ -0,0 +1,177 @@
+"""
+HTTP load generation for the benchmark commands.
+
+``serve()`` runs the project under gunicorn in a subprocess and ``load()``
+plays many concurrent clients against it with asyncio, each sending
+requests back to back over a keep-alive connection, and reports the
+throughput and latency percentiles of each kind of request. Requests are
+sent as the user ``logged_in()`` makes a session for.
+"""
+import asyncio
+import contextlib
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve(app, *options, env=None, timeout=30):
+    """
+    Run ``app``, such as ``smartmove.wsgi:application``, under gunicorn with
+    its command line ``options`` and extra environment variables ``env``,
+    and yield the port it listens on once it accepts connections.
+    """
+    port = free_port()
+    with tempfile.TemporaryFile() as log:
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', *options, app],
+            cwd=settings.BASE_DIR, env={**os.environ, **(env or {})}, stdout=log, stderr=subprocess.STDOUT,
+        )
+        try:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        log.seek(0)
+                        raise RuntimeError(f'gunicorn did not start:\n{log.read().decode(errors="replace")}')
+                    time.sleep(0.1)
+            yield port
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+
+@contextlib.contextmanager
+def logged_in(user):
+    """Yield the headers of requests made as ``user``, whose session is deleted afterwards."""
+    session = SessionStore()
+    session.update({
+        SESSION_KEY: str(user.pk),
+        BACKEND_SESSION_KEY: 'django.contrib.auth.backends.ModelBackend',
+        HASH_SESSION_KEY: user.get_session_auth_hash(),
+    })
+    session.create()
+    try:
+        yield {'Cookie': f'{settings.SESSION_COOKIE_NAME}={session.session_key}'}
+    finally:
+        session.delete()
+
+
+def load(port, mix, concurrency, duration, headers=None, weights=None):
+    """
+    Send requests to ``port`` from ``concurrency`` clients for ``duration``
+    seconds. ``mix`` maps the kinds of requests to their paths; each request
+    is of a kind picked at random, in proportion to its ``weights`` if given,
+    for a path of it picked at random. Return
+    ``{kind: {'requests', 'errors', 'rate', 'p50', 'p95', 'p99'}}``, rates in
+    requests per second and latencies in milliseconds, with the totals under
+    ``'all'``.
+    """
+    return asyncio.run(_load(port, mix, concurrency, duration, headers or {}, weights))
+
+
+async def _load(port, mix, concurrency, duration, headers, weights):
+    head = ''.join(f'{name}: {value}\r\n' for name, value in {'Host': f'127.0.0.1:{port}', **headers}.items())
+    kinds = list(mix)
+    weights = [weights[kind] for kind in kinds] if weights else None
+    latencies, errors = defaultdict(list), defaultdict(int)
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        connection = None
+        while time.perf_counter() < deadline:
+            kind = random.choices(kinds, weights)[0]
+            start = time.perf_counter()
+            path = random.choice(mix[kind])
+            status, keep_alive = None, False
+            # A kept-alive connection the server closed meanwhile is retried on a new one, as browsers do.
+            for reused in [connection is not None, False]:
+                try:
+                    if connection is None:
+                        connection = await asyncio.open_connection('127.0.0.1', port)
+                    status, keep_alive = await _get(*connection, path, head)
+                    break
+                except (OSError, EOFError, ValueError):
+                    if connection is not None:
+                        connection[1].close()
+                        connection = None
+                    if not reused:
+                        break
+            if status == 200:
+                latencies[kind].append(time.perf_counter() - start)
+            else:
+                errors[kind] += 1
+            if not keep_alive and connection is not None:
+                connection[1].close()
+                connection = None
+        if connection is not None:
+            connection[1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    results = {kind: _summary(latencies[kind], errors[kind], elapsed) for kind in kinds}
+    results['all'] = _summary(
+        [latency for kind in kinds for latency in latencies[kind]], sum(errors.values()), elapsed,
+    )
+    return results
+
+
+async def _get(reader, writer, path, head):
+    """Send a GET for ``path`` and read the response; return its status and whether the connection stays open."""
+    writer.write(f'GET {path} HTTP/1.1\r\n{head}\r\n'.encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise EOFError
+    version, status = status_line.split()[:2]
+    length, chunked, keep_alive = 0, False, version == b'HTTP/1.1'
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding':
+            chunked = value == 'chunked'
+        elif name == 'connection':
+            keep_alive = value != 'close'
+    if chunked:
+        while size := int((await reader.readline()).split(b';')[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    else:
+        await reader.readexactly(length)
+    return int(status), keep_alive
+
+
+def _summary(latencies, errors, elapsed):
+    summary = {'requests': len(latencies), 'errors': errors, 'rate': len(latencies) / elapsed}
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100)
+        p50, p95, p99 = (quantiles[p - 1] * 1000 for p in (50, 95, 99))
+    else:
+        p50 = p95 = p99 = latencies[0] * 1000 if latencies else None
+    return {**summary, 'p50': p50, 'p95': p95, 'p99': p99}
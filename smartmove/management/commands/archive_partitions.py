@@ -0,0 +1,107 @@
+import gzip
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from ...partitions import PartitionedTable, add_months, current_month
+
+# The relocation request the rows of each partitioned model belong to.
+REQUEST_LOOKUPS = {
+    'logistics.InventoryTransfer': 'assignment__relocation_request',
+    'logistics.MovingExpense': 'assignment__relocation_request',
+    'relocations.RelocationTimeline': 'relocation_request',
+}
+
+CLOSED_STATUSES = ['completed', 'cancelled']
+
+# Run as a partition of each model is detached, {partition} being its table: detaching fires no
+# trigger, so what is kept of its rows elsewhere is brought in line here.
+ON_DETACH = {
+    'logistics.InventoryTransfer': (
+        'DELETE FROM logistics_inventorytransfer_item_key k USING {partition} t '
+        'WHERE k.inventory_item_id = t.inventory_item_id AND k.assignment_id = t.assignment_id'
+    ),
+    # Their current milestone is no longer recomputed from the entries left.
+    'relocations.RelocationTimeline': (
+        'UPDATE relocations_relocationrequest SET timeline_archived = true '
+        'WHERE id IN (SELECT relocation_request_id FROM {partition}) AND NOT timeline_archived'
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Take the monthly partitions older than --older-than months whose rows all belong to completed or '
+        'cancelled relocation requests out of the database: detach each, write its rows to '
+        '<partition>.csv.gz in --output-dir, and drop it. Rows dated in an archived month later go to the '
+        'default partition, which is never archived: find them there. Restore a partition by creating a '
+        'table LIKE the partitioned one, copying the file into it and attaching it as the partition again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=6, help='Months since the end of the partition.')
+        parser.add_argument('--output-dir', default=settings.ARCHIVE_DIR)
+        parser.add_argument('--keep', action='store_true', help='Keep the detached tables rather than drop them.')
+        parser.add_argument('--dry-run', action='store_true', help='Report the partitions without archiving them.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        output_dir = Path(options['output_dir'])
+        cutoff = add_months(current_month(), -options['older_than'])
+        for partitioned_table in PartitionedTable.all(using):
+            lookup = REQUEST_LOOKUPS.get(partitioned_table.model._meta.label)
+            if lookup is None:
+                continue
+            for name, month in partitioned_table.partitions(using).items():
+                if month is None or add_months(month, 1) > cutoff:
+                    continue
+                if options['dry_run']:
+                    if not self.open_rows(partitioned_table, month, lookup, using):
+                        self.stdout.write(f'Would archive {name}.')
+                    continue
+                if not self.detach(partitioned_table, name, month, lookup, using):
+                    continue
+                path = output_dir / f'{name}.csv.gz'
+                rows = self.dump(name, path, using)
+                if not options['keep']:
+                    with connections[using].cursor() as cursor:
+                        cursor.execute(f'DROP TABLE {partitioned_table.quote(name)}')
+                self.stdout.write(f'Archived {name}: {rows} rows to {path}.')
+
+    def open_rows(self, partitioned_table, month, lookup, using):
+        """Whether rows of ``month`` belong to relocation requests still open."""
+        lower, upper = partitioned_table.bounds(month)
+        column = partitioned_table.field.name
+        return partitioned_table.model._default_manager.using(using).filter(**{
+            f'{column}__gte': lower, f'{column}__lt': upper,
+        }).exclude(**{f'{lookup}__status__in': CLOSED_STATUSES}).exists()
+
+    def detach(self, partitioned_table, name, month, lookup, using):
+        """Detach the partition unless rows of open requests are in it, and return whether it was."""
+        with transaction.atomic(using), connections[using].cursor() as cursor:
+            # Writers wait until the partition is detached, so that no row of an open request slips in.
+            cursor.execute(f'LOCK TABLE {partitioned_table.quote(partitioned_table.table)} IN SHARE ROW EXCLUSIVE MODE')
+            if self.open_rows(partitioned_table, month, lookup, using):
+                return False
+            partitioned_table.detach_partition(name, using)
+            statement = ON_DETACH.get(partitioned_table.model._meta.label)
+            if statement:
+                cursor.execute(statement.format(partition=partitioned_table.quote(name)))
+        return True
+
+    def dump(self, table, path, using):
+        """Write the rows of ``table`` to ``path`` as gzipped CSV with a header and return how many."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f'{path.name}.partial')
+        with connections[using].cursor() as cursor:
+            with gzip.open(partial, 'wb') as file:
+                with cursor.copy(f'COPY {connections[using].ops.quote_name(table)} TO STDOUT (FORMAT csv, HEADER)') as copy:
+                    for data in copy:
+                        file.write(data)
+            cursor.execute(f'SELECT count(*) FROM {connections[using].ops.quote_name(table)}')
+            rows, = cursor.fetchone()
+        partial.rename(path)
+        return rows
@@ -0,0 +1,92 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import OperationalError
+
+from relocations.models import RelocationRequest
+from ...db import MODES, connection_settings, pool_exhausted, pool_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the latency and throughput of requests with unpooled, persistent and pooled database '
+        'connections. Threads stand for the threads of a gunicorn worker and run requests back to back, '
+        'each reading a page of relocation requests between the request_started and request_finished '
+        'signals that Django connection handling hooks into.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per mode, over all threads.')
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=['unpooled', 'persistent', 'pooled'])
+        parser.add_argument(
+            '--pool-size', type=int, help='Connections of the pool, by default one per thread. Fewer make '
+            'threads wait for one, and time out after --pool-timeout seconds.',
+        )
+        parser.add_argument('--pool-timeout', type=float, default=5)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        base = deepcopy(connections.settings[options['database']])
+        base['OPTIONS'].pop('pool', None)
+        pool_size = options['pool_size'] or options['threads']
+        self.stdout.write(
+            f"{options['requests']} requests per mode on {options['threads']} threads, "
+            f'pool of {pool_size} connections.'
+        )
+        self.stdout.write(f"{'mode':<12} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'503s':>6}")
+        for mode in options['modes']:
+            alias = f'benchmark_{mode}'
+            mode_settings = connection_settings(mode, pool_size, options['pool_timeout'])
+            connections.settings[alias] = {
+                **base, **mode_settings, 'OPTIONS': {**base['OPTIONS'], **mode_settings.get('OPTIONS', {})},
+            }
+            try:
+                self.run(mode, alias, options['threads'], options['requests'])
+            finally:
+                connections[alias].close_pool()
+                del connections.settings[alias]
+
+    def run(self, mode, alias, threads, requests):
+        if connections[alias].pool:
+            # As a web process would have it, the pool is full when requests come in.
+            connections[alias].pool.open(wait=True)
+        latencies, busy = [], []
+
+        def serve(count):
+            for _ in range(count):
+                start = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                try:
+                    list(RelocationRequest.objects.using(alias).order_by('-date_created')[:20])
+                except OperationalError as e:
+                    if not pool_exhausted(e):
+                        raise
+                    busy.append(1)
+                finally:
+                    request_finished.send(sender=self.__class__)
+                latencies.append(time.perf_counter() - start)
+            connections[alias].close()
+
+        counts = [requests // threads + (n < requests % threads) for n in range(threads)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(serve, counts))
+        elapsed = time.perf_counter() - start
+
+        p50, p95, p99 = (statistics.quantiles(latencies, n=100)[p - 1] * 1000 for p in (50, 95, 99))
+        self.stdout.write(
+            f'{mode:<12} {len(latencies) / elapsed:>9.0f} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f} {len(busy):>6}'
+        )
+        if alias in pool_stats():
+            stats = pool_stats()[alias]
+            self.stdout.write(
+                f"{'':<12} pool: {stats['requests']} checkouts, {stats['requests_queued']} waited "
+                f"{stats['wait_ms']} ms in all, {stats['timeouts']} timed out, "
+                f"{stats['connections_opened']} connections opened"
+            )
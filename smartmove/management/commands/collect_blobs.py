@@ -0,0 +1,29 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from ...storage import collect_garbage
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete the uploaded blobs that no row references any more and report how much space deduplication '
+        'saves. Blobs younger than the grace period are kept, as their rows may not be saved yet.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24)
+        parser.add_argument('--dry-run', action='store_true', help='Report the orphans without deleting them.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        stats = collect_garbage(
+            default_storage, grace=options['grace_hours'] * 3600, dry_run=options['dry_run'], using=options['database'],
+        )
+        mb = 1024 * 1024
+        self.stdout.write(
+            f"{stats['blobs']} blobs ({stats['bytes'] / mb:.1f} MB) with {stats['references']} references; "
+            f"deduplication saves {stats['shared_bytes'] / mb:.1f} MB."
+        )
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(f"{action} {stats['deleted']} orphaned blobs ({stats['deleted_bytes'] / mb:.1f} MB).")
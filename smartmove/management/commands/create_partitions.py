@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from ...partitions import create_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the monthly partitions of the partitioned tables for the coming months, see '
+        'smartmove.partitions. Run it daily from cron: rows of months without a partition go to the default '
+        'one, from which this moves them once their partition is created.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=settings.PARTITION_MONTHS_AHEAD)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        created = create_partitions(options['months_ahead'], options['database'])
+        for model, names in created.items():
+            self.stdout.write(f"{model._meta.label}: created {', '.join(names) if names else 'no partitions'}.")
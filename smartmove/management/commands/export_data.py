@@ -0,0 +1,35 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from ... import exports
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a registered export (e.g. relocations.RelocationRequest) as CSV or JSON Lines from a '
+        'server-side cursor. Memory use stays flat whatever the number of rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='Model label, e.g. logistics.InventoryTransfer.')
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write to; defaults to stdout.')
+        parser.add_argument('--chunk-size', type=int, default=exports.Export.chunk_size)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        try:
+            export = exports.get_export(apps.get_model(options['model']))
+        except (LookupError, ValueError, KeyError):
+            exports.autodiscover()
+            choices = ', '.join(sorted(exports.registry))
+            raise CommandError(f"No export for '{options['model']}'. Choose from: {choices}.")
+        queryset = export.model._default_manager.using(options['database']).order_by('pk')
+        chunks = export.stream(queryset, options['format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from ...admin import admin_facets
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount the values of the admin list filters kept in summary tables, see smartmove.facets. Triggers '
+        'keep them up to date; this is for after writes that fire none, such as TRUNCATE or a restore.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        for facet in admin_facets():
+            facet.rebuild(options['database'])
+            counts = facet.counts(options['database'])
+            self.stdout.write(
+                f'{facet.model._meta.label} {facet.field_path}: {len(counts)} values, {sum(counts.values())} rows.'
+            )
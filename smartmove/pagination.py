@@ -0,0 +1,149 @@
+"""
+Changelist pagination for tables too large to count or OFFSET through.
+
+``EstimatedCountPaginator`` counts exactly up to a limit and falls back to
+Postgres' own estimates beyond it. ``keyset_fields()``, ``seek()`` and the
+cursor helpers let a changelist continue after the last row it showed
+instead of skipping ``OFFSET`` rows to get there.
+"""
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Count at most ``exact_count_limit`` rows and estimate above that, from
+    ``pg_class.reltuples`` for a whole table and from the planner's row
+    estimate for a filtered one. ``estimated`` tells which one ``count`` is.
+    """
+    exact_count_limit = 10000
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimated = False
+
+    @cached_property
+    def count(self):
+        count, self.estimated = count_rows(self.object_list, self.exact_count_limit)
+        return count
+
+
+def count_rows(queryset, exact_count_limit):
+    """
+    Return ``(count, estimated)``: the exact count of ``queryset`` if it has
+    at most ``exact_count_limit`` rows, else Postgres' estimate.
+    """
+    # Selecting only the key keeps annotations such as search ranks out of the count.
+    queryset = queryset.order_by()
+    count = queryset.values('pk')[:exact_count_limit + 1].count()
+    if count <= exact_count_limit:
+        return count, False
+    return max(estimate_count(queryset), count), True
+
+
+def estimate_count(queryset):
+    """Return Postgres' estimate of the number of rows in ``queryset``."""
+    query = queryset.query
+    connection = connections[queryset.db]
+    if not query.where and not query.distinct and not query.combinator:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else 0
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def keyset_fields(queryset):
+    """
+    Return the ordering of ``queryset`` as ``[(field, descending), ...]``, or
+    None if it can't be seeked: every term must be a column of the model and
+    the ordering must be total, i.e. include a unique non-null field.
+    """
+    opts = queryset.model._meta
+    keys = []
+    for term in queryset.query.order_by:
+        if not isinstance(term, str) or term == '?':
+            return None
+        name = term.lstrip('-')
+        if LOOKUP_SEP in name:
+            return None
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        # Ordering by a relation orders by the related model's Meta.ordering.
+        if not field.concrete or (field.is_relation and name != field.attname):
+            return None
+        keys.append((field, term.startswith('-')))
+    if not any(field.unique and not field.null for field, _ in keys):
+        return None
+    return keys
+
+
+def reverse_keys(keys):
+    return [(field, not descending) for field, descending in keys]
+
+
+def encode_cursor(keys, obj):
+    values = [None if getattr(obj, field.attname) is None else field.value_to_string(obj) for field, _ in keys]
+    return urlsafe_base64_encode(json.dumps(values).encode())
+
+
+def decode_cursor(keys, cursor):
+    """Parse a cursor made by ``encode_cursor()``; raise ValueError if it's invalid."""
+    try:
+        values = json.loads(urlsafe_base64_decode(cursor))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError('Cursor does not match the ordering.')
+        return [None if value is None else field.to_python(value) for (field, _), value in zip(keys, values)]
+    except ValidationError as e:
+        raise ValueError(e.messages)
+
+
+def seek(queryset, keys, values, limit):
+    """
+    Return the first ``limit`` rows of ``queryset`` that are ordered after the
+    row whose ``keys`` have ``values``.
+
+    Those rows are a disjunction with one alternative per key (equal on the
+    keys before it, past the cursor on that key). Each alternative is its own
+    LIMITed branch of a UNION so it can walk an index range; a single OR
+    would be checked row by row from the start of the ordering. NULLs sort
+    after other values in ascending order and before them in descending
+    order, as they do in Postgres.
+    """
+    branches, equal = [], Q()
+    for (field, descending), value in zip(keys, values):
+        for condition in _after(field, descending, value):
+            branches.append(queryset.filter(equal, condition).values('pk')[:limit])
+        if value is None:
+            equal &= Q(**{f'{field.attname}__isnull': True})
+        else:
+            equal &= Q(**{field.attname: value})
+    if not branches:
+        return queryset.none()
+    if len(branches) > 1:
+        branches = [branches[0].union(*branches[1:], all=True)]
+    return queryset.filter(pk__in=branches[0])[:limit]
+
+
+def _after(field, descending, value):
+    if value is None:
+        return [Q(**{f'{field.attname}__isnull': False})] if descending else []
+    if descending:
+        return [Q(**{f'{field.attname}__lt': value})]
+    conditions = [Q(**{f'{field.attname}__gt': value})]
+    if field.null:
+        conditions.append(Q(**{f'{field.attname}__isnull': True}))
+    return conditions
@@ -0,0 +1,292 @@
+"""
+Monthly range partitions of append-heavy tables.
+
+The ``PartitionByRange`` migration operation converts a model's table into
+one partitioned by the month of a date or datetime column: a partition per
+month, ``<table>_pYYYYMM``, from that of the oldest row to
+``PARTITION_MONTHS_AHEAD`` months ahead, and ``<table>_default`` for the
+rows of other months, such as expenses entered long after the fact. Queries
+on recent rows then only touch small partitions and their indexes, and old
+months can be taken out whole instead of deleted row by row.
+
+The table's indexes, constraints and triggers are recreated on the
+partitioned table, which passes them on to its partitions. PostgreSQL
+requires the partition column in the primary key, which gets it appended,
+and in unique constraints, which are refused: drop them first.
+
+``create_partitions()`` adds the partitions of coming months, moving their
+rows out of the default partition, and is run by the ``create_partitions``
+command from cron. ``detach_partition()`` makes a partition a table of its
+own, which the ``archive_partitions`` command dumps and drops. Rows later
+written for a month without a partition, archived or before the first one,
+go to the default partition and stay there: nothing archives it.
+"""
+import datetime
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.backends.utils import truncate_name
+from django.db.migrations.operations.base import Operation
+from django.utils import timezone
+
+from .facets import MAX_NAME_LENGTH
+
+BOUND = re.compile(r"FROM \('(\d{4})-(\d{2})-01")
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def current_month():
+    return month_start(timezone.now())
+
+
+class PartitionedTable:
+    def __init__(self, model, field_name):
+        self.model = model
+        self.field = model._meta.get_field(field_name)
+        self.table = model._meta.db_table
+
+    @classmethod
+    def all(cls, using=DEFAULT_DB_ALIAS):
+        """Return the partitioned tables of the installed models."""
+        with connections[using].cursor() as cursor:
+            cursor.execute("""
+                SELECT c.relname, a.attname FROM pg_partitioned_table p
+                JOIN pg_class c ON c.oid = p.partrelid
+                JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+                WHERE c.relnamespace = current_schema()::regnamespace
+            """)
+            columns = dict(cursor.fetchall())
+        return [
+            cls(model, field.name)
+            for model in apps.get_models() if model._meta.db_table in columns
+            for field in model._meta.concrete_fields if field.column == columns[model._meta.db_table]
+        ]
+
+    def partition_name(self, month):
+        return truncate_name(f'{self.table}_p{month:%Y%m}', MAX_NAME_LENGTH)
+
+    @property
+    def default_name(self):
+        return truncate_name(f'{self.table}_default', MAX_NAME_LENGTH)
+
+    def bounds(self, month):
+        """Return the first value of ``month`` and of the next one, in the column's type."""
+        lower, upper = month, add_months(month, 1)
+        if isinstance(self.field, models.DateTimeField):
+            return tuple(
+                datetime.datetime(bound.year, bound.month, 1, tzinfo=datetime.timezone.utc) for bound in (lower, upper)
+            )
+        return lower, upper
+
+    def partitions(self, using=DEFAULT_DB_ALIAS):
+        """Return ``{name: month}`` of the attached partitions in month order, ``None`` that of the default one."""
+        with connections[using].cursor() as cursor:
+            cursor.execute("""
+                SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = %s::regclass
+            """, [self.quote(self.table)])
+            rows = cursor.fetchall()
+        partitions = {}
+        for name, bound in rows:
+            match = BOUND.search(bound)
+            partitions[name] = datetime.date(int(match[1]), int(match[2]), 1) if match else None
+        return dict(sorted(partitions.items(), key=lambda item: (item[1] is None, item[1])))
+
+    def create_partitions(self, start, end, using=DEFAULT_DB_ALIAS):
+        """
+        Create the missing partitions of the months from ``start`` to
+        ``end``, excluded, and return their names. The rows of those months
+        in the default partition are moved to them.
+        """
+        q = self.quote
+        existing = set(self.partitions(using).values())
+        created = []
+        month = month_start(start)
+        while month < end:
+            if month not in existing:
+                name = self.partition_name(month)
+                with transaction.atomic(using), connections[using].cursor() as cursor:
+                    # A partition can't be created while the default one holds its rows, so the
+                    # rows are moved to a table attached as the partition once filled.
+                    cursor.execute(f'CREATE TABLE {q(name)} (LIKE {q(self.table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+                    cursor.execute(f"""
+                        WITH moved AS (
+                            DELETE FROM {q(self.default_name)} WHERE {q(self.field.column)} >= %s AND {q(self.field.column)} < %s
+                            RETURNING *
+                        )
+                        INSERT INTO {q(name)} SELECT * FROM moved
+                    """, self.bounds(month))
+                    cursor.execute(f'ALTER TABLE {q(self.table)} ATTACH PARTITION {q(name)} {self.values_sql(month)}')
+                created.append(name)
+            month = add_months(month, 1)
+        return created
+
+    def detach_partition(self, name, using=DEFAULT_DB_ALIAS):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {self.quote(self.table)} DETACH PARTITION {self.quote(name)}')
+
+    # SQL
+
+    def quote(self, name):
+        return connections[DEFAULT_DB_ALIAS].ops.quote_name(name)
+
+    def values_sql(self, month):
+        lower, upper = self.bounds(month)
+        return f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+
+
+def table_definitions(cursor, table):
+    """
+    Return ``(constraints, indexes, triggers)`` of ``table``: ``(name, type,
+    definition)`` of its constraints, foreign keys last, and the statements
+    creating its other indexes and its triggers.
+    """
+    cursor.execute("""
+        SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'x', 'c', 'f')
+        ORDER BY contype = 'f', conname
+    """, [table])
+    constraints = cursor.fetchall()
+    cursor.execute("""
+        SELECT pg_get_indexdef(indexrelid) FROM pg_index
+        WHERE indrelid = %s::regclass
+        AND indexrelid NOT IN (SELECT conindid FROM pg_constraint WHERE conrelid = %s::regclass)
+    """, [table, table])
+    # Those of a partitioned table are created on it ONLY, the partitions having their own.
+    indexes = [definition.replace(' ON ONLY ', ' ON ', 1) for definition, in cursor.fetchall()]
+    cursor.execute("""
+        SELECT pg_get_triggerdef(oid) FROM pg_trigger
+        WHERE tgrelid = %s::regclass AND NOT tgisinternal AND tgparentid = 0
+    """, [table])
+    triggers = [definition for definition, in cursor.fetchall()]
+    return constraints, indexes, triggers
+
+
+class PartitionByRange(Operation):
+    """
+    Convert the table of ``model_name`` into one partitioned by month of
+    ``field_name``, copying its rows. The table is locked meanwhile.
+    """
+    reversible = True
+
+    def __init__(self, model_name, field_name):
+        self.model_name = model_name
+        self.field_name = field_name
+
+    def deconstruct(self):
+        return self.__class__.__qualname__, [self.model_name, self.field_name], {}
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            self.rebuild(schema_editor, PartitionedTable(model, self.field_name), partitioned=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            self.rebuild(schema_editor, PartitionedTable(model, self.field_name), partitioned=False)
+
+    def rebuild(self, schema_editor, partitioned_table, partitioned):
+        """Recreate the table, partitioned or not, with its rows, constraints, indexes and triggers."""
+        q = schema_editor.quote_name
+        table, column = partitioned_table.table, partitioned_table.field.column
+        pk = partitioned_table.model._meta.pk.column
+        old = truncate_name(f'{table}_old', MAX_NAME_LENGTH)
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {q(table)} IN ACCESS EXCLUSIVE MODE')
+            constraints, indexes, triggers = table_definitions(cursor, q(table))
+            cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [q(table), pk])
+            sequence, = cursor.fetchone()
+            if partitioned:
+                cursor.execute(f'SELECT min({q(column)}) FROM {q(table)}')
+                oldest, = cursor.fetchone()
+
+        statements = [
+            f'ALTER TABLE {q(table)} RENAME TO {q(old)}',
+            f'CREATE TABLE {q(table)} (LIKE {q(old)} INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING GENERATED '
+            f'INCLUDING STORAGE INCLUDING COMMENTS){f" PARTITION BY RANGE ({q(column)})" if partitioned else ""}',
+        ]
+        if partitioned:
+            month = current_month()
+            if oldest is not None:
+                month = min(month, month_start(oldest))
+            end = add_months(current_month(), settings.PARTITION_MONTHS_AHEAD + 1)
+            while month < end:
+                statements.append(
+                    f'CREATE TABLE {q(partitioned_table.partition_name(month))} PARTITION OF {q(table)} '
+                    f'{partitioned_table.values_sql(month)}'
+                )
+                month = add_months(month, 1)
+            statements.append(f'CREATE TABLE {q(partitioned_table.default_name)} PARTITION OF {q(table)} DEFAULT')
+        statements += [
+            f'INSERT INTO {q(table)} SELECT * FROM {q(old)}',
+            # Also drops the partitions when going back.
+            f'DROP TABLE {q(old)}',
+        ]
+        for name, kind, definition in constraints:
+            if kind in 'ux' and partitioned and column not in definition:
+                raise ValueError(
+                    f'{table} has a unique constraint without {column}, {name}, which a partitioned table '
+                    f"can't enforce. Drop it before partitioning."
+                )
+            if kind == 'p':
+                if partitioned:
+                    definition = f'{definition[:-1]}, {column})'
+                else:
+                    definition = definition.replace(f', {column})', ')')
+            statements.append(f'ALTER TABLE {q(table)} ADD CONSTRAINT {q(name)} {definition}')
+        for definition in indexes:
+            if partitioned and definition.startswith('CREATE UNIQUE') and column not in definition:
+                raise ValueError(f"{table} has a unique index without {column}, which a partitioned table can't enforce.")
+            statements.append(definition)
+        statements += triggers
+        statements.append(f'ANALYZE {q(table)}')
+        for statement in statements:
+            schema_editor.execute(statement)
+        if sequence is not None:
+            # The new table has an identity sequence of its own, which takes over the old one's name.
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT pg_get_serial_sequence(%s, %s), coalesce(max({q(pk)}), 0) + 1 FROM {q(table)}',
+                    [q(table), pk],
+                )
+                new_sequence, next_value = cursor.fetchone()
+            schema_editor.execute('SELECT setval(%s, %s, false)', [new_sequence, next_value])
+            if new_sequence != sequence:
+                schema_editor.execute(f"ALTER SEQUENCE {new_sequence} RENAME TO {sequence.rsplit('.', 1)[-1]}")
+
+    def describe(self):
+        return f'Partition {self.model_name} by month of {self.field_name}'
+
+    @property
+    def migration_name_fragment(self):
+        return f'partition_{self.model_name.lower()}'
+
+
+def create_partitions(months_ahead=None, using=DEFAULT_DB_ALIAS):
+    """
+    Create the partitions of every partitioned table up to ``months_ahead``
+    months ahead, ``PARTITION_MONTHS_AHEAD`` by default, and return
+    ``{model: names}`` of those created.
+    """
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+    end = add_months(current_month(), months_ahead + 1)
+    return {
+        partitioned_table.model: partitioned_table.create_partitions(current_month(), end, using)
+        for partitioned_table in PartitionedTable.all(using)
+    }
@@ -0,0 +1,25 @@
+"""
+Range constructors for expressions, constraints and indexes.
+
+Postgres only uses an expression index when a query repeats the indexed
+expression exactly, so models and the queries against them build ranges
+with these functions rather than spelling the SQL out.
+"""
+from django.contrib.postgres.fields import BigIntegerRangeField, DateTimeRangeField
+from django.db.models import Func
+
+
+class TsTzRange(Func):
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+class Int8Range(Func):
+    """
+    ``int8range``, for ``bigint`` keys. The range ``[x, x]`` of a key stands
+    in for the key itself in a GiST exclusion constraint: two such ranges
+    overlap exactly when the keys are equal, and range types need no
+    ``btree_gist`` extension.
+    """
+    function = 'INT8RANGE'
+    output_field = BigIntegerRangeField()
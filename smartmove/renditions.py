@@ -0,0 +1,189 @@
+"""
+Downsized renditions of uploaded images.
+
+Uploads are phone camera originals of several megabytes. A ``Renditions``
+declares the smaller copies of an image field that pages show instead, such
+as a thumbnail and a medium size. They are rendered with Pillow on a process
+pool, without EXIF metadata, and saved next to the original through the
+field's storage, under the SHA-256 of their content (see
+``smartmove.storage``). Their names are kept in the model's ``renditions``
+JSON field, and a photo uploaded again reuses those of the row that has it.
+With ``recompress`` the original itself is also replaced by a recompressed
+copy, for images such as receipts whose full resolution is of no use.
+
+Apps declare their renditions in a ``renditions`` module with
+``register()``; they are picked up by ``autodiscover()``.
+"""
+import io
+import multiprocessing
+import os
+import posixpath
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils.module_loading import autodiscover_modules
+from PIL import Image, ImageOps, features
+
+FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+registry = {}
+
+
+def workers():
+    return getattr(settings, 'RENDITION_WORKERS', None) or os.cpu_count() or 1
+
+
+@lru_cache(maxsize=None)
+def pool():
+    # A fork server, as forking the web process would copy its threads and connections.
+    return ProcessPoolExecutor(max_workers=workers(), mp_context=multiprocessing.get_context('forkserver'))
+
+
+def render(data, sizes):
+    """
+    Return the image ``data`` resized to each of ``sizes``, ``(name, longest
+    side, format, quality)`` tuples, as ``{name: bytes}``. The image is
+    turned upright and its metadata dropped, except for the color profile.
+    """
+    image = Image.open(io.BytesIO(data))
+    # JPEG can decode straight to a fraction of its size, much faster.
+    image.draft('RGB', (max(size for _, size, _, _ in sizes),) * 2)
+    image = ImageOps.exif_transpose(image)
+    icc_profile = image.info.get('icc_profile')
+    renditions = {}
+    for name, size, format, quality in sorted(sizes, key=lambda size: -size[1]):
+        if format == 'JPEG' or not ('A' in image.getbands() or 'transparency' in image.info):
+            mode = 'RGB'
+        else:
+            mode = 'RGBA'
+        if image.mode != mode:
+            image = image.convert(mode)
+        # Each size is made from the previous one, the next larger.
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format, quality=quality, icc_profile=icc_profile)
+        renditions[name] = output.getvalue()
+    return renditions
+
+
+class Renditions:
+    """
+    ``sizes`` maps rendition names to the longest side of the image in
+    pixels. ``recompress`` is the longest side the original is cut down to,
+    if it's to be replaced.
+    """
+    format = FORMAT
+    quality = 80
+    recompress_quality = 85
+
+    def __init__(self, model, field_name, sizes, recompress=None):
+        self.model = model
+        self.field_name = field_name
+        self.sizes = sizes
+        self.recompress = recompress
+
+    def missing(self, obj):
+        """Return the renditions ``obj`` lacks, None standing for the recompressed original."""
+        missing = [name for name in self.sizes if name not in obj.renditions]
+        # An image that has renditions was recompressed already.
+        if self.recompress and not obj.renditions:
+            missing.append(None)
+        return missing
+
+    def jobs(self, missing):
+        return [
+            (name, self.recompress, 'JPEG', self.recompress_quality) if name is None
+            else (name, self.sizes[name], self.format, self.quality)
+            for name in missing
+        ]
+
+    def create(self, objects, window=None):
+        """
+        Render and store the renditions ``objects`` lack, saving them all in
+        one query, and return the number of objects updated. Objects without
+        renditions are taken to hold a new upload, to be recompressed if
+        need be, and reuse the renditions of another row with the same
+        file. At most ``window`` originals, by default twice the pool's
+        size, are held in memory at once.
+        """
+        objects = list(objects)
+        if not objects:
+            return 0
+        manager = self.model._default_manager.db_manager(objects[0]._state.db)
+        known = {}
+        # A recompressed row no longer has the file it was uploaded with.
+        if not self.recompress:
+            uploads = [getattr(obj, self.field_name).name for obj in objects if not obj.renditions]
+            known = dict(manager.filter(**{f'{self.field_name}__in': uploads}).exclude(
+                renditions={},
+            ).values_list(self.field_name, 'renditions'))
+        window = window or 2 * workers()
+        updated, running = [], {}
+
+        def finish(futures):
+            for future in futures:
+                obj = running.pop(future)
+                self.store(obj, future.result())
+                updated.append(obj)
+
+        for obj in objects:
+            file = getattr(obj, self.field_name)
+            if not file:
+                # The image was cleared.
+                obj.renditions = {}
+                updated.append(obj)
+                continue
+            if not obj.renditions and file.name in known:
+                obj.renditions = known[file.name]
+            missing = self.missing(obj)
+            if not missing:
+                updated.append(obj)
+                continue
+            if len(running) >= window:
+                finish(wait(running, return_when=FIRST_COMPLETED).done)
+            with file.open('rb'):
+                running[pool().submit(render, file.read(), self.jobs(missing))] = obj
+        finish(list(running))
+        if updated:
+            manager.bulk_update(updated, ['renditions', self.field_name] if self.recompress else ['renditions'])
+        return len(updated)
+
+    def store(self, obj, rendered):
+        file = getattr(obj, self.field_name)
+        field = file.field
+        stem = posixpath.splitext(posixpath.basename(file.name))[0]
+        renditions = dict(obj.renditions)
+        for name, data in rendered.items():
+            if name is None:
+                filename = f'{stem}.jpg'
+            else:
+                filename = f'{stem}_{name}.{EXTENSIONS[self.format]}'
+            path = file.storage.save(field.generate_filename(obj, filename), ContentFile(data))
+            if name is None:
+                # The upload is left for collect_garbage(), other rows may share it.
+                file.name = path
+            else:
+                renditions[name] = path
+        obj.renditions = renditions
+
+    def url(self, obj, name):
+        path = obj.renditions.get(name)
+        return getattr(obj, self.field_name).storage.url(path) if path else None
+
+
+def register(renditions):
+    registry[renditions.model._meta.label_lower] = renditions
+    return renditions
+
+
+def get_renditions(model):
+    autodiscover()
+    return registry.get(model._meta.label_lower)
+
+
+def autodiscover():
+    autodiscover_modules('renditions')
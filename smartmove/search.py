@@ -0,0 +1,51 @@
+"""
+Full-text search helpers.
+
+Each searchable model declares its search document once, as a GIN expression
+index built with ``document()`` in ``Meta.indexes``. Queries rebuild the exact
+same expression via ``model_document()`` so Postgres can answer them from that
+index instead of scanning with ``UPPER(...) LIKE '%x%'``.
+"""
+import re
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchVector
+
+# The 'simple' configuration lowercases without stemming or stop words, so IDs,
+# names and addresses are indexed exactly as typed.
+SEARCH_CONFIG = 'simple'
+
+_TSQUERY_SYNTAX = re.compile(r"[&|!():*<>'\\]")
+
+
+def document(*fields):
+    return SearchVector(*fields, config=SEARCH_CONFIG)
+
+
+def search_index(name, *fields):
+    return GinIndex(document(*fields), name=name)
+
+
+def model_document(model):
+    """Return the search document indexed for ``model``, or None."""
+    for index in model._meta.indexes:
+        if isinstance(index, GinIndex) and index.expressions and isinstance(index.expressions[0], SearchVector):
+            return index.expressions[0]
+    return None
+
+
+def prefix_query(term):
+    """
+    Build a query matching every word of ``term`` as a prefix, so partially
+    typed names and IDs match as the user types. Returns None if ``term`` has
+    nothing searchable left once tsquery operators are stripped.
+    """
+    words = _TSQUERY_SYNTAX.sub(' ', term).split()
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f'{word}:*' for word in words), config=SEARCH_CONFIG, search_type='raw')
+
+
+def exact_query(term):
+    """Build a query matching the words of ``term`` as whole words."""
+    return SearchQuery(term, config=SEARCH_CONFIG)
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
+from smartmove.db import connection_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -27,6 +29,19 @@ DEBUG = True
 
 ALLOWED_HOSTS = ["*"]
 
+# Addresses allowed to read the metrics endpoints without logging in.
+INTERNAL_IPS = ['127.0.0.1', '::1']
+
+# Requests over any of these are logged with their repeated queries, see smartmove.instrumentation.
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 1))
+SLOW_REQUEST_DB_SECONDS = float(os.environ.get('SLOW_REQUEST_DB_SECONDS', 0.5))
+SLOW_REQUEST_QUERIES = int(os.environ.get('SLOW_REQUEST_QUERIES', 50))
+# Executions of a query beyond the first, summed over the queries of the request.
+SLOW_REQUEST_REPEATED_QUERIES = int(os.environ.get('SLOW_REQUEST_REPEATED_QUERIES', 10))
+# A directory where each process saves its request metrics, for the one scraped to serve those of all.
+# Set by gunicorn.conf.py; without it, the metrics are those of the process scraped.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+
 
 # Application definition
 
@@ -37,7 +52,10 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
+    # Shared infrastructure: caches, facets, partitions, storage and their commands
+    'smartmove',
     # Custom apps for property relocation
     'clients',
     'properties',
@@ -46,6 +64,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'smartmove.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +72,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'smartmove.db.PoolExhaustedMiddleware',
 ]
 
 ROOT_URLCONF = 'smartmove.urls'
@@ -60,7 +80,7 @@ ROOT_URLCONF = 'smartmove.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'smartmove' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -84,6 +104,7 @@ os.environ.setdefault("PGPASSWORD", "")
 os.environ.setdefault("PGHOST", "localhost")
 os.environ.setdefault("PGPORT", "5432")
 
+# PostgreSQL 16 or later, see smartmove.checks.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -95,6 +116,48 @@ DATABASES = {
     }
 }
 
+# How web processes get connections: 'pooled', 'persistent' or 'unpooled', see smartmove.db.
+DB_CONNECTIONS = os.environ.get('DB_CONNECTIONS', 'pooled')
+# A connection per thread of the process, see gunicorn.conf.py. Under ASGI, where requests don't
+# take a thread each, it is the number of requests of a process that can query at once.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', os.environ.get('GUNICORN_THREADS', 1)))
+# Seconds a request waits for a pooled connection before getting a 503.
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))
+
+DATABASES['default'].update(connection_settings(DB_CONNECTIONS, DB_POOL_SIZE, DB_POOL_TIMEOUT))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Local memory is private to each process; a directory in CACHE_DIR is shared by those of the host,
+# but each write to it lists the directory, so it suits caches of a few thousand entries.
+CACHE_DIR = os.environ.get('CACHE_DIR')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    } if CACHE_DIR else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+# Seconds instances stay in the object caches, see smartmove.cache: how long a process may read
+# rows saved by another one before seeing the change, with a cache private to each process.
+OBJECT_CACHE_TIMEOUT = int(os.environ.get('OBJECT_CACHE_TIMEOUT', 60))
+
+
+# Partitions
+# Append-heavy tables are partitioned by month, see smartmove.partitions.
+
+# Months of partitions kept ahead of the current one by the create_partitions command.
+PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', 3))
+# Where the archive_partitions command writes the partitions it takes out of the database.
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', BASE_DIR / 'archive')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -132,6 +195,21 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+STORAGES = {
+    # Uploads are stored once per content, see smartmove.storage.
+    'default': {
+        'BACKEND': 'smartmove.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,153 @@
+"""
+Content-addressed file storage.
+
+``ContentAddressedStorage`` names every file it saves after the SHA-256 of
+its content, in the directory the field's ``upload_to`` gives, so a file
+uploaded again is stored once: the upload is hashed as it streams in and,
+when the blob already exists, nothing is written at all. Rows share blobs
+and deleting a row leaves its blob in place; ``reference_counts()`` counts
+the rows referencing each blob across all models and
+``collect_garbage()`` deletes the blobs none reference.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+import time
+
+from django.apps import apps
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import FileField
+
+# <upload_to>/<first two hex digits>/<SHA-256>[.<extension>]
+BLOB = re.compile(r'(?:.+/)?([0-9a-f]{2})/\1[0-9a-f]{62}(?:\.[a-z0-9]{1,8})?$')
+
+_EXTENSION = re.compile(r'\.[a-z0-9]{1,8}$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        name = blob_name(name, digest.hexdigest())
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(f'Storage can not find an available filename for "{name}".')
+        path = self.path(name)
+        try:
+            # Touched, so that collect_garbage() spares it until the row referencing it is saved.
+            os.utime(path)
+        except FileNotFoundError:
+            self._save(name, content)
+        return name
+
+    def _save(self, name, content):
+        path = self.path(name)
+        if self.directory_permissions_mode is not None:
+            # os.makedirs() only applies its mode to the last directory.
+            umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(os.path.dirname(path), self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(umask)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so that a concurrent upload of the same file never sees it half written.
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix='.upload-', delete=False) as temporary:
+            try:
+                for chunk in content.chunks():
+                    temporary.write(chunk)
+            except BaseException:
+                os.unlink(temporary.name)
+                raise
+        os.chmod(temporary.name, self.file_permissions_mode or 0o644)
+        os.replace(temporary.name, path)
+        return name
+
+
+def blob_name(name, digest):
+    extension = os.path.splitext(name)[1].lower()
+    directory = posixpath.dirname(name)
+    return posixpath.join(directory, digest[:2], digest + (extension if _EXTENSION.match(extension) else ''))
+
+
+def reference_sources():
+    """Return ``(model, column)`` pairs for each file field on a content-addressed storage."""
+    return [
+        (model, field.column)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def reference_counts(using=DEFAULT_DB_ALIAS):
+    """
+    Return the number of references to each blob: from the file fields on a
+    content-addressed storage and from the renditions of their images, in
+    one query.
+    """
+    from .renditions import autodiscover, registry
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    selects = [
+        f'SELECT {quote(column)} AS name FROM {quote(model._meta.db_table)}' for model, column in reference_sources()
+    ]
+    autodiscover()
+    selects += [
+        f'SELECT r.value FROM {quote(renditions.model._meta.db_table)} t, jsonb_each_text(t.renditions) r'
+        for renditions in registry.values()
+    ]
+    if not selects:
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT name, count(*) FROM ({' UNION ALL '.join(selects)}) refs WHERE name <> '' GROUP BY name",
+        )
+        return dict(cursor.fetchall())
+
+
+def blobs(storage):
+    """Yield the name, size and modification time of each blob in ``storage``."""
+    for directory, _, files in os.walk(storage.location):
+        for file in files:
+            name = os.path.relpath(os.path.join(directory, file), storage.location).replace(os.sep, '/')
+            if BLOB.match(name):
+                stat = os.stat(os.path.join(directory, file))
+                yield name, stat.st_size, stat.st_mtime
+
+
+def collect_garbage(storage, grace=24 * 3600, dry_run=False, using=DEFAULT_DB_ALIAS):
+    """
+    Delete the blobs of ``storage`` no row references that are older than
+    ``grace`` seconds, a blob being saved before the row referencing it.
+    Return ``{'blobs', 'bytes', 'references', 'shared_bytes', 'deleted',
+    'deleted_bytes'}``, where ``shared_bytes`` is what deduplication saves.
+    """
+    counts = reference_counts(using)
+    stats = dict.fromkeys(['blobs', 'bytes', 'references', 'shared_bytes', 'deleted', 'deleted_bytes'], 0)
+    cutoff = time.time() - grace
+    for name, size, modified in blobs(storage):
+        count = counts.get(name, 0)
+        if count or modified > cutoff:
+            stats['blobs'] += 1
+            stats['bytes'] += size
+            stats['references'] += count
+            stats['shared_bytes'] += max(count - 1, 0) * size
+            continue
+        if not dry_run:
+            storage.delete(name)
+        stats['deleted'] += 1
+        stats['deleted_bytes'] += size
+    return stats
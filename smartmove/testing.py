@@ -0,0 +1,264 @@
+"""
+Test helpers shared by the smartmove apps: model factories, an admin query
+budget harness and a changelist pagination walker.
+"""
+import itertools
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+_sequence = itertools.count(1)
+
+
+def _next():
+    return next(_sequence)
+
+
+def make_user(**kwargs):
+    n = _next()
+    kwargs.setdefault('username', f'user{n}')
+    kwargs.setdefault('first_name', f'First{n}')
+    kwargs.setdefault('last_name', f'Last{n}')
+    return User.objects.create(**kwargs)
+
+
+def make_client(**kwargs):
+    from clients.models import Client
+    n = _next()
+    kwargs.setdefault('client_id', f'CL{n:06d}')
+    kwargs.setdefault('first_name', f'Client{n}')
+    kwargs.setdefault('last_name', 'Example')
+    kwargs.setdefault('email', f'client{n}@example.com')
+    kwargs.setdefault('address', f'{n} Main Street')
+    kwargs.setdefault('city', 'Springfield')
+    kwargs.setdefault('state', 'IL')
+    kwargs.setdefault('zip_code', '62701')
+    return Client.objects.create(**kwargs)
+
+
+def make_client_document(**kwargs):
+    from clients.models import ClientDocument
+    if 'client' not in kwargs:
+        kwargs['client'] = make_client()
+    kwargs.setdefault('document_type', 'lease')
+    kwargs.setdefault('document_name', f'Lease {_next()}')
+    kwargs.setdefault('document_file', 'client_documents/lease.pdf')
+    return ClientDocument.objects.create(**kwargs)
+
+
+def make_property(**kwargs):
+    from properties.models import Property
+    n = _next()
+    if 'owner' not in kwargs:
+        kwargs['owner'] = make_client()
+    kwargs.setdefault('property_id', f'PR{n:06d}')
+    kwargs.setdefault('property_type', 'house')
+    kwargs.setdefault('address', f'{n} Elm Street')
+    kwargs.setdefault('city', 'Springfield')
+    kwargs.setdefault('state', 'IL')
+    kwargs.setdefault('zip_code', '62701')
+    return Property.objects.create(**kwargs)
+
+
+def make_property_image(**kwargs):
+    from properties.models import PropertyImage
+    if 'property' not in kwargs:
+        kwargs['property'] = make_property()
+    kwargs.setdefault('image', 'property_images/photo.jpg')
+    return PropertyImage.objects.create(**kwargs)
+
+
+def make_inventory_item(**kwargs):
+    from properties.models import PropertyInventory
+    if 'property' not in kwargs:
+        kwargs['property'] = make_property()
+    kwargs.setdefault('room', 'Living Room')
+    kwargs.setdefault('item_name', f'Item {_next()}')
+    return PropertyInventory.objects.create(**kwargs)
+
+
+def make_relocation_request(**kwargs):
+    from relocations.models import RelocationRequest
+    n = _next()
+    if 'client' not in kwargs:
+        kwargs['client'] = make_client()
+    if 'origin_property' not in kwargs:
+        kwargs['origin_property'] = make_property(owner=kwargs['client'])
+    kwargs.setdefault('request_id', f'RR{n:06d}')
+    kwargs.setdefault('preferred_date', date.today() + timedelta(days=30))
+    return RelocationRequest.objects.create(**kwargs)
+
+
+def make_quote(**kwargs):
+    from relocations.models import RelocationQuote
+    n = _next()
+    if 'relocation_request' not in kwargs:
+        kwargs['relocation_request'] = make_relocation_request()
+    kwargs.setdefault('quote_number', f'Q{n:06d}')
+    kwargs.setdefault('base_cost', Decimal('1000.00'))
+    kwargs.setdefault('valid_until', date.today() + timedelta(days=14))
+    kwargs.setdefault('terms_and_conditions', 'Standard terms.')
+    return RelocationQuote.objects.create(**kwargs)
+
+
+def make_timeline_entry(**kwargs):
+    from relocations.models import RelocationTimeline
+    if 'relocation_request' not in kwargs:
+        kwargs['relocation_request'] = make_relocation_request()
+    kwargs.setdefault('milestone_type', 'quote_sent')
+    kwargs.setdefault('description', 'Quote sent to client')
+    return RelocationTimeline.objects.create(**kwargs)
+
+
+def make_vehicle(**kwargs):
+    from logistics.models import Vehicle
+    n = _next()
+    kwargs.setdefault('vehicle_id', f'VH{n:06d}')
+    kwargs.setdefault('vehicle_type', 'truck_medium')
+    kwargs.setdefault('make', 'Isuzu')
+    kwargs.setdefault('model', 'NPR')
+    kwargs.setdefault('year', 2020)
+    kwargs.setdefault('license_plate', f'PLT{n:06d}')
+    kwargs.setdefault('max_weight_kg', 4000)
+    kwargs.setdefault('max_volume_cubic_meters', Decimal('20.00'))
+    kwargs.setdefault('insurance_expiry', date.today() + timedelta(days=365))
+    kwargs.setdefault('registration_expiry', date.today() + timedelta(days=365))
+    return Vehicle.objects.create(**kwargs)
+
+
+def make_driver(**kwargs):
+    from logistics.models import Driver
+    n = _next()
+    if 'user' not in kwargs:
+        kwargs['user'] = make_user()
+    kwargs.setdefault('driver_id', f'DR{n:06d}')
+    kwargs.setdefault('phone', '+15555550100')
+    kwargs.setdefault('emergency_contact_name', 'Contact')
+    kwargs.setdefault('emergency_contact_phone', '+15555550101')
+    kwargs.setdefault('license_number', f'LIC{n:06d}')
+    kwargs.setdefault('license_expiry', date.today() + timedelta(days=365))
+    kwargs.setdefault('hire_date', date.today() - timedelta(days=365))
+    kwargs.setdefault('hourly_rate', Decimal('25.00'))
+    return Driver.objects.create(**kwargs)
+
+
+def make_crew(**kwargs):
+    from logistics.models import MovingCrew
+    n = _next()
+    if 'crew_leader' not in kwargs:
+        kwargs['crew_leader'] = make_driver()
+    kwargs.setdefault('crew_id', f'CR{n:06d}')
+    kwargs.setdefault('max_capacity_kg', 4000)
+    return MovingCrew.objects.create(**kwargs)
+
+
+def make_assignment(**kwargs):
+    from logistics.models import MovingAssignment
+    if 'relocation_request' not in kwargs:
+        kwargs['relocation_request'] = make_relocation_request()
+    if 'crew' not in kwargs:
+        kwargs['crew'] = make_crew()
+    start = timezone.now() + timedelta(days=30)
+    kwargs.setdefault('scheduled_start_date', start)
+    kwargs.setdefault('scheduled_end_date', start + timedelta(hours=8))
+    return MovingAssignment.objects.create(**kwargs)
+
+
+def make_transfer(**kwargs):
+    from logistics.models import InventoryTransfer
+    if 'assignment' not in kwargs:
+        kwargs['assignment'] = make_assignment()
+    kwargs.setdefault('item_name', f'Item {_next()}')
+    kwargs.setdefault('room_from', 'Living Room')
+    return InventoryTransfer.objects.create(**kwargs)
+
+
+def make_expense(**kwargs):
+    from logistics.models import MovingExpense
+    if 'assignment' not in kwargs:
+        kwargs['assignment'] = make_assignment()
+    if 'submitted_by' not in kwargs:
+        kwargs['submitted_by'] = make_driver()
+    kwargs.setdefault('expense_type', 'fuel')
+    kwargs.setdefault('amount', Decimal('80.00'))
+    kwargs.setdefault('description', 'Diesel')
+    kwargs.setdefault('date_incurred', date.today())
+    return MovingExpense.objects.create(**kwargs)
+
+
+class AdminLoginMixin:
+    def setUp(self):
+        super().setUp()
+        self.admin_user = User.objects.create_superuser('budget-admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin_user)
+
+
+class AdminQueryBudgetMixin(AdminLoginMixin):
+    """
+    Assert that admin pages run a fixed number of queries.
+
+    Each check renders the page, adds more rows, renders it again and fails
+    if the query count changed or exceeds ``budget``. The page is rendered
+    once beforehand so per-process caches (content types, permissions) don't
+    count against the first measurement.
+    """
+    extra_rows = 5
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), ctx.captured_queries
+
+    def assertQueriesFixed(self, url, budget, make_row):
+        make_row()
+        self.count_queries(url)
+        baseline, _ = self.count_queries(url)
+        for _ in range(self.extra_rows):
+            make_row()
+        count, queries = self.count_queries(url)
+        sql = '\n'.join(query['sql'] for query in queries)
+        self.assertEqual(count, baseline, f'{url} grew from {baseline} to {count} queries:\n{sql}')
+        self.assertLessEqual(count, budget, f'{url} ran {count} queries, budget is {budget}:\n{sql}')
+
+    def assertChangelistWithinBudget(self, model, budget, make_row):
+        opts = model._meta
+        url = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+        self.assertQueriesFixed(url, budget, make_row)
+
+    def assertChangeFormWithinBudget(self, obj, budget, make_row):
+        opts = obj._meta
+        url = reverse(f'admin:{opts.app_label}_{opts.model_name}_change', args=[obj.pk])
+        self.assertQueriesFixed(url, budget, make_row)
+
+
+class KeysetPaginationMixin(AdminLoginMixin):
+    """
+    Walk a changelist page by page with its next links, then back with its
+    previous links, and compare the rows seen with ``expected``.
+    """
+    per_page = 3
+
+    def assertKeysetPagination(self, model, expected):
+        opts = model._meta
+        url = reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist')
+        with mock.patch.object(admin.site._registry[model], 'list_per_page', self.per_page):
+            cl = self.client.get(url).context['cl']
+            pages = [[obj.pk for obj in cl.result_list]]
+            while cl.next_page_url:
+                self.assertIn('after=', cl.next_page_url)
+                cl = self.client.get(url + cl.next_page_url).context['cl']
+                pages.append([obj.pk for obj in cl.result_list])
+            self.assertEqual([pk for page in pages for pk in page], list(expected))
+            back = []
+            while cl.previous_page_url:
+                cl = self.client.get(url + cl.previous_page_url).context['cl']
+                back.insert(0, [obj.pk for obj in cl.result_list])
+            self.assertEqual(back, pages[:-1])
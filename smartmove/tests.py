@@ -0,0 +1,565 @@
+import csv
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.utils import OperationalError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+from psycopg_pool import PoolTimeout
+
+from clients.models import Client, ClientDocument
+from logistics.models import InventoryTransfer, MovingExpense
+from properties.models import PropertyInventory
+from relocations.models import RelocationRequest, RelocationTimeline
+from .cache import get_object_cache, rows_changed
+from .checks import check_postgresql_version
+from .db import connection_settings, pool_stats
+from .facets import Facet
+from .instrumentation import (
+    InstrumentationMiddleware, RequestMetrics, RequestStats, fingerprint, instrument, request_metrics,
+)
+from .loadtest import load
+from .partitions import PartitionedTable, add_months, current_month
+from .storage import ContentAddressedStorage, collect_garbage, reference_counts
+from .testing import (
+    AdminLoginMixin, make_assignment, make_client, make_client_document, make_expense, make_inventory_item,
+    make_property, make_relocation_request, make_timeline_entry, make_transfer, make_user,
+)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def upload(self, content, name='lease.pdf', **kwargs):
+        document = make_client_document(document_file=SimpleUploadedFile(name, content), **kwargs)
+        return document.document_file.name
+
+    def test_identical_uploads_are_stored_once(self):
+        client = make_client()
+        lease = b'%PDF-1.7 lease' * 1000
+        digest = hashlib.sha256(lease).hexdigest()
+        name = self.upload(lease, client=client)
+        self.assertEqual(name, f'client_documents/{digest[:2]}/{digest}.pdf')
+        with mock.patch.object(ContentAddressedStorage, '_save') as save:
+            self.assertEqual(self.upload(lease, 'Lease (1).PDF'), name)
+            self.assertEqual(self.upload(lease, 'copy.pdf', client=client), name)
+        save.assert_not_called()
+        other = self.upload(b'%PDF-1.7 insurance', 'insurance.pdf')
+        self.assertNotEqual(other, name)
+        with default_storage.open(name) as file:
+            self.assertEqual(file.read(), lease)
+        self.assertEqual(reference_counts(), {name: 3, other: 1})
+
+    def test_garbage_collection(self):
+        kept = self.upload(b'kept')
+        ClientDocument.objects.get(document_file=self.upload(b'deleted')).delete()
+        deleted = hashlib.sha256(b'deleted').hexdigest()
+        recent = self.upload(b'recent')
+        ClientDocument.objects.filter(document_file=recent).delete()
+        # A file that isn't a blob, e.g. uploaded before blobs, is never collected.
+        legacy = FileSystemStorage(default_storage.location).save('client_documents/old.pdf', ContentFile(b'old'))
+        past = time.time() - 2 * 3600
+        for name in [kept, f'client_documents/{deleted[:2]}/{deleted}.pdf', legacy]:
+            os.utime(default_storage.path(name), (past, past))
+
+        stats = collect_garbage(default_storage, grace=3600, dry_run=True)
+        self.assertEqual((stats['blobs'], stats['references'], stats['deleted']), (2, 1, 1))
+        self.assertTrue(default_storage.exists(f'client_documents/{deleted[:2]}/{deleted}.pdf'))
+        out = io.StringIO()
+        call_command('collect_blobs', grace_hours=1, stdout=out)
+        self.assertIn('Deleted 1 orphaned blobs', out.getvalue())
+        self.assertFalse(default_storage.exists(f'client_documents/{deleted[:2]}/{deleted}.pdf'))
+        for name in [kept, recent, legacy]:
+            self.assertTrue(default_storage.exists(name))
+
+
+class ConnectionPoolTests(TestCase):
+    def test_connection_settings(self):
+        pooled = connection_settings('pooled', pool_size=4, pool_timeout=2)
+        self.assertEqual(pooled['CONN_MAX_AGE'], 0)
+        self.assertEqual(pooled['OPTIONS']['pool'], {'min_size': 4, 'max_size': 4, 'timeout': 2})
+        self.assertNotIn('CONN_HEALTH_CHECKS', pooled)
+        self.assertTrue(connection_settings('persistent')['CONN_MAX_AGE'])
+        self.assertEqual(connection_settings('unpooled'), {'CONN_MAX_AGE': 0})
+        with self.assertRaises(ValueError):
+            connection_settings('pgbouncer')
+
+    @skipUnless(settings.DB_CONNECTIONS == 'pooled', 'Connections are not pooled.')
+    def test_pool_metrics(self):
+        Client.objects.exists()
+        stats = pool_stats()['default']
+        # The test's transaction holds a connection.
+        self.assertGreaterEqual(stats['checked_out'], 1)
+        self.assertEqual(stats['max_size'], settings.DB_POOL_SIZE)
+        response = self.client.get(reverse('database-pool-metrics'))
+        self.assertEqual(response.json()['default']['max_size'], settings.DB_POOL_SIZE)
+        response = self.client.get(reverse('database-pool-metrics'), REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(response.status_code, 403)
+
+    def test_pool_exhaustion_is_a_503(self):
+        def exhausted():
+            try:
+                raise PoolTimeout("couldn't get a connection after 5.00 sec")
+            except PoolTimeout as e:
+                raise OperationalError(*e.args) from e
+
+        with mock.patch('smartmove.views.pool_stats', side_effect=exhausted), self.assertLogs('smartmove.db'):
+            response = self.client.get(reverse('database-pool-metrics'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class ObjectCacheTests(TransactionTestCase):
+    # Rows read inside a transaction are not cached.
+
+    def setUp(self):
+        cache.clear()
+        self.object_cache = get_object_cache(RelocationRequest)
+
+    def stats_delta(self, before):
+        return {name: count - before[name] for name, count in self.object_cache.stats().items()}
+
+    def test_hits_and_misses(self):
+        relocation = make_relocation_request()
+        before = self.object_cache.stats()
+        # The pk, then the row by pk, whose version is read in between.
+        with self.assertNumQueries(2):
+            cached = self.object_cache.get(request_id=relocation.request_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.object_cache.get(relocation.pk), cached)
+            self.assertEqual(self.object_cache.get(request_id=relocation.request_id).client, relocation.client)
+        self.assertEqual(self.stats_delta(before), {'hits': 2, 'misses': 1, 'waits': 0, 'invalidations': 0})
+        with self.assertRaises(RelocationRequest.DoesNotExist):
+            self.object_cache.get(request_id='RR-NONE')
+        with self.assertRaises(TypeError):
+            self.object_cache.get(client_id=relocation.client.client_id)
+        response = self.client.get(reverse('object-cache-metrics'))
+        self.assertEqual(response.json()['relocations.relocationrequest'], self.object_cache.stats())
+
+    def test_invalidation(self):
+        relocation = make_relocation_request()
+        self.object_cache.get(request_id=relocation.request_id)
+        relocation.status = 'approved'
+        relocation.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.object_cache.get(relocation.pk).status, 'approved')
+        # Saving the client changes the requests cached with it.
+        relocation.client.first_name = 'Renamed'
+        relocation.client.save()
+        self.assertIn('Renamed', str(self.object_cache.get(relocation.pk)))
+        # So do bulk writes that say so.
+        RelocationRequest.objects.filter(pk=relocation.pk).update(status='scheduled')
+        self.assertEqual(self.object_cache.get(relocation.pk).status, 'approved')
+        rows_changed(RelocationRequest, [relocation.pk])
+        self.assertEqual(self.object_cache.get(relocation.pk).status, 'scheduled')
+        # Timeline entries move the current milestone the requests are cached with.
+        make_timeline_entry(relocation_request=relocation, is_completed=True)
+        self.assertEqual(self.object_cache.get(relocation.pk).current_milestone, 'quote_sent')
+        # The natural key a row had is no longer found.
+        old_request_id = relocation.request_id
+        relocation.request_id = 'RR-RENAMED'
+        relocation.save()
+        with self.assertRaises(RelocationRequest.DoesNotExist):
+            self.object_cache.get(request_id=old_request_id)
+        self.assertEqual(self.object_cache.get(request_id='RR-RENAMED').pk, relocation.pk)
+        pk = relocation.pk
+        relocation.delete()
+        with self.assertRaises(RelocationRequest.DoesNotExist):
+            self.object_cache.get(pk)
+
+    def test_write_while_loading_by_natural_key(self):
+        relocation = make_relocation_request(status='approved')
+        writes = []
+
+        def write_after_the_row_is_read(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if 'JOIN' in sql and not writes:
+                # Another request writes the row after this one read it, before it is cached.
+                writes.append(RelocationRequest.objects.filter(pk=relocation.pk).update(status='scheduled'))
+                rows_changed(RelocationRequest, [relocation.pk])
+            return result
+
+        with connection.execute_wrapper(write_after_the_row_is_read):
+            self.assertEqual(self.object_cache.get(request_id=relocation.request_id).status, 'approved')
+        self.assertEqual(writes, [1])
+        self.assertEqual(self.object_cache.get(request_id=relocation.request_id).status, 'scheduled')
+
+    def test_concurrent_misses_wait_for_one_load(self):
+        relocation = make_relocation_request()
+        loaded = RelocationRequest.objects.select_related(*self.object_cache.select_related).get(pk=relocation.pk)
+        # Another request holds the lock and caches the row while this one waits.
+        cache.add(f'{self.object_cache.prefix}:pk:{relocation.pk}:lock', 1)
+
+        def other_request_loads(seconds):
+            cache.set(self.object_cache.object_key(relocation.pk), loaded)
+
+        before = self.object_cache.stats()
+        with mock.patch('smartmove.cache.time.sleep', side_effect=other_request_loads), self.assertNumQueries(0):
+            self.assertEqual(self.object_cache.get(relocation.pk), relocation)
+        self.assertEqual(self.stats_delta(before)['waits'], 1)
+        # One that gives up waiting loads the row itself.
+        cache.clear()
+        cache.add(f'{self.object_cache.prefix}:pk:{relocation.pk}:lock', 1)
+        with mock.patch.object(self.object_cache, 'lock_timeout', 0.05), self.assertNumQueries(1):
+            self.assertEqual(self.object_cache.get(relocation.pk), relocation)
+
+
+class FacetTests(AdminLoginMixin, TestCase):
+    def test_counts_follow_writes(self):
+        facet = Facet(Client, 'city')
+        springfield = make_client(city='Springfield')
+        make_client(city='Springfield')
+        make_client(city='Shelbyville')
+        self.assertEqual(facet.counts(), {'Shelbyville': 1, 'Springfield': 2})
+        springfield.city = 'Capital City'
+        springfield.save()
+        self.assertEqual(facet.counts(), {'Capital City': 1, 'Shelbyville': 1, 'Springfield': 1})
+        springfield.delete()
+        Client.objects.filter(city='Shelbyville').update(city='Springfield')
+        self.assertEqual(facet.counts(), {'Springfield': 2})
+
+    def test_related_counts(self):
+        facet = Facet(PropertyInventory, 'property__property_type')
+        house = make_property(property_type='house')
+        make_inventory_item(property=house)
+        make_inventory_item(property=house)
+        apartment = make_inventory_item(property=make_property(property_type='apartment'))
+        self.assertEqual(facet.counts(), {'apartment': 1, 'house': 2})
+        # Items move with their property's type, and with their property.
+        house.property_type = 'condo'
+        house.save()
+        apartment.property = house
+        apartment.save()
+        self.assertEqual(facet.counts(), {'condo': 3})
+
+    def test_rebuild(self):
+        make_client(state='IL')
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE clients_client_state_facet')
+        call_command('rebuild_facets', stdout=io.StringIO())
+        self.assertEqual(Facet(Client, 'state').counts(), {'IL': 1})
+
+    def test_list_filter(self):
+        make_client(city='Springfield')
+        make_client(city='Springfield')
+        make_client(city='Shelbyville', state='IN')
+        response = self.client.get(reverse('admin:clients_client_changelist'))
+        self.assertContains(response, 'Springfield (2)')
+        self.assertContains(response, 'IN (1)')
+        response = self.client.get(reverse('admin:clients_client_changelist'), {'city': 'Shelbyville'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class PartitionTests(TestCase):
+    def partition_of(self, instance):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT tableoid::regclass::text FROM {instance._meta.db_table} WHERE id = %s', [instance.pk],
+            )
+            return cursor.fetchone()[0]
+
+    def test_tables(self):
+        self.assertEqual({table.model: table.field.name for table in PartitionedTable.all()}, {
+            InventoryTransfer: 'date_created',
+            MovingExpense: 'date_incurred',
+            RelocationTimeline: 'date_created',
+        })
+        # The test database's tables were empty when partitioned.
+        months = [add_months(current_month(), n) for n in range(settings.PARTITION_MONTHS_AHEAD + 1)]
+        self.assertEqual(list(PartitionedTable(MovingExpense, 'date_incurred').partitions().values()), [*months, None])
+
+    def test_rows_go_to_the_partition_of_their_month(self):
+        table = PartitionedTable(MovingExpense, 'date_incurred')
+        recent = make_expense()
+        self.assertEqual(self.partition_of(recent), table.partition_name(current_month()))
+        old = make_expense(date_incurred=add_months(current_month(), -24))
+        self.assertEqual(self.partition_of(old), table.default_name)
+
+        month = add_months(current_month(), -24)
+        self.assertEqual(table.create_partitions(month, add_months(month, 1)), [table.partition_name(month)])
+        self.assertEqual(self.partition_of(old), table.partition_name(month))
+        self.assertEqual(MovingExpense.objects.count(), 2)
+        output = io.StringIO()
+        call_command('create_partitions', stdout=output)
+        self.assertIn('logistics.MovingExpense: created no partitions.', output.getvalue())
+
+    def test_archive(self):
+        table = PartitionedTable(InventoryTransfer, 'date_created')
+        month = add_months(current_month(), -12)
+        next_month = add_months(month, 1)
+        table.create_partitions(month, add_months(month, 2))
+        completed = make_relocation_request(status='completed')
+        archived = make_transfer(
+            assignment=make_assignment(relocation_request=completed), inventory_item=make_inventory_item(),
+        )
+        kept = make_transfer()
+        InventoryTransfer.objects.filter(pk=archived.pk).update(
+            date_created=datetime(month.year, month.month, 15, tzinfo=timezone.utc),
+        )
+        InventoryTransfer.objects.filter(pk=kept.pk).update(
+            date_created=datetime(next_month.year, next_month.month, 15, tzinfo=timezone.utc),
+        )
+        with connection.cursor() as cursor:
+            # Check the rows' deferred foreign keys now, as the partition can't be dropped before.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        name = table.partition_name(month)
+
+        output = io.StringIO()
+        call_command('archive_partitions', dry_run=True, output_dir=output_dir, stdout=output)
+        self.assertEqual(output.getvalue(), f'Would archive {name}.\n')
+        self.assertIn(name, table.partitions())
+
+        call_command('archive_partitions', output_dir=output_dir, stdout=io.StringIO())
+        self.assertEqual(list(InventoryTransfer.objects.all()), [kept])
+        # The archived transfer's item could be added to the manifest again.
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM logistics_inventorytransfer_item_key')
+            self.assertEqual(cursor.fetchone(), (0,))
+        self.assertNotIn(name, connection.introspection.table_names())
+        self.assertIn(table.partition_name(next_month), table.partitions())
+        with gzip.open(Path(output_dir) / f'{name}.csv.gz', 'rt') as file:
+            self.assertEqual([row['item_name'] for row in csv.DictReader(file)], [archived.item_name])
+
+
+class ArchivedTimelineTests(TestCase):
+    def test_archived_requests_keep_their_milestone(self):
+        table = PartitionedTable(RelocationTimeline, 'date_created')
+        month = add_months(current_month(), -12)
+        table.create_partitions(month, add_months(month, 1))
+        relocation = make_relocation_request(status='completed')
+        entry = make_timeline_entry(
+            relocation_request=relocation, milestone_type='relocation_completed', is_completed=True,
+            actual_datetime=datetime(month.year, month.month, 20, tzinfo=timezone.utc),
+        )
+        RelocationTimeline.objects.filter(pk=entry.pk).update(
+            date_created=datetime(month.year, month.month, 15, tzinfo=timezone.utc),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        call_command('archive_partitions', output_dir=output_dir, stdout=io.StringIO())
+        self.assertFalse(relocation.timeline.exists())
+
+        call_command('rebuild_milestones', stdout=io.StringIO())
+        make_timeline_entry(
+            relocation_request=relocation, milestone_type='quote_sent', is_completed=True,
+            actual_datetime=datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+        )
+        relocation.refresh_from_db()
+        self.assertTrue(relocation.timeline_archived)
+        self.assertEqual((relocation.current_milestone, relocation.milestone_progress), ('relocation_completed', 100))
+        # A later entry moves it on.
+        make_timeline_entry(
+            relocation_request=relocation, milestone_type='unpacking_completed', is_completed=True,
+            actual_datetime=datetime.now(timezone.utc),
+        )
+        relocation.refresh_from_db()
+        self.assertEqual(relocation.current_milestone, 'unpacking_completed')
+
+
+class RequestInstrumentationTests(TestCase):
+    def setUp(self):
+        request_metrics.clear()
+        # Opened before any middleware was loaded when the test runs alone.
+        instrument(connection)
+        self.user = make_user()
+        self.relocation = make_relocation_request(client=make_client(user=self.user))
+
+    def test_metrics(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('api-request-status', args=[self.relocation.request_id]))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        # The session, the user, the request's pk then row, then its status.
+        for sample in [
+            'smartmove_requests_total{view="api-request-status"} 1',
+            'smartmove_request_queries_bucket{view="api-request-status",le="2"} 0',
+            'smartmove_request_queries_bucket{view="api-request-status",le="5"} 1',
+            'smartmove_request_queries_sum{view="api-request-status"} 5',
+            'smartmove_request_duration_seconds_count{view="api-request-status"} 1',
+        ]:
+            self.assertIn(sample, response.text)
+        self.assertEqual(
+            self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7').status_code, 403,
+        )
+
+    async def test_async_requests(self):
+        await self.async_client.aforce_login(self.user)
+        await self.async_client.get(reverse('api-request-timeline', args=[self.relocation.request_id]))
+        views = request_metrics.views
+        self.assertEqual(views['api-request-timeline'].requests, 1)
+        self.assertEqual(views['api-request-timeline'].queries.sum, 5)
+
+    def test_repeated_queries(self):
+        def view(request):
+            for client in Client.objects.all():
+                ClientDocument.objects.filter(client=client).exists()
+            return HttpResponse()
+
+        for _ in range(3):
+            make_client()
+        request = RequestFactory().get('/admin/clients/client/')
+        request.resolver_match = resolve(request.path)
+        with override_settings(SLOW_REQUEST_REPEATED_QUERIES=1), self.assertLogs('smartmove.instrumentation') as logs:
+            InstrumentationMiddleware(view)(request)
+        self.assertIn('4 x SELECT %s AS "a" FROM "clients_clientdocument"', logs.output[0])
+        metrics = request_metrics.views['admin:clients_client_changelist']
+        self.assertEqual((metrics.repeated_queries, metrics.slow_requests), (3, 1))
+
+    def test_streaming_responses_are_recorded_once_read(self):
+        def view(request):
+            return StreamingHttpResponse(f'{Client.objects.count()}\n' for _ in range(3))
+
+        request = RequestFactory().get('/admin/clients/client/')
+        request.resolver_match = resolve(request.path)
+        response = InstrumentationMiddleware(view)(request)
+        self.assertNotIn('admin:clients_client_changelist', request_metrics.views)
+        self.assertEqual(b''.join(response), b'1\n1\n1\n')
+        metrics = request_metrics.views['admin:clients_client_changelist']
+        self.assertEqual((metrics.requests, metrics.queries.sum), (1, 3))
+
+    async def test_async_streaming_responses(self):
+        async def rows():
+            for _ in range(2):
+                yield f'{await Client.objects.acount()}\n'
+
+        async def view(request):
+            return StreamingHttpResponse(rows())
+
+        request = RequestFactory().get('/admin/clients/client/')
+        request.resolver_match = resolve(request.path)
+        response = await InstrumentationMiddleware(view)(request)
+        self.assertEqual([chunk async for chunk in response], [b'1\n', b'1\n'])
+        metrics = request_metrics.views['admin:clients_client_changelist']
+        self.assertEqual((metrics.requests, metrics.queries.sum), (1, 2))
+
+    def test_metrics_of_all_processes(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        stats = RequestStats()
+        stats.queries = 4
+        other = RequestMetrics()
+        with override_settings(METRICS_DIR=directory):
+            self.addCleanup(request_metrics.clear)
+            # A worker that served a request before this one is scraped.
+            other.record('api-request-status', 200, 0.2, stats, False)
+            other.save()
+            request_metrics.record('api-request-status', 500, 0.02, RequestStats(), False)
+            exposition = request_metrics.exposition()
+        for sample in [
+            'smartmove_requests_total{view="api-request-status"} 2',
+            'smartmove_request_server_errors_total{view="api-request-status"} 1',
+            'smartmove_request_queries_sum{view="api-request-status"} 4',
+            'smartmove_request_duration_seconds_bucket{view="api-request-status",le="0.025"} 1',
+        ]:
+            self.assertIn(sample, exposition)
+        self.assertEqual(len(os.listdir(directory)), 2)
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT 1 FROM t WHERE id IN (%s, %s,%s) AND x = %s'),
+            'SELECT 1 FROM t WHERE id IN (%s, ...) AND x = %s',
+        )
+
+
+class LoadTestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.cookies.add(self.headers['Cookie'])
+        body = b'x' * 300
+        if self.path == '/chunked':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in [body[:100], body[100:]]:
+                self.wfile.write(b'%x;ext=1\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        self.send_response(404 if self.path == '/missing' else 200)
+        self.send_header('Content-Length', str(len(body)))
+        if self.path == '/close':
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class LoadTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), LoadTestHandler)
+        self.server.connections, self.server.cookies = 0, set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def load(self, mix, **kwargs):
+        return load(self.server.server_address[1], mix, 2, 0.3, {'Cookie': 'sessionid=s'}, **kwargs)
+
+    def test_kept_alive_responses(self):
+        results = self.load({'length': ['/length'], 'chunked': ['/chunked']})
+        self.assertGreater(results['length']['requests'], 0)
+        self.assertGreater(results['chunked']['requests'], 0)
+        self.assertEqual(results['all']['requests'], results['length']['requests'] + results['chunked']['requests'])
+        self.assertEqual(results['all']['errors'], 0)
+        self.assertLessEqual(results['all']['p50'], results['all']['p99'])
+        # Each client kept its connection, whichever framing the responses had.
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(self.server.cookies, {'sessionid=s'})
+
+    def test_closed_connections_and_errors(self):
+        results = self.load({'close': ['/close'], 'missing': ['/missing']}, weights={'close': 1, 'missing': 1})
+        self.assertGreater(results['close']['requests'], 0)
+        self.assertEqual(results['missing']['requests'], 0)
+        self.assertGreater(results['missing']['errors'], 0)
+        self.assertIsNone(results['missing']['p50'])
+        # A new connection after each one the server closed.
+        self.assertGreaterEqual(self.server.connections, results['close']['requests'])
+
+
+class PostgreSQLVersionCheckTests(SimpleTestCase):
+    databases = {'default'}
+
+    def check(self, version):
+        wrapper = type(connections['default'])
+        with mock.patch.object(wrapper, 'pg_version', new_callable=mock.PropertyMock, return_value=version):
+            return check_postgresql_version(None, databases=['default'])
+
+    def test_minimum_version(self):
+        self.assertEqual(self.check(160002), [])
+        error, = self.check(150007)
+        self.assertEqual(error.id, 'smartmove.E001')
+        self.assertIn('PostgreSQL 15.7, the project needs 16 or later', error.msg)
+        # Without --database, as for runserver, the check runs no query.
+        self.assertEqual(check_postgresql_version(None), [])
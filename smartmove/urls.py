@@ -14,9 +14,26 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path
 
+from logistics import views as logistics_views
+from relocations import views as relocations_views
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-]
+    path('api/requests/<str:request_id>/', relocations_views.request_status, name='api-request-status'),
+    path('api/requests/<str:request_id>/timeline/', relocations_views.request_timeline, name='api-request-timeline'),
+    path('api/requests/<str:request_id>/events/', relocations_views.request_events, name='api-request-events'),
+    path('api/requests/<str:request_id>/transfers/', logistics_views.transfer_status, name='api-transfer-status'),
+    path(
+        'api/requests/<str:request_id>/transfers/status/', logistics_views.transition_transfers_view,
+        name='api-transfer-transition',
+    ),
+    path('metrics/', views.metrics, name='metrics'),
+    path('metrics/database-pool/', views.database_pool, name='database-pool-metrics'),
+    path('metrics/object-caches/', views.object_caches, name='object-cache-metrics'),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
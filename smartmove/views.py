@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
+
+from . import cache
+from .db import pool_stats
+from .instrumentation import request_metrics
+
+
+def metrics_allowed(request):
+    """Metrics are for staff and for scrapers on ``INTERNAL_IPS``."""
+    return request.user.is_staff or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+
+
+def database_pool(request):
+    """The statistics of the connection pools of the process serving the request."""
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return JsonResponse(pool_stats())
+
+
+def object_caches(request):
+    """The hits, misses and invalidations of the object caches in the process serving the request."""
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return JsonResponse({label: object_cache.stats() for label, object_cache in cache.registry.items()})
+
+
+def metrics(request):
+    """
+    The request metrics of the processes saving theirs in ``METRICS_DIR``, or
+    of the one serving the request without it, for Prometheus to scrape.
+    """
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(request_metrics.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')